@@ -0,0 +1,196 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Micro benchmark of the WHOIS parser against the old regex parser.
+
+Run with `python benchmarks/bench_parser.py`.
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import timeit
+import typing as t
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ipq import parser  # noqa: E402
+
+DOMAIN_RESPONSE = (
+    """\
+   Domain Name: GOOGLE.COM
+   Registry Domain ID: 2138514_DOMAIN_COM-VRSN
+   Registrar WHOIS Server: whois.markmonitor.com
+   Registrar URL: http://www.markmonitor.com
+   Updated Date: 2019-09-09T15:39:04Z
+   Creation Date: 1997-09-15T04:00:00Z
+   Registry Expiry Date: 2028-09-14T04:00:00Z
+   Registrar: MarkMonitor Inc.
+   Registrar IANA ID: 292
+   Registrar Abuse Contact Email: abusecomplaints@markmonitor.com
+   Registrar Abuse Contact Phone: +1.2086851750
+   Domain Status: clientDeleteProhibited https://icann.org/epp#clientDeleteProhibited
+   Domain Status: clientTransferProhibited https://icann.org/epp#clientTransferProhibited
+   Domain Status: clientUpdateProhibited https://icann.org/epp#clientUpdateProhibited
+   Domain Status: serverDeleteProhibited https://icann.org/epp#serverDeleteProhibited
+   Domain Status: serverTransferProhibited https://icann.org/epp#serverTransferProhibited
+   Domain Status: serverUpdateProhibited https://icann.org/epp#serverUpdateProhibited
+   Name Server: NS1.GOOGLE.COM
+   Name Server: NS2.GOOGLE.COM
+   Name Server: NS3.GOOGLE.COM
+   Name Server: NS4.GOOGLE.COM
+   DNSSEC: unsigned
+   URL of the ICANN Whois Inaccuracy Complaint Form: https://www.icann.org/wicf/
+>>> Last update of whois database: 2022-06-20T12:00:00Z <<<
+
+For more information on Whois status codes, please visit https://icann.org/epp
+
+NOTICE: The expiration date displayed in this record is the date the
+registrar's sponsorship of the domain name registration in the registry is
+currently set to expire. This date does not necessarily reflect the expiration
+date of the domain name registrant's agreement with the sponsoring
+registrar.  Users may consult the sponsoring registrar's Whois database to
+view the registrar's reported date of expiration for this registration.
+"""
+    + "\n".join(
+        f"TERMS OF USE: boilerplate line {i} that every registry appends to responses."
+        for i in range(40)
+    )
+    + """
+Domain Name: google.com
+Registry Domain ID: 2138514_DOMAIN_COM-VRSN
+Registrar WHOIS Server: whois.markmonitor.com
+Updated Date: 2019-09-09T15:39:04+0000
+Creation Date: 1997-09-15T07:00:00+0000
+Registrar Registration Expiration Date: 2028-09-13T07:00:00+0000
+Registrar: MarkMonitor, Inc.
+Domain Status: clientUpdateProhibited (https://www.icann.org/epp#clientUpdateProhibited)
+Domain Status: clientTransferProhibited (https://www.icann.org/epp#clientTransferProhibited)
+Registrant Organization: Google LLC
+Registrant State/Province: CA
+Registrant Country: US
+Name Server: ns1.google.com
+Name Server: ns2.google.com
+Name Server: ns3.google.com
+Name Server: ns4.google.com
+"""
+)
+
+IP_RESPONSE = """\
+NetRange:       8.8.8.0 - 8.8.8.255
+CIDR:           8.8.8.0/24
+NetName:        LVLT-GOGL-8-8-8
+NetHandle:      NET-8-8-8-0-1
+Parent:         LVLT-ORG-8-8 (NET-8-0-0-0-1)
+NetType:        Reallocated
+OriginAS:
+Organization:   Google LLC (GOGL)
+RegDate:        2014-03-14
+Updated:        2014-03-14
+
+OrgName:        Google LLC
+OrgId:          GOGL
+Address:        1600 Amphitheatre Parkway
+City:           Mountain View
+StateProv:      CA
+PostalCode:     94043
+Country:        US
+RegDate:        2000-03-30
+Updated:        2019-10-31
+""" + "\n".join(f"# ARIN boilerplate comment line {i}." for i in range(30))
+
+
+def legacy_domain(data: str) -> t.Dict[str, t.Any]:
+    """The per field regex parser `WhoisData` used previously."""
+
+    def rgx(q: str) -> str | None:
+        match = re.compile(f"(?i)^\\s*{q}: (.*)$", re.M).search(data)
+        return match.group(1) if match else None
+
+    def greedy_rgx(q: str) -> t.List[str] | None:
+        matches = re.compile(f"(?i)^\\s*{q}: (.*)$", re.M).findall(data)
+        result: t.List[t.Any] = []
+
+        for m in matches:
+            if m.lower() not in (r.lower() for r in result):
+                result.append(m.split()[0].strip())
+
+        return sorted(list(set(result))) or None
+
+    attr_map = {
+        "domain": "domain name",
+        "registrar": "registrar",
+        "created": "creation date",
+        "updated": "updated date",
+        "status": "domain status",
+        "expires": "registry expiry date",
+        "nameservers": "name server",
+    }
+
+    return {
+        k: greedy_rgx(v) if k in ("nameservers", "status") else rgx(v) for k, v in attr_map.items()
+    }
+
+
+def legacy_ip(data: str) -> t.Dict[str, str]:
+    """The per field regex parser `IPData` used previously."""
+    attr_map = {
+        "city": "City",
+        "country": "Country",
+        "org": "OrgName",
+        "postal": ".*Postal\\s?Code",
+    }
+
+    result: t.Dict[str, str] = {}
+    for k, v in attr_map.items():
+        match = re.compile(f"^{v}:\\s+(.*)$", re.M).search(data)
+        result[k] = match.group(1) if match else "Not Found"
+
+    return result
+
+
+CASES: t.Dict[str, t.Tuple[t.Callable[[str], t.Any], t.Callable[[str], t.Any], str]] = {
+    "domain": (legacy_domain, parser.parse_domain, DOMAIN_RESPONSE),
+    "ip": (legacy_ip, parser.parse_ip, IP_RESPONSE),
+}
+
+
+def bench(func: t.Callable[[str], t.Any], data: str, number: int) -> float:
+    """Returns the best time per call in microseconds."""
+    timer = timeit.Timer(lambda: func(data))
+    return min(timer.repeat(5, number)) / number * 1e6
+
+
+def main(number: int = 2000) -> t.Dict[str, t.Dict[str, float]]:
+    results: t.Dict[str, t.Dict[str, float]] = {}
+
+    for name, (legacy, current, data) in CASES.items():
+        old = bench(legacy, data, number)
+        new = bench(current, data, number)
+        results[name] = {"legacy_us": old, "parser_us": new, "speedup": old / new}
+        print(f"{name:>6}: legacy {old:8.2f}us  parser {new:8.2f}us  {old / new:5.2f}x")
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
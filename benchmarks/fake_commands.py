@@ -0,0 +1,110 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Deterministic stand-ins for the whois and nslookup commands.
+
+`python benchmarks/fake_commands.py whois|nslookup ARGS...` acts
+like that command. Answers depend only on the arguments, so runs can
+be compared. Only cheap modules are imported, so startup stays close
+to the bare interpreter.
+"""
+
+from __future__ import annotations
+
+import sys
+import typing as t
+import zlib
+
+REGISTRY = """\
+   Domain Name: {upper}
+   Registrar WHOIS Server: {registrar}
+   Updated Date: 2023-08-14T07:01:38Z
+   Creation Date: 1995-08-14T04:00:00Z
+   Registry Expiry Date: 2030-08-13T04:00:00Z
+   Registrar: Example Registrar, Inc.
+   Domain Status: clientDeleteProhibited https://icann.org/epp#clientDeleteProhibited
+   Domain Status: clientTransferProhibited https://icann.org/epp#clientTransferProhibited
+   Name Server: NS1.{upper}
+   Name Server: NS2.{upper}
+"""
+
+REGISTRAR = """\
+Domain Name: {query}
+Registrar: Example Registrar, Inc.
+Registrant Organization: Example Organization
+Registrant Country: US
+"""
+
+RIR = """\
+NetRange:       {query} - {query}
+OrgName:        Example Org
+City:           Mountain View
+StateProv:      CA
+PostalCode:     94043
+Country:        US
+"""
+
+
+def address(name: str) -> str:
+    """The IPv4 address the fake DNS gives the name."""
+    n = zlib.crc32(name.lower().rstrip(".").encode())
+    return f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+
+
+def is_ip(query: str) -> bool:
+    return query.replace(".", "").isdigit()
+
+
+def fake_whois(args: t.List[str]) -> str:
+    query = args[-1]
+
+    if is_ip(query):
+        return RIR.format(query=query)
+
+    registry = REGISTRY.format(upper=query.upper(), registrar="whois.example-registrar.com")
+    return registry + "\n" + REGISTRAR.format(query=query)
+
+
+def fake_nslookup(args: t.List[str]) -> str:
+    name = args[-1]
+    qtype = next((a.partition("=")[2].upper() for a in args if a.startswith("-type=")), "A")
+
+    if qtype == "PTR" or is_ip(name):
+        return f"{name}\tname = host-{address(name).replace('.', '-')}.example.net.\n\n"
+
+    answer = f"Address: {address(name)}" if qtype == "A" else "Address: ::1"
+    return (
+        "Server:\t\t127.0.0.53\nAddress:\t127.0.0.53#53\n\n"
+        f"Non-authoritative answer:\nName:\t{name}\n{answer}\n\n"
+    )
+
+
+FAKES: t.Dict[str, t.Callable[[t.List[str]], str]] = {
+    "whois": fake_whois,
+    "nslookup": fake_nslookup,
+}
+
+
+def main() -> None:
+    sys.stdout.write(FAKES[sys.argv[1]](sys.argv[2:]))
+
+
+if __name__ == "__main__":
+    main()
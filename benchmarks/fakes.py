@@ -0,0 +1,188 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Fake WHOIS and DNS servers, and installs the fake commands.
+
+`python benchmarks/fakes.py serve` runs the servers, and prints their
+addresses as JSON once they listen. Answers depend only on the query,
+so runs can be compared.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import typing as t
+from pathlib import Path
+
+from fake_commands import REGISTRAR, REGISTRY, RIR, address, is_ip
+
+HERE = Path(__file__).resolve()
+COMMANDS = HERE.with_name("fake_commands.py")
+
+
+def install(directory: Path) -> Path:
+    """Writes shims for the fake commands into the directory.
+
+    Put the directory first on `PATH` so the real commands never run.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+
+    for command in ("whois", "nslookup"):
+        if os.name == "nt":
+            path = directory / f"{command}.cmd"
+            path.write_text(f'@"{sys.executable}" "{COMMANDS}" {command} %*\n')
+        else:
+            path = directory / command
+            path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{COMMANDS}" {command} "$@"\n')
+            path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+    return directory
+
+
+class _WhoisServer:
+    """One fake WHOIS server role."""
+
+    def __init__(self, respond: t.Callable[[str], str], latency: float) -> None:
+        self.respond = respond
+        self.latency = latency
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        words = (await reader.readline()).decode().split()
+
+        if words:
+            # Probes connect and hang up without sending anything
+            await asyncio.sleep(self.latency)
+            writer.write(self.respond(words[-1]).encode())
+            await writer.drain()
+
+        writer.close()
+
+
+class _DNSServer(asyncio.DatagramProtocol):
+    """Answers A, AAAA and PTR queries, and nothing else."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = t.cast(asyncio.DatagramTransport, transport)
+
+    def datagram_received(self, data: bytes, addr: t.Tuple[str, int]) -> None:
+        asyncio.get_running_loop().call_later(self.latency, self.reply, data, addr)
+
+    def reply(self, data: bytes, addr: t.Tuple[str, int]) -> None:
+        (qid,) = struct.unpack_from("!H", data)
+        offset, labels = 12, []
+
+        while data[offset]:
+            labels.append(data[offset + 1 : offset + 1 + data[offset]].decode())
+            offset += data[offset] + 1
+
+        (qtype,) = struct.unpack_from("!H", data, offset + 1)
+        question = data[12 : offset + 5]
+        name = ".".join(labels)
+
+        if qtype == 1:
+            rdata = socket.inet_aton(address(name))
+        elif qtype == 28:
+            rdata = socket.inet_pton(socket.AF_INET6, "::1")
+        elif qtype == 12:
+            host = f"host-{address(name).replace('.', '-')}.example.net"
+            rdata = b"".join(bytes((len(p),)) + p.encode() for p in host.split(".")) + b"\0"
+        else:
+            rdata = b""
+
+        header = struct.pack("!6H", qid, 0x8180, 1, 1 if rdata else 0, 0, 0)
+        answer = b"\xc0\x0c" + struct.pack("!2HIH", qtype, 1, 60, len(rdata)) + rdata
+        t.cast(asyncio.DatagramTransport, self.transport).sendto(
+            header + question + (answer if rdata else b""), addr
+        )
+
+
+async def serve(latency: float) -> None:
+    """Runs the fake servers until killed."""
+    loop = asyncio.get_running_loop()
+    ports: t.Dict[str, int] = {}
+
+    async def start(role: str, respond: t.Callable[[str], str]) -> None:
+        server = await asyncio.start_server(
+            _WhoisServer(respond, latency).handle, "127.0.0.1", 0, backlog=1024
+        )
+        ports[role] = server.sockets[0].getsockname()[1]
+
+    # Referrals point at servers that must already be listening
+    await start("registrar", lambda q: REGISTRAR.format(query=q))
+    await start("rir", lambda q: RIR.format(query=q))
+    await start(
+        "registry",
+        lambda q: REGISTRY.format(upper=q.upper(), registrar=f"127.0.0.1:{ports['registrar']}"),
+    )
+    await start(
+        "iana",
+        lambda q: f"refer:   127.0.0.1:{ports['rir' if is_ip(q) else 'registry']}\n",
+    )
+
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _DNSServer(latency), local_addr=("127.0.0.1", 0)
+    )
+    dns_port = transport.get_extra_info("sockname")[1]
+
+    print(json.dumps({"iana": f"127.0.0.1:{ports['iana']}", "dns": f"127.0.0.1#{dns_port}"}))
+    sys.stdout.flush()
+    await asyncio.Event().wait()
+
+
+@contextlib.contextmanager
+def servers(latency: float = 0.005) -> t.Iterator[t.Dict[str, str]]:
+    """Runs the fake servers in a subprocess, yielding their addresses."""
+    proc = subprocess.Popen(
+        [sys.executable, str(HERE), "serve", "--latency", str(latency)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+    try:
+        yield json.loads(t.cast(t.IO[str], proc.stdout).readline())
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("mode", choices=["serve"])
+    args.add_argument("--latency", type=float, default=0.005, help="Seconds per reply.")
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve(args.parse_args().latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Checks `ipq --version` against its import time budget.
+
+Runs `python -X importtime -m ipq --version` a few times, along with
+a bare `import click` as a baseline taken on the same machine, and
+fails if ipq's median import time goes over the baseline by more than
+the budget, or if any of the modules only lookups need get imported.
+
+Run with `nox -s importtime` or `python benchmarks/importtime.py`. The
+test suite runs it too.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import typing as t
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Allowed on top of importing click, which the CLI cannot do without
+DEFAULT_BUDGET_MS = 25.0
+
+# Only lookups need these, so --version must never import them
+FORBIDDEN = (
+    "aiodns",
+    "asyncio",
+    "sqlite3",
+    "ssl",
+    "ipq.cache",
+    "ipq.client",
+    "ipq.dns",
+    "ipq.runner",
+    "ipq.whois",
+)
+
+
+def measure(*args: str) -> t.Tuple[float, t.List[str]]:
+    """Runs Python once with the arguments, returning the time spent
+    on imports after startup in ms and the modules it imported.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+
+    total = 0.0
+    modules: t.List[str] = []
+    started = False
+
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+
+        _, cumulative, name = line[len("import time:") :].split("|")
+        modules.append(name.strip())
+
+        if not name.startswith("  ") and started:
+            # Top level imports after site are all down to the args
+            total += int(cumulative)
+
+        started = started or name.strip() == "site"
+
+    return total / 1e3, modules
+
+
+def check(runs: int) -> t.Tuple[float, float, t.List[str]]:
+    """Measures `ipq --version` and the baseline, returning the median
+    time of each, and the modules ipq imported that it should not.
+    """
+    times = []
+    baselines = []
+    imported: t.Set[str] = set()
+
+    for _ in range(runs):
+        # Interleaved, so both see the same machine load
+        ms, modules = measure("-m", "ipq", "--version")
+        times.append(ms)
+        imported.update(set(modules) & set(FORBIDDEN))
+        baselines.append(measure("-c", "import click")[0])
+
+    return statistics.median(times), statistics.median(baselines), sorted(imported)
+
+
+def main() -> None:
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args.add_argument("--runs", type=int, default=5)
+    options = args.parse_args()
+
+    median, baseline, imported = check(options.runs)
+    print(
+        f"ipq --version import time: {median:.1f}ms, {median - baseline:+.1f}ms "
+        f"over import click (budget +{options.budget_ms:.0f}ms)"
+    )
+
+    if imported:
+        sys.exit(f"ipq --version imported {', '.join(imported)}, which it should not need.")
+
+    if median - baseline > options.budget_ms:
+        sys.exit("ipq --version is over its import time budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Runs the ipq benchmark suite against local fakes.
+
+Measures parser speed on recorded responses, single host latency,
+bulk throughput and CLI startup time, then saves the results as JSON.
+Pass `--compare OLD.json` to see how they changed since an older run.
+
+Run with `nox -s benchmarks` or `python benchmarks/run.py`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import typing as t
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA = ROOT / "benchmarks" / "data"
+RESULTS = ROOT / "benchmarks" / "results"
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import fakes  # noqa: E402
+
+from ipq import Client, __version__, alookup_many, dns, geo, parser, probe, whois  # noqa: E402
+
+Metrics = t.Dict[str, float]
+
+
+def percentile(samples: t.Sequence[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(prefix: str, samples: t.Sequence[float]) -> Metrics:
+    """Summarizes latencies, in seconds, as milliseconds."""
+    return {
+        f"{prefix}_min_ms": min(samples) * 1e3,
+        f"{prefix}_median_ms": statistics.median(samples) * 1e3,
+        f"{prefix}_p95_ms": percentile(samples, 95) * 1e3,
+    }
+
+
+def bench_parser(number: int) -> Metrics:
+    """Best time per parse of each recorded response."""
+    metrics: Metrics = {}
+
+    for path in sorted(DATA.glob("*.txt")):
+        data = path.read_text()
+        parse = parser.parse_domain if path.stem.startswith("domain") else parser.parse_ip
+        timer = timeit.Timer(lambda: parse(data))
+        metrics[f"parser.{path.stem}_us"] = min(timer.repeat(5, number)) / number * 1e6
+
+    return metrics
+
+
+def bench_geo(ranges: int, lookups: int) -> Metrics:
+    """Compile time and lookup speed of a synthetic GeoIP database."""
+    step = (1 << 32) // ranges
+    ips = [f"{i % 223 + 1}.{i * 7 % 256}.{i * 13 % 256}.{i % 256}" for i in range(lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source, target = Path(tmp) / "ranges.csv", Path(tmp) / "geo.bin"
+
+        with source.open("w") as f:
+            for i in range(ranges):
+                start = i * step
+                f.write(f"{start},{start + step // 2},C{i % 250},City {i},Org {i % 5000},{i}\n")
+
+        start = time.perf_counter()
+        geo.compile_csv(source, target)
+        compile_s = time.perf_counter() - start
+
+        with geo.GeoDB(target) as db:
+            timer = timeit.Timer(lambda: [db.lookup(ip) for ip in ips])
+            lookup_s = min(timer.repeat(5, 1)) / lookups
+
+    return {"geo.compile_s": compile_s, "geo.lookup_us": lookup_s * 1e6}
+
+
+def native_client(addresses: t.Dict[str, str], netblocks: bool = True) -> Client:
+    resolver = dns.UDPResolver([addresses["dns"]])
+    backend = whois.WhoisClient(
+        servers={"127.0.0.1": whois.ServerConfig(max_connections=256)},
+        iana=addresses["iana"],
+    )
+    return Client(resolver, backend, netblocks=netblocks)
+
+
+def command_client() -> Client:
+    return Client(dns.NSLookupResolver(), whois.WhoisCommand())
+
+
+async def bench_latency(name: str, make_client: t.Callable[[], Client], rounds: int) -> Metrics:
+    """Time for one host, with a fresh client each time like the CLI."""
+    samples = []
+
+    for i in range(rounds):
+        async with make_client() as client:
+            start = time.perf_counter()
+            await client.lookup(f"host{i}.example.com", whois=True)
+            samples.append(time.perf_counter() - start)
+
+        await client.resolver.close()
+        await client.whois.close()
+
+    return summarize(f"latency.{name}", samples)
+
+
+async def bench_throughput(
+    name: str, make_client: t.Callable[[], Client], hosts: int, concurrency: int
+) -> Metrics:
+    """Hosts per second through `alookup_many` with a shared client."""
+    names = [f"host{i}.example.com" if i % 2 else f"192.0.2.{i % 250}" for i in range(hosts)]
+    failed = 0
+
+    async with make_client() as client:
+        start = time.perf_counter()
+
+        async for _, result in alookup_many(names, concurrency=concurrency, client=client):
+            failed += isinstance(result, Exception)
+
+        elapsed = time.perf_counter() - start
+
+    await client.resolver.close()
+    await client.whois.close()
+    return {
+        f"throughput.{name}_hosts_per_s": hosts / elapsed,
+        f"throughput.{name}_failed": float(failed),
+    }
+
+
+async def bench_probe(addresses: t.Dict[str, str], hosts: int) -> Metrics:
+    """Probes per second of a TCP sweep against a local listener."""
+    port = int(addresses["iana"].rpartition(":")[2])
+    async with probe.Prober(method="tcp", ports=[port], timeout=2.0) as prober:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(prober.probe("127.0.0.1") for _ in range(hosts)))
+        elapsed = time.perf_counter() - start
+
+    failed = sum(not r.received for r in results)
+    return {"throughput.probe_tcp_per_s": hosts / elapsed, "throughput.probe_tcp_failed": failed}
+
+
+def bench_startup(rounds: int) -> Metrics:
+    """Wall time of fresh interpreters importing and running ipq."""
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    commands = {
+        "import": [sys.executable, "-c", "import ipq"],
+        "version": [sys.executable, "-m", "ipq", "--version"],
+    }
+    metrics: Metrics = {}
+
+    for name, command in commands.items():
+        samples = []
+
+        for _ in range(rounds):
+            start = time.perf_counter()
+            subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+            samples.append(time.perf_counter() - start)
+
+        metrics.update(summarize(f"startup.{name}", samples))
+
+    return metrics
+
+
+async def bench_network(addresses: t.Dict[str, str], quick: bool) -> Metrics:
+    rounds, hosts = (10, 200) if quick else (50, 2000)
+    metrics: Metrics = {}
+
+    metrics.update(await bench_latency("native", lambda: native_client(addresses), rounds))
+    metrics.update(await bench_latency("command", command_client, rounds))
+    metrics.update(await bench_throughput("native", lambda: native_client(addresses), hosts, 64))
+    # The fake RIR answers with single IP blocks, which cannot be reused
+    metrics.update(
+        await bench_throughput(
+            "native_no_netblocks", lambda: native_client(addresses, False), hosts, 64
+        )
+    )
+    metrics.update(await bench_throughput("command", command_client, hosts // 10, 16))
+    metrics.update(await bench_probe(addresses, hosts))
+    return metrics
+
+
+def run(quick: bool) -> Metrics:
+    metrics = bench_parser(200 if quick else 2000)
+    metrics.update(bench_geo(*((100_000, 10_000) if quick else (1_000_000, 100_000))))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Fake commands go first, so the real ones are never run
+        os.environ["PATH"] = f"{fakes.install(Path(tmp))}{os.pathsep}{os.environ['PATH']}"
+
+        with fakes.servers() as addresses:
+            metrics.update(asyncio.run(bench_network(addresses, quick)))
+
+    metrics.update(bench_startup(5 if quick else 20))
+    return metrics
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_s")
+
+
+def compare(old: Metrics, new: Metrics) -> None:
+    """Prints each metric next to its value in an older run."""
+    for metric in sorted(new.keys() & old.keys()):
+        before, after = old[metric], new[metric]
+        change = (after - before) / before * 100 if before else 0.0
+        better = change > 0 if higher_is_better(metric) else change < 0
+        mark = "+" if better and abs(change) >= 5 else "-" if abs(change) >= 5 else " "
+        print(f"{mark} {metric:<40} {before:12.2f} -> {after:12.2f} {change:+7.1f}%")
+
+
+def main() -> None:
+    args = argparse.ArgumentParser(description="Runs the ipq benchmark suite.")
+    args.add_argument("--quick", action="store_true", help="Fewer rounds, for smoke runs.")
+    args.add_argument("-o", "--output", type=Path, help="Where to save the JSON results.")
+    args.add_argument("--compare", type=Path, help="An older results file to compare with.")
+    options = args.parse_args()
+
+    metrics = run(options.quick)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    results = {
+        "meta": {
+            "ipq": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": now.isoformat(timespec="seconds"),
+            "quick": options.quick,
+        },
+        "metrics": metrics,
+    }
+
+    output = options.output or RESULTS / f"{now:%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if options.compare:
+        compare(json.loads(options.compare.read_text())["metrics"], metrics)
+    else:
+        for metric, value in metrics.items():
+            print(f"{metric:<40} {value:12.2f}")
+
+    print(f"\nSaved to {output}")
+
+
+if __name__ == "__main__":
+    main()
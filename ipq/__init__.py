@@ -22,7 +22,25 @@
 
 from __future__ import annotations
 
-__all__ = ["cli", "errors", "models", "utils"]
+import importlib
+import time
+import typing as t
+
+# Taken first thing, so the CLI can time its own startup
+IMPORT_STARTED = time.perf_counter()
+
+__all__ = [
+    "Client",
+    "LookupResult",
+    "alookup",
+    "alookup_many",
+    "cli",
+    "errors",
+    "lookup",
+    "models",
+    "timings",
+    "utils",
+]
 
 __packagename__ = "ipq"
 __version__ = "0.2.1.post0"
@@ -33,4 +51,33 @@ __url__ = "https://github.com/Jonxslays/ipq"
 __repository__ = __url__
 __license__ = "MIT"
 
-from . import cli, errors, models, utils
+if t.TYPE_CHECKING:
+    from . import cli, errors, models, timings, utils
+    from .client import Client, alookup, alookup_many, lookup
+    from .models import LookupResult
+
+# Submodules and what they export are imported on first access, so
+# `ipq --version` does not pay for asyncio, sqlite3 and friends
+_LAZY: t.Dict[str, str] = {
+    "Client": "client",
+    "alookup": "client",
+    "alookup_many": "client",
+    "lookup": "client",
+    "LookupResult": "models",
+}
+
+
+def __getattr__(name: str) -> t.Any:
+    if name in _LAZY:
+        value = getattr(importlib.import_module(f"{__name__}.{_LAZY[name]}"), name)
+    elif name in __all__:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> t.List[str]:
+    return sorted({*globals(), *__all__})
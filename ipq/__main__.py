@@ -29,8 +29,13 @@ from ipq import cli, errors
 
 def main() -> None:
     """Main entry point for the program."""
+    args = sys.argv[1:]
+
     try:
-        cli.invoke()
+        if args and args[0] in cli.COMMANDS:
+            cli.COMMANDS[args[0]](args[1:], prog_name=f"ipq {args[0]}")
+        else:
+            cli.invoke()
     except errors.IpqError as e:
         print(e)
         sys.exit(1)
@@ -0,0 +1,333 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Runs lookups for many hosts concurrently."""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import contextvars
+import ipaddress
+import typing as t
+
+from ipq import errors, utils
+
+T = t.TypeVar("T")
+R = t.TypeVar("R")
+
+DEFAULT_CONCURRENCY = 16
+DEDUP_WINDOW = 100_000
+MAX_ADDRESSES = 1 << 24
+
+
+def read_hosts(stream: t.Iterable[str]) -> t.Iterator[str]:
+    """Lazily yields hosts from the stream, one per line.
+
+    Blank lines and lines starting with `#` are skipped.
+    """
+    for line in stream:
+        host = line.strip()
+
+        if host and not host.startswith("#"):
+            yield host
+
+
+class _Window:
+    """Remembers the last few distinct items it was given."""
+
+    __slots__ = ("size", "_items")
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._items: t.OrderedDict[str, None] = collections.OrderedDict()
+
+    def add(self, item: str) -> bool:
+        """Adds the item, returning whether it was not already seen."""
+        if item in self._items:
+            self._items.move_to_end(item)
+            return False
+
+        self._items[item] = None
+
+        if len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+        return True
+
+
+def _normalize(host: str) -> str:
+    """Normalizes the host, passing rejected ones through unchanged."""
+    try:
+        return utils.normalize_host(host)
+    except errors.InvalidHost:
+        return host
+
+
+def prepare(hosts: t.Iterable[str], window: int = DEDUP_WINDOW) -> t.Iterator[str]:
+    """Lazily normalizes the hosts, dropping any repeats.
+
+    URLs are cut down to their host, as `utils.normalize_host` does.
+    Hosts it rejects, like CIDR blocks, pass through unchanged to be
+    expanded or reported later.
+
+    Only the last `window` distinct hosts are remembered, so memory
+    stays flat on huge inputs. A repeat further back than that is
+    looked up again, and usually answered from the cache.
+    """
+    seen = _Window(window)
+
+    for host in hosts:
+        host = _normalize(host)
+
+        if seen.add(host):
+            yield host
+
+
+async def stream(hosts: t.AsyncIterable[str], window: int = DEDUP_WINDOW) -> t.AsyncIterator[str]:
+    """Does what `expand(prepare(hosts))` does, for hosts that arrive
+    asynchronously, like lines read from a socket.
+    """
+    seen = _Window(window)
+
+    async for host in hosts:
+        host = _normalize(host)
+
+        if seen.add(host):
+            for address in expand((host,)):
+                yield address
+
+
+def _version(address: str) -> int | None:
+    """The IP version of the address, or None if it is not one."""
+    try:
+        return ipaddress.ip_address(address).version
+    except ValueError:
+        return None
+
+
+def _check_size(host: str, size: int, limit: int) -> None:
+    """Raises `InvalidHost` if the block or range is too large."""
+    if size > limit:
+        raise errors.InvalidHost(f"{host!r} has {size} addresses, more than the limit of {limit}.")
+
+
+def network(host: str, limit: int = MAX_ADDRESSES) -> t.Iterator[str] | None:
+    """Lazily yields the addresses in a CIDR block or IPv4 range.
+
+    Blocks like `10.0.0.0/16` yield their usable host addresses, and
+    ranges like `10.0.0.1-10.0.1.9` or `10.0.0.1-9` yield every
+    address from start to end inclusive. Returns None if the host is
+    neither, and raises `InvalidHost` if it is malformed, IPv6, or
+    has more than `limit` addresses, a /8 by default.
+    """
+    if utils.CIDR_RGX.match(host):
+        try:
+            block = ipaddress.IPv4Network(host, strict=False)
+        except ValueError:
+            raise errors.InvalidHost(f"{host!r} is not a valid CIDR block.") from None
+
+        _check_size(host, block.num_addresses, limit)
+        # /31 and /32 have no network or broadcast address to skip
+        addresses = block.hosts() if block.num_addresses > 2 else iter(block)
+        return (str(address) for address in addresses)
+
+    match = utils.RANGE_RGX.match(host)
+
+    if not match:
+        start_text, sep, end_text = host.partition("/" if "/" in host else "-")
+        versions = {_version(start_text), _version(end_text)}
+
+        if ":" not in host or not sep or 6 not in versions:
+            return None
+
+        if 4 in versions:
+            raise errors.InvalidHost(f"{host!r} mixes IPv4 and IPv6 addresses.")
+
+        raise errors.InvalidHost(f"{host!r} is an IPv6 block or range, which are not supported.")
+
+    try:
+        start = int(ipaddress.IPv4Address(match.group(1)))
+
+        if "." in match.group(2):
+            end = int(ipaddress.IPv4Address(match.group(2)))
+        elif int(match.group(2)) < 256:
+            end = start & ~0xFF | int(match.group(2))
+        else:
+            end = -1
+    except ValueError:
+        end = -1
+
+    if end < start:
+        raise errors.InvalidHost(f"{host!r} is not a valid IP range.")
+
+    _check_size(host, end - start + 1, limit)
+    return (str(ipaddress.IPv4Address(ip)) for ip in range(start, end + 1))
+
+
+def expand(hosts: t.Iterable[str], limit: int = MAX_ADDRESSES) -> t.Iterator[str]:
+    """Lazily expands any CIDR blocks and IP ranges among the hosts.
+
+    Addresses are produced one at a time as they are pulled, so even a
+    /8 is never held in memory. Other hosts pass through unchanged, as
+    do malformed, IPv6 and too large blocks and ranges, so they are
+    reported as invalid hosts instead of ending the run.
+    """
+    for host in hosts:
+        try:
+            addresses = network(host, limit)
+        except errors.InvalidHost:
+            addresses = None
+
+        if addresses is None:
+            yield host
+        else:
+            yield from addresses
+
+
+class _Slots:
+    """Tracks the items of a `run` that are waiting, not working."""
+
+    __slots__ = ("concurrency", "waiting", "wake")
+
+    def __init__(self, concurrency: int) -> None:
+        self.concurrency = concurrency
+        self.waiting = 0
+        self.wake: asyncio.Future[None] | None = None
+
+    def free(self, running: int) -> bool:
+        """Whether another item may start next to those running."""
+        return running - self.waiting < self.concurrency and running < 2 * self.concurrency
+
+
+_slots: contextvars.ContextVar[_Slots | None] = contextvars.ContextVar("slots", default=None)
+
+
+@contextlib.contextmanager
+def waiting() -> t.Iterator[None]:
+    """Gives up the slot of the `run` item this is called from, until
+    the block ends.
+
+    For waits that are no work of its own, like a rate limit, so other
+    items can go ahead in the meantime.
+    """
+    slots = _slots.get()
+
+    if slots is None:
+        yield
+        return
+
+    slots.waiting += 1
+
+    if slots.wake and not slots.wake.done():
+        slots.wake.set_result(None)
+
+    try:
+        yield
+    finally:
+        slots.waiting -= 1
+
+
+async def run(
+    func: t.Callable[[T], t.Awaitable[R]],
+    items: t.Iterable[T] | t.AsyncIterable[T],
+    concurrency: int,
+) -> t.AsyncGenerator[t.Tuple[T, asyncio.Future[R]], None]:
+    """Runs `func` over the items with a bounded number in flight.
+
+    Items are pulled from the iterable only as slots free up, so memory
+    stays flat no matter how many items there are. Finished futures
+    are yielded as they complete, paired with the item that produced
+    them. Anything still in flight is cancelled if the caller stops
+    early.
+
+    Items inside a `waiting` block give their slot to the next item,
+    so up to `concurrency` more may be in flight while they wait.
+
+    An async iterable is waited on alongside the work in flight, so
+    results keep coming while the next item is slow to arrive.
+    """
+    slots = _Slots(concurrency)
+    pending: t.Dict[asyncio.Future[R], T] = {}
+    upcoming: asyncio.Future[T] | None = None
+
+    async def start(item: T) -> R:
+        # Set in the tasks own copy of the context
+        _slots.set(slots)
+        return await func(item)
+
+    async def drain(
+        *others: asyncio.Future[t.Any],
+    ) -> t.AsyncIterator[t.Tuple[T, asyncio.Future[R]]]:
+        slots.wake = asyncio.get_event_loop().create_future()
+        watched = {slots.wake, *others, *pending}
+        done, _ = await asyncio.wait(watched, return_when=asyncio.FIRST_COMPLETED)
+
+        for future in done.intersection(pending):
+            yield pending.pop(future), future
+
+    try:
+        if isinstance(items, t.AsyncIterable):
+            iterator = items.__aiter__()
+
+            while True:
+                if upcoming is None and slots.free(len(pending)):
+                    upcoming = asyncio.ensure_future(iterator.__anext__())
+
+                if upcoming is None:
+                    async for result in drain():
+                        yield result
+
+                    continue
+
+                async for result in drain(upcoming):
+                    yield result
+
+                if upcoming.done():
+                    arrived, upcoming = upcoming, None
+
+                    try:
+                        item = arrived.result()
+                    except StopAsyncIteration:
+                        break
+
+                    pending[asyncio.ensure_future(start(item))] = item
+        else:
+            for item in items:
+                while not slots.free(len(pending)):
+                    async for result in drain():
+                        yield result
+
+                pending[asyncio.ensure_future(start(item))] = item
+
+        while pending:
+            async for result in drain():
+                yield result
+    finally:
+        unfinished: t.List[asyncio.Future[t.Any]] = [*pending]
+
+        if upcoming is not None:
+            unfinished.append(upcoming)
+
+        for future in unfinished:
+            # Ones that already failed would log an unretrieved error
+            if not future.cancel() and not future.cancelled():
+                future.exception()
@@ -0,0 +1,250 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""A persistent on disk cache for lookup results."""
+
+from __future__ import annotations
+
+import collections
+import json
+import os
+import sqlite3
+import time
+import typing as t
+from pathlib import Path
+
+from ipq import dns, errors, whois
+
+__all__ = ("Cache", "CachedResolver", "CachedWhois", "default_path")
+
+DNS = "dns"
+WHOIS = "whois"
+IP_WHOIS = "ip-whois"
+NETBLOCK = "netblock"
+
+DEFAULT_TTLS: t.Dict[str, float] = {
+    DNS: 60 * 60,
+    WHOIS: 24 * 60 * 60,
+    IP_WHOIS: 7 * 24 * 60 * 60,
+    NETBLOCK: 7 * 24 * 60 * 60,
+}
+DEFAULT_MAX_ENTRIES = 100_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL,
+    UNIQUE (kind, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires);
+"""
+
+
+def default_path() -> Path:
+    """Gets the default location of the cache database."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA")
+    return Path(base or Path.home() / ".cache") / "ipq" / "cache.sqlite3"
+
+
+class Cache:
+    """A size bounded cache of raw lookup results, backed by SQLite.
+
+    Each kind of result has its own TTL. Once there are more than
+    `max_entries` entries, the least recently used are evicted. With
+    `refresh` set, every lookup misses but results are still stored.
+    """
+
+    __slots__ = ("hits", "max_entries", "misses", "path", "refresh", "ttls", "_conn", "_writes")
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        ttls: t.Mapping[str, float] | None = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        refresh: bool = False,
+    ) -> None:
+        self.path = Path(path) if path else default_path()
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self.hits: t.Counter[str] = collections.Counter()
+        self.misses: t.Counter[str] = collections.Counter()
+        self._writes = 0
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), isolation_level=None, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute("DELETE FROM entries WHERE expires < ?", (time.time(),))
+        except (OSError, sqlite3.Error) as e:
+            raise errors.CacheError(
+                f"Could not open the cache at '{self.path}': {e}. Try '--no-cache'."
+            ) from e
+
+    def __enter__(self) -> Cache:
+        return self
+
+    def __exit__(self, *_: t.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the underlying database."""
+        self._conn.close()
+
+    def get(self, kind: str, key: str) -> str | None:
+        """Gets the cached value, or None if it is missing or stale."""
+        value = self.peek(kind, key)
+
+        if value is None:
+            self.misses[kind] += 1
+        else:
+            self.hits[kind] += 1
+
+        return value
+
+    def peek(self, kind: str, key: str) -> str | None:
+        """Gets the cached value like `get`, without counting a hit or
+        miss.
+        """
+        row = None
+        now = time.time()
+
+        if not self.refresh:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE kind = ? AND key = ? AND expires >= ?",
+                (kind, key, now),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        self._conn.execute(
+            "UPDATE entries SET accessed = ? WHERE kind = ? AND key = ?", (now, kind, key)
+        )
+        return t.cast(str, row[0])
+
+    def set(self, kind: str, key: str, value: str) -> None:
+        """Stores the value, evicting old entries if needed."""
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+            (kind, key, value, now + self.ttls[kind], now),
+        )
+
+        self._writes += 1
+        if self._writes % 100 == 1:
+            self.evict()
+
+    def evict(self) -> None:
+        """Evicts expired and least recently used entries."""
+        self._conn.execute("DELETE FROM entries WHERE expires < ?", (time.time(),))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM entries WHERE rowid IN "
+                "(SELECT rowid FROM entries ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def keys(self, kind: str) -> t.List[str]:
+        """Gets the keys of every fresh entry of the given kind."""
+        if self.refresh:
+            return []
+
+        rows = self._conn.execute(
+            "SELECT key FROM entries WHERE kind = ? AND expires >= ?", (kind, time.time())
+        )
+        return [key for (key,) in rows]
+
+    def clear(self) -> None:
+        """Removes every entry from the cache."""
+        self._conn.execute("DELETE FROM entries")
+
+    def stats(self) -> str:
+        """Gets a summary of the hits and misses of each kind."""
+        kinds = sorted(set(self.hits) | set(self.misses))
+        return ", ".join(
+            f"{kind} {self.hits[kind]} hits/{self.misses[kind]} misses" for kind in kinds
+        )
+
+
+class CachedResolver(dns.Resolver):
+    """Serves DNS queries from the cache, falling back to a resolver."""
+
+    __slots__ = ("cache", "resolver")
+
+    def __init__(self, resolver: dns.Resolver, cache: Cache) -> None:
+        super().__init__(resolver.timeout, resolver.max_in_flight)
+        self.resolver = resolver
+        self.cache = cache
+
+    async def close(self) -> None:
+        await self.resolver.close()
+
+    async def query(self, name: str, qtype: str) -> t.List[str]:
+        key = f"{qtype} {name.lower()}"
+        cached = self.cache.get(DNS, key)
+
+        if cached is not None:
+            return t.cast(t.List[str], json.loads(cached))
+
+        records = await self.resolver.query(name, qtype)
+        self.cache.set(DNS, key, json.dumps(records))
+        return records
+
+    async def _query(self, name: str, qtype: str) -> t.List[str]:
+        return await self.resolver.query(name, qtype)
+
+
+class CachedWhois(whois.WhoisBackend):
+    """Serves WHOIS queries from the cache, falling back to a
+    backend.
+    """
+
+    __slots__ = ("backend", "cache")
+
+    def __init__(self, backend: whois.WhoisBackend, cache: Cache) -> None:
+        self.backend = backend
+        self.cache = cache
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    async def query(self, query: str) -> str:
+        kind = WHOIS if whois.ipaddress_query(query) is None else IP_WHOIS
+        key = query.lower()
+        cached = self.cache.get(kind, key)
+
+        if cached is not None:
+            return cached
+
+        text = await self.backend.query(query)
+
+        if text.strip():
+            self.cache.set(kind, key, text)
+
+        return text
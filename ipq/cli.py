@@ -22,52 +22,416 @@
 
 from __future__ import annotations
 
+import os
+import sys
 import typing as t
-from queue import Queue
-from urllib import parse
+from pathlib import Path
 
 import click
 
-from ipq import __packagename__, __version__, errors, models, utils
+from ipq import __packagename__, __version__
+
+# These mirror bulk.DEFAULT_CONCURRENCY, output.WRITERS,
+# whois.get_backend and probe.METHODS, which are not imported here so
+# that --help and --version stay fast
+DEFAULT_CONCURRENCY = 16
+FORMATS = ("text", "jsonl", "csv")
+BACKENDS = ("native", "command", "rdap")
+METHODS = ("auto", "icmp", "tcp")
+
+
+def _nameservers(
+    ctx: click.Context, param: click.Parameter, value: t.Tuple[str, ...]
+) -> t.Tuple[str, ...]:
+    """Checks that each nameserver is an IP, with an optional port."""
+    import ipaddress
+
+    for nameserver in value:
+        host, sep, port = nameserver.partition("#")
+
+        try:
+            # Python 3.9+ would accept the scope of a link-local IP
+            ipaddress.ip_address(host.partition("%")[0])
+        except ValueError:
+            raise click.BadParameter(f"{host!r} is not an IP address.") from None
+
+        if sep and not (port.isdigit() and 0 < int(port) < 65536):
+            raise click.BadParameter(f"Expected a port from 1 to 65535, not {port!r}.")
+
+    return value
 
 
 @click.command(__packagename__)
 @click.version_option(__version__, "-v", "--version", prog_name=__packagename__)
 @click.help_option("-h", "--help")
-@click.argument("host", type=str, nargs=1)
-@click.option("-w", "--whois", is_flag=True, help="Include WHOIS data in results.")
+@click.argument("host", type=str, nargs=1, required=False)
+@click.option(
+    "-w", "--whois", "include_whois", is_flag=True, help="Include WHOIS data in results."
+)
 @click.option("-p", "--ping", is_flag=True, help="Ping the host.")
-def invoke(host: str, whois: bool, ping: bool) -> None:
-    """Quickly gather IP and domain name information."""
-    targets: t.List[t.Type[models.IPData] | t.Type[models.WhoisData]] = [models.IPData]
+@click.option("--ptr", is_flag=True, help="Only look up PTR records, skipping the IP WHOIS.")
+@click.option("--skip-no-ptr", is_flag=True, help="Leave out IPs that have no PTR record.")
+@click.option(
+    "--count",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of probes to send each host when pinging.",
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    show_default=True,
+    help="Seconds between probes to the same host.",
+)
+@click.option(
+    "--probe-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=1.0,
+    show_default=True,
+    help="Seconds to wait for each probe's reply.",
+)
+@click.option(
+    "--ports",
+    default="443,80",
+    show_default=True,
+    help="Ports to race for TCP probes, comma separated.",
+)
+@click.option(
+    "--probe-method",
+    type=click.Choice(METHODS),
+    default="auto",
+    show_default=True,
+    help="Ping with ICMP, timed TCP connects, or ICMP where allowed and TCP otherwise.",
+)
+@click.option(
+    "--deadline",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Seconds each host may take overall. What finished by then is still reported.",
+)
+@click.option(
+    "--stage-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Seconds each DNS, WHOIS or ping stage of a lookup may take.",
+)
+@click.option(
+    "--hedge",
+    type=click.FloatRange(min=0, max=100, min_open=True),
+    metavar="PERCENTILE",
+    help="Resend DNS and WHOIS queries slower than this percentile of earlier ones.",
+)
+@click.option(
+    "--hedge-nameserver",
+    "hedge_nameservers",
+    multiple=True,
+    callback=_nameservers,
+    help="Nameserver to send hedged DNS queries to, as IP or IP#port. Repeatable.",
+)
+@click.option(
+    "--geo-db",
+    type=click.Path(dir_okay=False),
+    help="GeoIP database to fill in IP info from, querying WHOIS only for IPs not in it.",
+)
+@click.option(
+    "--compile-geo-db",
+    "geo_csv",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Compile a CSV of start,end,country,city,org,asn[,postal] ranges to '--geo-db'.",
+)
+@click.option(
+    "-f",
+    "--file",
+    "hosts_file",
+    type=click.File("r"),
+    help="Read hosts from a file, one per line. Use '-' for stdin.",
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=DEFAULT_CONCURRENCY,
+    show_default=True,
+    help="Max number of hosts to look up at once in bulk mode.",
+)
+@click.option(
+    "--whois-backend",
+    type=click.Choice(BACKENDS),
+    default="native",
+    show_default=True,
+    help="Query WHOIS servers directly, with the 'whois' command, or over RDAP.",
+)
+@click.option(
+    "-o",
+    "--format",
+    "output_format",
+    type=click.Choice(FORMATS),
+    default="text",
+    show_default=True,
+    help="Output format. Records are written as each host finishes.",
+)
+@click.option(
+    "--no-netblock-cache",
+    is_flag=True,
+    help="Send every IP's WHOIS query, even if an earlier answer covered its netblock.",
+)
+@click.option(
+    "--no-daemon",
+    is_flag=True,
+    help="Run the lookups here, even if an 'ipq serve' daemon is running.",
+)
+@click.option("--no-cache", is_flag=True, help="Do not read or write the lookup cache.")
+@click.option("--refresh", is_flag=True, help="Ignore cached results, but store new ones.")
+@click.option(
+    "--cache-stats",
+    is_flag=True,
+    help="Print cache hits and misses, and deduplicated queries, when done.",
+)
+@click.option(
+    "--timings",
+    "show_timings",
+    is_flag=True,
+    help="Print how long each stage of each lookup took to stderr.",
+)
+def invoke(
+    host: str | None,
+    include_whois: bool,
+    ping: bool,
+    ptr: bool,
+    skip_no_ptr: bool,
+    count: int,
+    interval: float,
+    probe_timeout: float,
+    ports: str,
+    probe_method: str,
+    deadline: float | None,
+    stage_timeout: float | None,
+    hedge: float | None,
+    hedge_nameservers: t.Tuple[str, ...],
+    geo_db: str | None,
+    geo_csv: str | None,
+    hosts_file: t.TextIO | None,
+    concurrency: int,
+    whois_backend: str,
+    output_format: str,
+    no_netblock_cache: bool,
+    no_daemon: bool,
+    no_cache: bool,
+    refresh: bool,
+    cache_stats: bool,
+    show_timings: bool,
+) -> None:
+    """Quickly gather IP and domain name information.
+
+    HOST may also be a CIDR block like 10.0.0.0/24, or an IP range like
+    10.0.0.1-10.0.0.50 or 10.0.0.1-50, to look up every address in it.
+
+    Lookups are forwarded to the 'ipq serve' daemon when it is running.
+    """
+    if geo_csv:
+        if not geo_db:
+            raise click.UsageError("'--compile-geo-db' requires '--geo-db' to write to.")
+
+        from ipq import geo
+
+        ranges = geo.compile_csv(geo_csv, geo_db)
+        click.echo(f"Compiled {ranges} ranges to '{geo_db}'.")
+
+        if not host and not hosts_file:
+            return
+
+    if host == "-":
+        if hosts_file:
+            raise click.UsageError("Pass either a HOST or '--file', not both.")
+
+        hosts_file = sys.stdin
+        host = None
+
+    if hosts_file and host:
+        raise click.UsageError("Pass either a HOST or '--file', not both.")
+
+    if not hosts_file and not host:
+        raise click.UsageError("Missing argument 'HOST'.")
+
+    if ptr and (include_whois or ping):
+        raise click.UsageError("'--ptr' cannot be combined with '-w' or '-p'.")
+
+    if hedge_nameservers and not hedge:
+        raise click.UsageError("'--hedge-nameserver' requires '--hedge'.")
 
-    queue: Queue[str] = Queue(2)
-    output: t.List[str] = []
+    try:
+        probe_ports = tuple(int(p) for p in ports.split(",") if p.strip())
+    except ValueError:
+        probe_ports = ()
 
-    parsed = parse.urlparse(host)
-    host = parsed.netloc or parsed.path or host
+    if not probe_ports or not all(0 < p < 65536 for p in probe_ports):
+        raise click.BadParameter("Expected ports from 1 to 65535.", param_hint="'--ports'")
 
-    domain = utils.DOMAIN_RGX.match(host)
-    ip = utils.IP_RGX.match(host)
+    options: t.Dict[str, t.Any] = dict(
+        include_whois=include_whois,
+        ping=ping,
+        ptr=ptr,
+        skip_no_ptr=skip_no_ptr,
+        whois_backend=whois_backend,
+        output_format=output_format,
+        concurrency=concurrency,
+        use_cache=not no_cache,
+        refresh=refresh,
+        cache_stats=cache_stats,
+        show_timings=show_timings,
+        count=count,
+        interval=interval,
+        probe_timeout=probe_timeout,
+        ports=probe_ports,
+        probe_method=probe_method,
+        deadline=deadline,
+        stage_timeout=stage_timeout,
+        hedge=hedge,
+        hedge_nameservers=hedge_nameservers,
+        geo_db=geo_db and os.path.abspath(geo_db),
+        netblocks=not no_netblock_cache,
+    )
+
+    if not no_daemon and not show_timings:
+        from ipq import remote
+
+        forwarded = remote.forward(host, hosts_file, options)
+
+        if forwarded is not None:
+            if not forwarded:
+                sys.exit(1)
+
+            return None
+
+    from ipq import runner
+
+    if not runner.run(host, hosts_file, runner.Options(**options)):
+        sys.exit(1)
+
+
+@click.command("serve")
+@click.help_option("-h", "--help")
+@click.option(
+    "--socket",
+    "path",
+    type=click.Path(dir_okay=False),
+    help="Unix socket to listen on. Defaults to '$IPQ_SOCKET', then the user runtime dir.",
+)
+def serve(path: str | None) -> None:
+    """Run a daemon that later ipq commands forward their lookups to.
+
+    It keeps DNS and WHOIS connections, rate limits and caches warm
+    between runs. Stop it with Ctrl+C or SIGTERM.
+    """
+    from ipq import errors, remote, utils
+
+    if remote.running(Path(path) if path else None):
+        raise errors.IpqError("An ipq daemon is already running.")
+
+    # Set before the output module copies them, the client strips
+    # them again when it is not writing to a terminal
+    utils.set_colors(True)
+
+    from ipq import daemon
+
+    daemon.serve(path)
+
+
+@click.command("watch")
+@click.help_option("-h", "--help")
+@click.argument("hosts", nargs=-1)
+@click.option(
+    "-f",
+    "--file",
+    "hosts_file",
+    type=click.File("r"),
+    help="Start watching the hosts in a file, one per line. Use '-' for stdin.",
+)
+@click.option(
+    "--remove",
+    is_flag=True,
+    help="Stop watching HOSTS and those in '--file' instead, checking nothing.",
+)
+@click.option(
+    "--state",
+    "path",
+    type=click.Path(dir_okay=False),
+    help="State store to use. Defaults to 'watch.sqlite3' beside the cache.",
+)
+@click.option(
+    "--max-age",
+    type=click.FloatRange(min=0, min_open=True),
+    default=7.0,
+    show_default=True,
+    help="Days between checks of a host, fewer as its expiry date nears.",
+)
+@click.option(
+    "--limit",
+    type=click.IntRange(min=1),
+    help="Check at most this many of the due hosts, the most overdue first.",
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=DEFAULT_CONCURRENCY,
+    show_default=True,
+    help="Max number of hosts to check at once.",
+)
+@click.option(
+    "--whois-backend",
+    type=click.Choice(BACKENDS),
+    default="native",
+    show_default=True,
+    help="Query WHOIS servers directly, with the 'whois' command, or over RDAP.",
+)
+@click.option(
+    "-o",
+    "--format",
+    "output_format",
+    type=click.Choice(("text", "jsonl")),
+    default="text",
+    show_default=True,
+    help="Output format of the changes.",
+)
+def watch(
+    hosts: t.Tuple[str, ...],
+    hosts_file: t.TextIO | None,
+    remove: bool,
+    path: str | None,
+    max_age: float,
+    limit: int | None,
+    concurrency: int,
+    whois_backend: str,
+    output_format: str,
+) -> None:
+    """Check watched hosts that are due, printing what changed.
 
-    if not domain and not ip:
-        raise errors.InvalidHost(f"{host!r} is not a valid domain or IP address.")
+    HOSTS, and those in '--file', are added to the watch list. Every
+    watched host that is due is then queried, and any WHOIS or IP info
+    fields that changed since its last check are printed.
 
-    if ping:
-        raw_ping = models.PingData.new(host, 1)
-        print(raw_ping.data)
-        return None
+    With '--remove', HOSTS and those in '--file' are taken off the
+    watch list instead.
+    """
+    from ipq import bulk, watch
 
-    if ip and whois:
-        raise errors.InvalidHost(f"You must pass a domain as the host for the '-w' flag.")
+    if hosts_file:
+        hosts += tuple(bulk.read_hosts(hosts_file))
 
-    if whois:
-        targets.append(models.WhoisData)
+    ok = watch.watch(
+        hosts,
+        remove=remove,
+        path=path,
+        max_age=max_age * 24 * 60 * 60,
+        limit=limit,
+        concurrency=concurrency,
+        whois_backend=whois_backend,
+        output_format=output_format,
+    )
 
-    for target in targets:
-        target.new(queue, host)
+    if not ok:
+        sys.exit(1)
 
-    while not queue.empty():
-        output.append(queue.get())
 
-    print("\n".join(output))
+COMMANDS: t.Dict[str, click.Command] = {"serve": serve, "watch": watch}
@@ -0,0 +1,507 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""The ipq library API.
+
+`lookup` is the simplest way in, and `alookup` and `alookup_many` are
+its asyncio counterparts. Use a `Client` to share the resolver,
+WHOIS connections and cache between many lookups.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import typing as t
+
+from ipq import bulk, errors, models, suffix, timings, utils
+
+if t.TYPE_CHECKING:
+    from ipq import cache, coalesce, dns, geo, hedge, probe, whois
+
+__all__ = ("Client", "alookup", "alookup_many", "lookup")
+
+T = t.TypeVar("T")
+
+
+class Client:
+    """Looks up information about hosts.
+
+    The resolver and WHOIS backend are opened on first use, unless
+    they are passed in, and closed with the client. Their modules are
+    only imported then too, so pinging an IP never loads them. Pass a
+    `Prober` to change how hosts are pinged, and a `Cache` to reuse
+    results across lookups and runs.
+
+    `deadline` bounds how long each host may take overall, and
+    `stage_timeout` each DNS, WHOIS or ping stage of it. A `Hedger`
+    sends backup queries for stages that are running slow. With a
+    `GeoDB`, IPs it knows about skip the IP WHOIS entirely.
+
+    IP WHOIS answers are reused for every IP in the netblock they
+    cover, unless `netblocks` is False. Domain WHOIS is queried for
+    the registrable domain, so subdomains share its cache entry.
+    Identical DNS and WHOIS queries in flight at once are sent only
+    once, see `deduplicated`.
+    """
+
+    __slots__ = (
+        "deadline",
+        "stage_timeout",
+        "_resolver",
+        "_whois",
+        "_whois_backend",
+        "_prober",
+        "_cache",
+        "_hedger",
+        "_geo",
+        "_netblocks",
+        "_calls",
+        "_direct",
+        "_owned",
+    )
+
+    def __init__(
+        self,
+        resolver: dns.Resolver | None = None,
+        whois_client: whois.WhoisBackend | None = None,
+        *,
+        whois_backend: str = "native",
+        prober: probe.Prober | None = None,
+        lookup_cache: cache.Cache | None = None,
+        deadline: float | None = None,
+        stage_timeout: float | None = None,
+        hedger: hedge.Hedger | None = None,
+        geo_db: geo.GeoDB | None = None,
+        netblocks: bool = True,
+    ) -> None:
+        self.deadline = deadline
+        self.stage_timeout = stage_timeout
+        self._hedger = hedger
+        self._geo = geo_db
+        self._netblocks = netblocks
+        self._resolver = resolver
+        self._whois = whois_client
+        self._whois_backend = whois_backend
+        self._prober = prober
+        self._cache = lookup_cache
+        self._calls: t.Dict[str, coalesce.Coalescer[t.Any]] = {}
+        self._direct: t.Dict[str, t.Any] = {}
+        self._owned: t.List[dns.Resolver | whois.WhoisBackend | probe.Prober] = []
+
+        if resolver:
+            self._resolver = self._wrap_resolver(resolver)
+
+        if whois_client:
+            self._whois = self._wrap_whois(whois_client)
+
+    def _wrap_resolver(self, resolver: dns.Resolver) -> dns.Resolver:
+        """Puts the cache and coalescing in front of the resolver."""
+        from ipq.coalesce import CoalescingResolver
+
+        if self._cache:
+            from ipq.cache import CachedResolver
+
+            resolver = CachedResolver(resolver, self._cache)
+
+        coalescing = CoalescingResolver(resolver)
+        self._calls["dns"] = coalescing.calls
+        self._direct["dns"] = resolver
+        return coalescing
+
+    def _wrap_whois(self, backend: whois.WhoisBackend) -> whois.WhoisBackend:
+        """Puts the cache, netblock index and coalescing in front of the
+        backend.
+        """
+        from ipq.coalesce import CoalescingWhois
+
+        if self._cache:
+            from ipq.cache import CachedWhois
+
+            backend = CachedWhois(backend, self._cache)
+
+        if self._netblocks:
+            from ipq.netblock import NetblockWhois
+
+            backend = NetblockWhois(backend, self._cache)
+
+        coalescing = CoalescingWhois(backend)
+        self._calls["whois"] = coalescing.calls
+        self._direct["whois"] = backend
+        return coalescing
+
+    def _backup_resolver(self) -> dns.Resolver:
+        """Gets where hedged DNS queries go.
+
+        Past the coalescing, or the backup would just wait on the slow
+        query it is meant to race.
+        """
+        if self._hedger and self._hedger.resolver:
+            return self._hedger.resolver
+
+        return t.cast("dns.Resolver", self._direct.get("dns") or self.resolver)
+
+    def _backup_whois(self) -> whois.WhoisBackend:
+        """Gets where hedged WHOIS queries go, past the coalescing."""
+        if self._hedger and self._hedger.whois_client:
+            return self._hedger.whois_client
+
+        return t.cast("whois.WhoisBackend", self._direct.get("whois") or self.whois)
+
+    async def __aenter__(self) -> Client:
+        return self
+
+    async def __aexit__(self, *_: t.Any) -> None:
+        await self.close()
+
+    @property
+    def resolver(self) -> dns.Resolver:
+        """The resolver used for DNS lookups."""
+        if self._resolver is None:
+            from ipq.dns import get_resolver
+
+            resolver = get_resolver()
+            self._owned.append(resolver)
+            self._resolver = self._wrap_resolver(resolver)
+
+        return self._resolver
+
+    @property
+    def whois(self) -> whois.WhoisBackend:
+        """The backend used for WHOIS queries."""
+        if self._whois is None:
+            from ipq.whois import get_backend
+
+            backend = get_backend(self._whois_backend)
+            self._owned.append(backend)
+            self._whois = self._wrap_whois(backend)
+
+        return self._whois
+
+    @property
+    def deduplicated(self) -> t.Dict[str, int]:
+        """How many DNS and WHOIS queries were skipped, as an identical
+        one was already in flight.
+        """
+        return {kind: calls.deduplicated for kind, calls in self._calls.items()}
+
+    @property
+    def prober(self) -> probe.Prober:
+        """The prober used to ping hosts."""
+        if self._prober is None:
+            from ipq.probe import Prober
+
+            self._prober = Prober()
+            self._owned.append(self._prober)
+
+        return self._prober
+
+    async def close(self) -> None:
+        """Closes the backends this client opened."""
+        owned, self._owned = self._owned, []
+        await asyncio.gather(*(backend.close() for backend in owned))
+
+    async def lookup(
+        self, host: str, *, whois: bool = False, ping: bool = False, ptr: bool = False
+    ) -> models.LookupResult:
+        """Gathers the requested information for the host.
+
+        Sections that fail or miss the deadline are left out and listed
+        in `failures`, so the rest are still returned. The error is
+        raised only if every section failed.
+        """
+        host = utils.normalize_host(host)
+        tasks = self._sections(host, whois=whois, ping=ping, ptr=ptr)
+
+        try:
+            _, pending = await asyncio.wait(tasks.values(), timeout=self.deadline)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        sections: t.Dict[str, models.SectionT] = {}
+        failures: t.List[t.Tuple[str, errors.IpqError]] = []
+
+        for name, task in tasks.items():
+            if task in pending:
+                failures.append((name, self._deadline_error(host)))
+            elif isinstance(task.exception(), errors.IpqError):
+                failures.append((name, t.cast(errors.IpqError, task.exception())))
+            else:
+                sections[name] = task.result()
+
+        if not sections:
+            raise failures[0][1]
+
+        return models.LookupResult(
+            host,
+            t.cast(t.Optional[models.IPData], sections.get("ip")),
+            t.cast(t.Optional[models.WhoisData], sections.get("whois")),
+            t.cast(t.Optional[models.PingData], sections.get("ping")),
+            t.cast(t.Optional[models.PTRData], sections.get("ptr")),
+            tuple((name, e.message) for name, e in failures),
+        )
+
+    async def stream(
+        self, host: str, *, whois: bool = False, ping: bool = False, ptr: bool = False
+    ) -> t.AsyncIterator[t.Tuple[str, models.SectionT | errors.IpqError]]:
+        """Yields each requested section as soon as it is ready.
+
+        Yields `(name, section)` pairs. Independent lookups run
+        concurrently. Pinging, or looking up only the PTR record,
+        skips the other sections. A section that fails or misses the
+        deadline is paired with its error instead, so the rest still
+        arrive.
+        """
+        host = utils.normalize_host(host)
+        tasks = self._sections(host, whois=whois, ping=ping, ptr=ptr)
+        pending = set(tasks.values())
+        loop = asyncio.get_event_loop()
+        deadline = None if self.deadline is None else loop.time() + self.deadline
+
+        try:
+            while pending:
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    for name, task in tasks.items():
+                        if task in pending:
+                            yield name, self._deadline_error(host)
+
+                    return
+
+                for name, task in tasks.items():
+                    if task in done:
+                        error = task.exception()
+
+                        if isinstance(error, errors.IpqError):
+                            yield name, error
+                        else:
+                            yield name, task.result()
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    def _sections(
+        self, host: str, *, whois: bool, ping: bool, ptr: bool
+    ) -> t.Dict[str, asyncio.Future[models.SectionT]]:
+        """Starts the lookup of each requested section, by name."""
+        lookups: t.Dict[str, t.Awaitable[models.SectionT]] = {}
+
+        if ping:
+            lookups["ping"] = self.ping(host)
+        elif ptr:
+            lookups["ptr"] = self.lookup_ptr(host)
+        elif whois and utils.IP_RGX.match(host):
+            raise errors.InvalidHost("You must pass a domain as the host for the '-w' flag.")
+        else:
+            lookups["ip"] = self.lookup_ip(host)
+
+            if whois:
+                lookups["whois"] = self.lookup_whois(host)
+
+        return {name: asyncio.ensure_future(lookup) for name, lookup in lookups.items()}
+
+    def _deadline_error(self, host: str) -> errors.LookupTimeout:
+        return errors.LookupTimeout(f"{host!r} did not finish within {self.deadline:g}s.")
+
+    async def lookup_ip(self, host: str) -> models.IPData:
+        """Looks up the IP of the host, and who it belongs to.
+
+        The reverse lookup and the IP WHOIS only depend on the IP, so
+        they run at the same time once it is known. The WHOIS is only
+        sent if the GeoIP database, if any, has no range for the IP.
+        """
+        host = utils.normalize_host(host)
+
+        with timings.for_host(host):
+            ip = await self._resolve(host)
+
+            if self._geo:
+                with timings.stage("geo"):
+                    record = self._geo.lookup(ip)
+
+                if record:
+                    return models.IPData.from_geo(ip, await self._reverse(ip), record)
+
+            hostname, data = await asyncio.gather(
+                self._reverse(ip), self._query_whois(ip, "whois.ip")
+            )
+
+            with timings.stage("parse.ip"):
+                return models.IPData.from_response(ip, hostname, data)
+
+    async def lookup_whois(self, host: str) -> models.WhoisData:
+        """Looks up the WHOIS info of the hosts registrable domain."""
+        host = utils.normalize_host(host)
+        domain = suffix.registrable_domain(host) or host
+
+        with timings.for_host(host):
+            return await self._whois_domain(domain)
+
+    async def lookup_ptr(self, host: str) -> models.PTRData:
+        """Looks up only the PTR record of the hosts IP.
+
+        This skips the IP WHOIS, so sweeping a whole network does not
+        send a WHOIS query for every address in it.
+        """
+        host = utils.normalize_host(host)
+
+        with timings.for_host(host):
+            ip = await self._resolve(host)
+            return models.PTRData(ip, await self._reverse(ip))
+
+    async def ping(self, host: str) -> models.PingData:
+        """Probes the host, resolving it first if it is a domain."""
+        host = utils.normalize_host(host)
+
+        with timings.for_host(host):
+            ip = await self._resolve(host)
+            return await self._stage("ping", lambda: self.prober.probe(ip))
+
+    async def _stage(
+        self,
+        name: str,
+        query: t.Callable[[], t.Awaitable[T]],
+        backup: t.Callable[[], t.Awaitable[T]] | None = None,
+    ) -> T:
+        """Runs one stage of a lookup, hedged with the backup query if
+        there is a hedger, and within the stage timeout.
+        """
+        if self._hedger and backup:
+            awaitable: t.Awaitable[T] = self._hedger.run(name, query, backup)
+        else:
+            awaitable = query()
+
+        with timings.stage(name):
+            try:
+                return await asyncio.wait_for(awaitable, self.stage_timeout)
+            except asyncio.TimeoutError:
+                raise errors.LookupTimeout(
+                    f"The {name} stage timed out after {self.stage_timeout:g}s."
+                ) from None
+
+    async def _resolve(self, host: str) -> str:
+        """Gets the IP of the host, which may already be one."""
+        if utils.IP_RGX.match(host):
+            return host
+
+        records = await self._stage(
+            "dns.forward",
+            lambda: self.resolver.resolve(host),
+            lambda: self._backup_resolver().resolve(host),
+        )
+        return records[0]
+
+    async def _whois_domain(self, domain: str) -> models.WhoisData:
+        data = await self._query_whois(domain, "whois.domain")
+
+        with timings.stage("parse.domain"):
+            return models.WhoisData.from_response(data)
+
+    async def _query_whois(self, query: str, stage: str) -> str:
+        return await self._stage(
+            stage, lambda: self.whois.query(query), lambda: self._backup_whois().query(query)
+        )
+
+    async def _reverse(self, ip: str) -> str:
+        """Gets the hostname of the IP, if it has one."""
+        try:
+            return await self._stage(
+                "dns.reverse",
+                lambda: self.resolver.reverse(ip),
+                lambda: self._backup_resolver().reverse(ip),
+            )
+        except errors.ResolverError:
+            return models.NOT_FOUND
+
+
+async def alookup(
+    host: str,
+    *,
+    whois: bool = False,
+    ping: bool = False,
+    ptr: bool = False,
+    client: Client | None = None,
+) -> models.LookupResult:
+    """Looks up the host without blocking the event loop.
+
+    Pass a `Client` to reuse its connections, otherwise one is opened
+    for this lookup only.
+    """
+    if client is None:
+        async with Client() as client:
+            return await client.lookup(host, whois=whois, ping=ping, ptr=ptr)
+
+    return await client.lookup(host, whois=whois, ping=ping, ptr=ptr)
+
+
+async def alookup_many(
+    hosts: t.Iterable[str] | t.AsyncIterable[str],
+    *,
+    whois: bool = False,
+    ping: bool = False,
+    ptr: bool = False,
+    concurrency: int = bulk.DEFAULT_CONCURRENCY,
+    client: Client | None = None,
+) -> t.AsyncGenerator[t.Tuple[str, models.LookupResult | errors.IpqError], None]:
+    """Looks up many hosts, yielding each one as it finishes.
+
+    Yields `(host, result)` pairs in completion order. A host that
+    fails is paired with its error instead, so one bad host does not
+    stop the rest. At most `concurrency` hosts are in flight, and
+    hosts are pulled from the iterable only as they are needed. An
+    async iterable works too, for hosts that arrive over time.
+    """
+    if client is None:
+        async with Client() as client:
+            async for item in alookup_many(
+                hosts, whois=whois, ping=ping, ptr=ptr, concurrency=concurrency, client=client
+            ):
+                yield item
+
+        return
+
+    async def query(host: str) -> models.LookupResult:
+        return await client.lookup(host, whois=whois, ping=ping, ptr=ptr)
+
+    results = bulk.run(query, hosts, concurrency)
+
+    try:
+        async for host, future in results:
+            try:
+                yield host, future.result()
+            except errors.IpqError as e:
+                yield host, e
+    finally:
+        # Cancels what is still in flight now, not once collected
+        await results.aclose()
+
+
+def lookup(
+    host: str, *, whois: bool = False, ping: bool = False, ptr: bool = False
+) -> models.LookupResult:
+    """Looks up the host, blocking until every section is done.
+
+    Must not be called from a running event loop, use `alookup` there.
+    """
+    return asyncio.run(alookup(host, whois=whois, ping=ping, ptr=ptr))
@@ -0,0 +1,140 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Coalesces identical DNS and WHOIS queries that are in flight.
+
+While a query for a key is running, later callers asking for the same
+key wait on it instead of sending their own. This works with or
+without the cache, which only helps once a first answer is in.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import typing as t
+
+from ipq import dns, whois
+
+__all__ = ("Coalescer", "CoalescingResolver", "CoalescingWhois")
+
+R = t.TypeVar("R")
+
+
+class _Call(t.Generic[R]):
+    """A running call, and how many callers are waiting on it."""
+
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: asyncio.Future[R]) -> None:
+        self.future = future
+        self.waiters = 0
+
+
+class Coalescer(t.Generic[R]):
+    """Shares each running call with every caller of the same key.
+
+    `deduplicated` counts the calls that were not made because one for
+    their key was already running. A call is only cancelled once every
+    caller waiting on it has been.
+    """
+
+    __slots__ = ("deduplicated", "_calls")
+
+    def __init__(self) -> None:
+        self.deduplicated = 0
+        self._calls: t.Dict[t.Hashable, _Call[R]] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def run(self, key: t.Hashable, func: t.Callable[[], t.Awaitable[R]]) -> R:
+        """Awaits the running call for the key, or starts one."""
+        call = self._calls.get(key)
+
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.ensure_future(func()))
+            call.future.add_done_callback(lambda _: self._finished(key, call))
+        else:
+            self.deduplicated += 1
+
+        call.waiters += 1
+
+        try:
+            return await asyncio.shield(call.future)
+        except asyncio.CancelledError:
+            if call.waiters == 1:
+                # Forgotten now, so no new caller joins it as it stops
+                self._forget(key, call)
+                call.future.cancel()
+
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: t.Hashable, call: _Call[R]) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _finished(self, key: t.Hashable, call: _Call[R]) -> None:
+        self._forget(key, call)
+
+        if not call.future.cancelled():
+            # Retrieved, so it is not logged when no one is waiting
+            call.future.exception()
+
+
+class CoalescingResolver(dns.Resolver):
+    """Coalesces identical queries in flight on a resolver."""
+
+    __slots__ = ("calls", "resolver")
+
+    def __init__(
+        self, resolver: dns.Resolver, calls: Coalescer[t.List[str]] | None = None
+    ) -> None:
+        super().__init__(resolver.timeout, resolver.max_in_flight)
+        self.resolver = resolver
+        self.calls = calls or Coalescer()
+
+    async def close(self) -> None:
+        await self.resolver.close()
+
+    async def query(self, name: str, qtype: str) -> t.List[str]:
+        return await self.calls.run(
+            (qtype, name.lower()), lambda: self.resolver.query(name, qtype)
+        )
+
+    async def _query(self, name: str, qtype: str) -> t.List[str]:
+        return await self.resolver.query(name, qtype)
+
+
+class CoalescingWhois(whois.WhoisBackend):
+    """Coalesces identical queries in flight on a WHOIS backend."""
+
+    __slots__ = ("backend", "calls")
+
+    def __init__(self, backend: whois.WhoisBackend, calls: Coalescer[str] | None = None) -> None:
+        self.backend = backend
+        self.calls = calls or Coalescer()
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    async def query(self, query: str) -> str:
+        return await self.calls.run(query.lower(), lambda: self.backend.query(query))
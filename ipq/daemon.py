@@ -0,0 +1,272 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""The `ipq serve` daemon, which keeps lookup state warm between runs.
+
+Clients are opened once per distinct set of options and kept, so their
+resolvers, WHOIS connections, rate limits, netblock index and cache
+carry over from one request to the next. Only the most recently used
+few are kept open. See `ipq.remote` for the protocol.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import signal
+import sys
+import typing as t
+from pathlib import Path
+
+from ipq import bulk, cache, client, errors, remote, runner
+
+__all__ = ("Server", "serve")
+
+MAX_SESSIONS = 8
+
+# Options that only change what is looked up or how it is printed,
+# so requests differing in just these can share a client
+_PER_REQUEST = frozenset(
+    (
+        "include_whois",
+        "ping",
+        "ptr",
+        "skip_no_ptr",
+        "output_format",
+        "concurrency",
+        "cache_stats",
+        "show_timings",
+    )
+)
+
+
+class _Stream(io.TextIOBase):
+    """Sends what is written to it to the client, tagged by stream.
+
+    Writes are buffered by the transport, so the runner awaits
+    `StreamWriter.drain` after each host to keep the buffer small.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter, name: str) -> None:
+        super().__init__()
+        self._writer = writer
+        self._name = name
+
+    def write(self, text: str) -> int:
+        if text and not self._writer.is_closing():
+            self._writer.write(json.dumps({self._name: text}).encode("utf-8") + b"\n")
+
+        return len(text)
+
+
+class _Session:
+    """A client kept open between requests."""
+
+    __slots__ = ("client", "stack", "users")
+
+    def __init__(self, session: client.Client, stack: contextlib.AsyncExitStack) -> None:
+        self.client = session
+        self.stack = stack
+        self.users = 0
+
+
+async def _read_hosts(reader: asyncio.StreamReader) -> t.AsyncIterator[str]:
+    """Yields the hosts the client sends, until it stops writing."""
+    while True:
+        line = await reader.readline()
+
+        if not line:
+            return
+
+        for host in bulk.read_hosts((line.decode("utf-8", "replace"),)):
+            yield host
+
+
+class Server:
+    """Serves lookups over a Unix socket, until it is closed.
+
+    Up to `max_sessions` clients are kept open for later requests.
+    Past that, the least recently used ones are closed once idle.
+    """
+
+    __slots__ = ("path", "max_sessions", "_caches", "_sessions", "_lock")
+
+    def __init__(self, path: str | Path | None = None, max_sessions: int = MAX_SESSIONS) -> None:
+        self.path = Path(path) if path else remote.socket_path()
+        self.max_sessions = max_sessions
+        self._caches: t.Dict[bool, cache.Cache] = {}
+        self._sessions: t.OrderedDict[t.Tuple[t.Any, ...], _Session] = collections.OrderedDict()
+        self._lock: asyncio.Lock | None = None
+
+    async def __aenter__(self) -> Server:
+        return self
+
+    async def __aexit__(self, *_: t.Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Closes every client and cache the server opened."""
+        while self._sessions:
+            _, session = self._sessions.popitem()
+            await session.stack.aclose()
+
+        for lookup_cache in self._caches.values():
+            lookup_cache.close()
+
+        self._caches.clear()
+
+    async def serve(self, ready: t.Callable[[], None] | None = None) -> None:
+        """Listens on the socket until cancelled."""
+        if remote.running(self.path):
+            raise errors.IpqError(f"An ipq daemon is already listening on '{self.path}'.")
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with contextlib.suppress(FileNotFoundError):
+            # Left behind by a daemon that did not exit cleanly
+            self.path.unlink()
+
+        server = await asyncio.start_unix_server(self.handle, str(self.path))
+        os.chmod(self.path, 0o600)
+
+        try:
+            if ready:
+                ready()
+
+            await asyncio.Event().wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+            with contextlib.suppress(FileNotFoundError):
+                self.path.unlink()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Runs one request, streaming its output back."""
+        out = t.cast(t.TextIO, _Stream(writer, "out"))
+        err = t.cast(t.TextIO, _Stream(writer, "err"))
+        ok = False
+
+        try:
+            request = json.loads(await reader.readline())
+            options = runner.Options(**request["options"])
+            options.ports = tuple(options.ports)
+            options.hedge_nameservers = tuple(options.hedge_nameservers)
+            hosts = _read_hosts(reader) if request["hosts"] else None
+
+            async with self.session(options) as session:
+                try:
+                    ok = await runner.execute(
+                        request["host"], hosts, options, session, out, err, drain=writer.drain
+                    )
+                except errors.IpqError as e:
+                    print(e, file=out)
+
+            if options.cache_stats and options.use_cache:
+                stats = self._caches[options.refresh].stats()
+                print(f"Cache: {stats or 'unused'}", file=err)
+
+        except (ValueError, KeyError, TypeError) as e:
+            print(errors.IpqError(f"Invalid request: {e}."), file=err)
+        except ConnectionError:
+            # The client went away, there is no one left to reply to
+            pass
+        finally:
+            if not writer.is_closing():
+                writer.write(json.dumps({"ok": ok}).encode("utf-8") + b"\n")
+
+                with contextlib.suppress(ConnectionError):
+                    await writer.drain()
+
+                writer.close()
+
+    @contextlib.asynccontextmanager
+    async def session(self, options: runner.Options) -> t.AsyncIterator[client.Client]:
+        """Uses the client for the options, opening it if needed."""
+        key = tuple(
+            value
+            for name, value in dataclasses.asdict(options).items()
+            if name not in _PER_REQUEST
+        )
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            session = self._sessions.get(key)
+
+            if session is None:
+                lookup_cache = None
+
+                if options.use_cache:
+                    if options.refresh not in self._caches:
+                        self._caches[options.refresh] = cache.Cache(refresh=options.refresh)
+
+                    lookup_cache = self._caches[options.refresh]
+
+                stack = contextlib.AsyncExitStack()
+                opened = await stack.enter_async_context(runner.open_client(options, lookup_cache))
+                session = self._sessions[key] = _Session(opened, stack)
+
+            self._sessions.move_to_end(key)
+            session.users += 1
+
+        try:
+            yield session.client
+        finally:
+            session.users -= 1
+            await self._evict()
+
+    async def _evict(self) -> None:
+        """Closes least recently used idle clients over the limit."""
+        while len(self._sessions) > self.max_sessions:
+            idle = (key for key, session in self._sessions.items() if not session.users)
+            key = next(idle, None)
+
+            if key is None:
+                return
+
+            await self._sessions.pop(key).stack.aclose()
+
+
+def serve(path: str | Path | None = None) -> None:
+    """Runs the daemon until it is interrupted or terminated."""
+
+    async def main() -> None:
+        task = asyncio.ensure_future(run())
+
+        with contextlib.suppress(NotImplementedError):
+            asyncio.get_event_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    async def run() -> None:
+        async with Server(path) as server:
+            ready = lambda: print(f"Listening on '{server.path}'.", file=sys.stderr)
+            await server.serve(ready)
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(main())
@@ -0,0 +1,446 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Asynchronous DNS resolver backends."""
+
+from __future__ import annotations
+
+import abc
+import asyncio
+import ipaddress
+import itertools
+import random
+import socket
+import struct
+import sys
+import time
+import typing as t
+
+from ipq import errors, timings, utils
+
+__all__ = (
+    "AiodnsResolver",
+    "NSLookupResolver",
+    "Resolver",
+    "UDPResolver",
+    "get_resolver",
+)
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_MAX_IN_FLIGHT = 256
+RESOLV_CONF = "/etc/resolv.conf"
+
+QTYPES: t.Dict[str, int] = {"A": 1, "PTR": 12, "AAAA": 28}
+
+
+class Resolver(abc.ABC):
+    """Base class all resolver backends inherit from.
+
+    Resolvers are async context managers, and should be closed once
+    they are no longer needed. Any number of queries can be made on a
+    single resolver at once, though only `max_in_flight` of them are
+    sent at any one time so bursts do not overrun socket buffers.
+    """
+
+    __slots__ = ("max_in_flight", "timeout", "_slots")
+
+    def __init__(
+        self, timeout: float = DEFAULT_TIMEOUT, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT
+    ) -> None:
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self._slots: asyncio.Semaphore | None = None
+
+    async def __aenter__(self) -> Resolver:
+        return self
+
+    async def __aexit__(self, *_: t.Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Releases any resources held by the resolver."""
+
+    async def query(self, name: str, qtype: str) -> t.List[str]:
+        """Queries for records of the given type, with a timeout.
+
+        Raises `ResolverError` if the query fails, times out, or
+        returns no records.
+        """
+        if qtype not in QTYPES:
+            raise errors.ResolverError(f"Unsupported DNS query type {qtype!r}.")
+
+        if self._slots is None:
+            # Created lazily so it binds to the running loop
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+        async with self._slots:
+            try:
+                query = self._query(name.lower(), qtype)
+                records = await asyncio.wait_for(query, self.timeout)
+            except asyncio.TimeoutError:
+                message = f"DNS {qtype} query for {name!r} timed out."
+                raise errors.ResolverError(message) from None
+
+        if not records:
+            raise errors.NoRecordsError(f"No DNS {qtype} records found for {name!r}.")
+
+        return records
+
+    async def resolve(self, host: str) -> t.List[str]:
+        """Returns the hosts IPv4 addresses, or IPv6 if it has none.
+
+        Other failures, like timeouts, are raised without trying IPv6.
+        """
+        try:
+            return await self.query(host, "A")
+        except errors.NoRecordsError:
+            return await self.query(host, "AAAA")
+
+    async def reverse(self, ip: str) -> str:
+        """Returns the hostname the IP points back to."""
+        try:
+            name = ipaddress.ip_address(ip).reverse_pointer
+        except ValueError:
+            raise errors.ResolverError(f"{ip!r} is not a valid IP address.") from None
+
+        return (await self.query(name, "PTR"))[0]
+
+    @abc.abstractmethod
+    async def _query(self, name: str, qtype: str) -> t.List[str]:
+        """Performs the actual query, without a timeout."""
+
+
+class AiodnsResolver(Resolver):
+    """Resolves with `aiodns`, from the `speedups` extra."""
+
+    __slots__ = ("_resolver",)
+
+    def __init__(
+        self, timeout: float = DEFAULT_TIMEOUT, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT
+    ) -> None:
+        super().__init__(timeout, max_in_flight)
+        self._resolver: t.Any = None
+
+    async def close(self) -> None:
+        if self._resolver is not None:
+            self._resolver.cancel()
+            self._resolver = None
+
+    async def _query(self, name: str, qtype: str) -> t.List[str]:
+        import aiodns
+
+        if self._resolver is None:
+            self._resolver = aiodns.DNSResolver(timeout=self.timeout)
+
+        try:
+            result = await self._resolver.query(name, qtype)
+        except aiodns.error.DNSError as e:
+            message = f"DNS {qtype} query for {name!r} failed: {e}."
+
+            if e.args and e.args[0] in (aiodns.error.ARES_ENOTFOUND, aiodns.error.ARES_ENODATA):
+                raise errors.NoRecordsError(message) from e
+
+            raise errors.ResolverError(message) from e
+
+        if qtype == "PTR":
+            results = result if isinstance(result, list) else [result]
+            return [str(r.name).rstrip(".") for r in results]
+
+        return [str(r.host) for r in result]
+
+
+class _DNSProtocol(asyncio.DatagramProtocol):
+    """Matches responses on one UDP socket to pending queries."""
+
+    def __init__(self) -> None:
+        self.waiters: t.Dict[int, asyncio.Future[bytes]] = {}
+
+    def datagram_received(self, data: bytes, addr: t.Any) -> None:
+        if len(data) < 12:
+            return None
+
+        waiter = self.waiters.pop(int.from_bytes(data[:2], "big"), None)
+
+        if waiter and not waiter.done():
+            waiter.set_result(data)
+
+    def error_received(self, exc: Exception) -> None:
+        self.connection_lost(exc)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        for waiter in self.waiters.values():
+            if not waiter.done():
+                waiter.set_exception(exc or ConnectionError("DNS socket closed"))
+
+        self.waiters.clear()
+
+
+class UDPResolver(Resolver):
+    """A small built in DNS client that speaks UDP directly.
+
+    One socket is opened per nameserver, the first time it is used.
+    Queries that go unanswered are retransmitted to the next nameserver
+    until the timeout expires.
+    """
+
+    __slots__ = ("attempts", "nameservers", "_endpoints")
+
+    def __init__(
+        self,
+        nameservers: t.Sequence[str],
+        timeout: float = DEFAULT_TIMEOUT,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        attempts: int = 2,
+    ) -> None:
+        if not nameservers:
+            raise errors.ResolverError("At least one nameserver is required.")
+
+        super().__init__(timeout, max_in_flight)
+        self.attempts = attempts
+        self.nameservers = list(nameservers)
+        self._endpoints: t.Dict[str, t.Tuple[asyncio.DatagramTransport, _DNSProtocol]] = {}
+
+    async def close(self) -> None:
+        for transport, _ in self._endpoints.values():
+            transport.close()
+
+        self._endpoints.clear()
+
+    async def _endpoint(self, nameserver: str) -> t.Tuple[asyncio.DatagramTransport, _DNSProtocol]:
+        """Gets or opens the socket for the given nameserver."""
+        if nameserver not in self._endpoints:
+            host, _, port = nameserver.partition("#")
+            loop = asyncio.get_event_loop()
+            self._endpoints[nameserver] = await loop.create_datagram_endpoint(
+                _DNSProtocol, remote_addr=(host, int(port or 53))
+            )
+
+        return self._endpoints[nameserver]
+
+    async def _query(self, name: str, qtype: str) -> t.List[str]:
+        interval = self.timeout / max(self.attempts, 1)
+        last_error: Exception | None = None
+
+        for nameserver in itertools.islice(
+            itertools.cycle(self.nameservers), max(self.attempts, len(self.nameservers))
+        ):
+            start = time.perf_counter()
+
+            try:
+                transport, protocol = await self._endpoint(nameserver)
+            except (OSError, ValueError) as e:
+                # Unreachable or misconfigured, so try the next one
+                timings.emit("dns.server", time.perf_counter() - start, nameserver, ok=False)
+                last_error = e
+                continue
+
+            qid = random.randrange(1 << 16)
+
+            while qid in protocol.waiters:
+                qid = random.randrange(1 << 16)
+
+            waiter: asyncio.Future[bytes] = asyncio.get_event_loop().create_future()
+            protocol.waiters[qid] = waiter
+            transport.sendto(_build_query(qid, name, QTYPES[qtype]))
+
+            try:
+                data = await asyncio.wait_for(waiter, interval)
+            except asyncio.TimeoutError:
+                timings.emit("dns.server", time.perf_counter() - start, nameserver, ok=False)
+                continue
+            except OSError as e:
+                timings.emit("dns.server", time.perf_counter() - start, nameserver, ok=False)
+
+                # The socket is dead, so it gets reopened on next use
+                if self._endpoints.get(nameserver, (None, None))[1] is protocol:
+                    self._endpoints.pop(nameserver)[0].close()
+
+                last_error = e
+                continue
+            finally:
+                protocol.waiters.pop(qid, None)
+
+            timings.emit("dns.server", time.perf_counter() - start, nameserver)
+            return _parse_response(data, name, QTYPES[qtype])
+
+        raise errors.ResolverError(
+            f"No nameserver answered the DNS {qtype} query for {name!r}"
+            + (f": {last_error}." if last_error else ".")
+        )
+
+
+class NSLookupResolver(Resolver):
+    """Resolves by running the `nslookup` command.
+
+    Only used as a last resort, when no nameservers can be found for
+    the built in client.
+    """
+
+    __slots__ = ()
+
+    async def _query(self, name: str, qtype: str) -> t.List[str]:
+        data = await utils.run_command("nslookup", f"-type={qtype}", name)
+
+        if qtype == "PTR":
+            return [n.rstrip(".") for n in utils.NSLOOKUP_HOST_RGX.findall(data)]
+
+        family = 4 if qtype == "A" else 6
+        # Addresses before the first name belong to the nameserver
+        answer = data.partition("Name:")[2]
+        results: t.List[str] = []
+
+        for address in utils.NSLOOKUP_IP_RGX.findall(answer):
+            try:
+                if ipaddress.ip_address(address).version == family:
+                    results.append(address)
+            except ValueError:
+                continue
+
+        return results
+
+
+def _build_query(qid: int, name: str, qtype: int) -> bytes:
+    """Builds a recursive query packet for the name."""
+    try:
+        labels = name.rstrip(".").encode("idna").split(b".")
+    except UnicodeError:
+        raise errors.ResolverError(f"{name!r} is not a valid DNS name.") from None
+
+    if any(not 0 < len(label) < 64 for label in labels):
+        raise errors.ResolverError(f"{name!r} is not a valid DNS name.")
+
+    qname = b"".join(bytes((len(label),)) + label for label in labels) + b"\0"
+    return struct.pack("!6H", qid, 0x0100, 1, 0, 0, 0) + qname + struct.pack("!2H", qtype, 1)
+
+
+def _read_name(data: bytes, offset: int) -> t.Tuple[str, int]:
+    """Reads a possibly compressed name, returning it and the offset
+    just past it.
+    """
+    labels: t.List[str] = []
+    end = -1
+
+    for _ in range(128):
+        length = data[offset]
+
+        if length & 0xC0 == 0xC0:
+            if end < 0:
+                end = offset + 2
+
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+
+        elif length:
+            labels.append(data[offset + 1 : offset + 1 + length].decode("ascii", "replace"))
+            offset += length + 1
+
+        else:
+            return ".".join(labels), end if end >= 0 else offset + 1
+
+    raise errors.ResolverError("Malformed DNS response: too many labels.")
+
+
+def _parse_response(data: bytes, name: str, qtype: int) -> t.List[str]:
+    """Extracts the answers of the given type from a response."""
+    try:
+        _, flags, qdcount, ancount, _, _ = struct.unpack_from("!6H", data)
+        rcode = flags & 0xF
+
+        if rcode == 3:
+            raise errors.NoRecordsError(f"{name!r} does not exist.")
+
+        if rcode:
+            raise errors.ResolverError(f"DNS query for {name!r} failed with rcode {rcode}.")
+
+        offset = 12
+        for _ in range(qdcount):
+            offset = _read_name(data, offset)[1] + 4
+
+        results: t.List[str] = []
+        for _ in range(ancount):
+            offset = _read_name(data, offset)[1]
+            rtype, _, _, rdlength = struct.unpack_from("!2HIH", data, offset)
+            offset += 10
+
+            if rtype == qtype == QTYPES["A"] and rdlength == 4:
+                results.append(socket.inet_ntop(socket.AF_INET, data[offset : offset + 4]))
+
+            elif rtype == qtype == QTYPES["AAAA"] and rdlength == 16:
+                results.append(socket.inet_ntop(socket.AF_INET6, data[offset : offset + 16]))
+
+            elif rtype == qtype == QTYPES["PTR"]:
+                results.append(_read_name(data, offset)[0])
+
+            offset += rdlength
+
+    except (IndexError, struct.error):
+        raise errors.ResolverError(f"Malformed DNS response for {name!r}.") from None
+
+    return results
+
+
+def read_nameservers(path: str = RESOLV_CONF) -> t.List[str]:
+    """Reads the system nameservers from a resolv.conf file.
+
+    Link-local IPv6 nameservers keep their `%scope`, without which
+    they cannot be reached.
+    """
+    nameservers: t.List[str] = []
+
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+
+                if len(parts) > 1 and parts[0] == "nameserver":
+                    nameservers.append(parts[1])
+
+    except OSError:
+        pass
+
+    return nameservers
+
+
+def get_resolver(timeout: float = DEFAULT_TIMEOUT) -> Resolver:
+    """Gets the best resolver backend available on this system.
+
+    Uses `aiodns` if it is installed, then the built in UDP client
+    with the system nameservers, falling back to `nslookup`.
+    """
+    # aiodns needs a selector event loop on windows, but we need
+    # the proactor loop for subprocesses
+    if sys.platform != "win32":
+        try:
+            import aiodns  # noqa: F401
+        except ImportError:
+            pass
+        else:
+            return AiodnsResolver(timeout)
+
+    nameservers = read_nameservers()
+
+    if nameservers:
+        return UDPResolver(nameservers, timeout)
+
+    if not utils.check_availability("nslookup"):
+        raise errors.MissingShellCommand(
+            "ipq requires the 'nslookup' command when no nameservers are configured."
+        )
+
+    return NSLookupResolver(timeout)
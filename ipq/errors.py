@@ -54,3 +54,37 @@ class InvalidHost(ShellCommandError):
     -Domain-: `^((?!-)[\w\d-]{1,63}(?<!-)\.)+[a-zA-Z][\w]{1,5}$`
     ---IP---: `^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$`
     """
+
+
+class ResolverError(IpqError):
+    """Raised when a DNS query fails."""
+
+
+class WhoisError(IpqError):
+    """Raised when a WHOIS server cannot be queried."""
+
+
+class CacheError(IpqError):
+    """Raised when the lookup cache cannot be used."""
+
+
+class ProbeError(IpqError):
+    """Raised when a host cannot be probed."""
+
+
+class RateLimitError(WhoisError):
+    """Raised when a WHOIS server keeps refusing queries as too many."""
+
+
+class LookupTimeout(IpqError):
+    """Raised when a lookup, or one stage of it, runs out of time."""
+
+
+class GeoDBError(IpqError):
+    """Raised when a GeoIP database cannot be built or read."""
+
+
+class NoRecordsError(ResolverError):
+    """Raised when a name does not exist, or has no records of the
+    type queried.
+    """
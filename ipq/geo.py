@@ -0,0 +1,271 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""An offline GeoIP and ASN database, for enriching IPs without WHOIS.
+
+`compile_csv` turns a CSV of IPv4 ranges into a compact file, which
+`GeoDB` memory maps and binary searches. The file starts with a header,
+then a sorted table of fixed size records, then every distinct string
+once, each prefixed with its length::
+
+    header   magic, record count, string table offset
+    records  start, end, asn, country, city, org, postal
+    strings  length, utf-8 bytes
+"""
+
+from __future__ import annotations
+
+import csv
+import mmap
+import os
+import socket
+import struct
+import sys
+import typing as t
+from dataclasses import dataclass
+from pathlib import Path
+
+from ipq import errors
+
+__all__ = ("GeoDB", "GeoRecord", "compile_csv")
+
+MAGIC = b"IPQGEO\x00\x01"
+HEADER = struct.Struct("<8sII")
+RECORD = struct.Struct("<7I")
+LENGTH = struct.Struct("<H")
+START = struct.Struct("<I")
+ADDRESS = struct.Struct("!I")
+
+
+@dataclass(frozen=True)
+class GeoRecord:
+    """What the database knows about a range of IPs.
+
+    Empty strings, and an ASN of 0, mean the field is unknown.
+    """
+
+    __slots__ = ("start", "end", "country", "city", "org", "postal", "asn")
+
+    start: str
+    end: str
+    country: str
+    city: str
+    org: str
+    postal: str
+    asn: int
+
+
+def _to_int(value: str) -> int:
+    """Converts a dotted IPv4 address, or an integer, to an integer."""
+    value = value.strip()
+
+    if value.isdigit():
+        number = int(value)
+
+        if number >= 1 << 32:
+            raise ValueError(value)
+
+        return number
+
+    return t.cast(int, ADDRESS.unpack(socket.inet_aton(value))[0])
+
+
+def _to_str(number: int) -> str:
+    return socket.inet_ntoa(ADDRESS.pack(number))
+
+
+def compile_csv(source: str | Path, target: str | Path) -> int:
+    """Compiles a CSV of IP ranges into a database file.
+
+    Each row is `start,end,country,city,org,asn`, with an optional
+    `postal` column after. Addresses may be dotted or integers, and a
+    header row is skipped. Ranges must not overlap. Returns how many
+    ranges were written.
+    """
+    rows: t.List[t.Tuple[int, int, int, str, str, str, str]] = []
+
+    with open(source, newline="", encoding="utf-8") as f:
+        for line, row in enumerate(csv.reader(f), 1):
+            if not row or row[0].startswith("#"):
+                continue
+
+            try:
+                start, end = _to_int(row[0]), _to_int(row[1])
+                asn = int(row[5].strip().upper().lstrip("AS") or 0)
+            except (IndexError, ValueError, OSError):
+                if line == 1:
+                    # A header row
+                    continue
+
+                raise errors.GeoDBError(f"Invalid range on line {line} of '{source}'.")
+
+            if end < start:
+                raise errors.GeoDBError(f"Range ends before it starts on line {line}.")
+
+            postal = row[6] if len(row) > 6 else ""
+            rows.append((start, end, asn, row[2], row[3], row[4], postal))
+
+    rows.sort()
+    strings: t.Dict[str, int] = {}
+    blob = bytearray()
+    records = bytearray()
+
+    def intern(value: str) -> int:
+        if value not in strings:
+            data = value.strip().encode("utf-8")[:0xFFFF]
+            strings[value] = len(blob)
+            blob.extend(LENGTH.pack(len(data)) + data)
+
+        return strings[value]
+
+    for i, (start, end, asn, *fields) in enumerate(rows):
+        if i and start <= rows[i - 1][1]:
+            raise errors.GeoDBError(
+                f"Range {_to_str(start)}-{_to_str(end)} overlaps the one before it."
+            )
+
+        records.extend(RECORD.pack(start, end, asn, *map(intern, fields)))
+
+    path = Path(target)
+    temp = path.with_name(path.name + ".tmp")
+
+    with open(temp, "wb") as out:
+        out.write(HEADER.pack(MAGIC, len(rows), HEADER.size + len(records)))
+        out.write(records)
+        out.write(blob)
+
+    # Readers never see a half written file
+    os.replace(temp, path)
+    return len(rows)
+
+
+class GeoDB:
+    """Looks up IPs in a compiled database, without loading it.
+
+    The file is memory mapped, and each lookup is a binary search over
+    the record table that only decodes the record it lands on, so it
+    takes microseconds and pages in just what it touches.
+    """
+
+    __slots__ = ("count", "path", "_file", "_map", "_strings", "_words")
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.count = 0
+        self._strings = 0
+
+        try:
+            self._file = open(self.path, "rb")
+        except OSError as e:
+            raise errors.GeoDBError(f"Could not open the GeoIP database '{path}': {e}.") from e
+
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            self._file.close()
+            raise errors.GeoDBError(f"Could not open the GeoIP database '{path}': {e}.") from e
+
+        try:
+            magic, self.count, self._strings = HEADER.unpack_from(self._map)
+        except struct.error:
+            magic = b""
+
+        self._words: memoryview | None = None
+
+        if magic != MAGIC:
+            self.close()
+            raise errors.GeoDBError(f"'{path}' is not an ipq GeoIP database.")
+
+        table_end = HEADER.size + self.count * RECORD.size
+
+        if self._strings != table_end or table_end > len(self._map):
+            self.close()
+            raise errors.GeoDBError(f"The GeoIP database '{path}' is truncated or corrupt.")
+
+        if sys.byteorder == "little":
+            # Indexing a view of the table as words beats unpacking
+            self._words = memoryview(self._map)[HEADER.size : self._strings].cast("I")
+
+    def __enter__(self) -> GeoDB:
+        return self
+
+    def __exit__(self, *_: t.Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self) -> None:
+        """Unmaps and closes the file."""
+        if self._words is not None:
+            self._words.release()
+
+        self._map.close()
+        self._file.close()
+
+    def lookup(self, ip: str) -> GeoRecord | None:
+        """Gets the range the IPv4 address falls in, if there is one."""
+        try:
+            (number,) = ADDRESS.unpack(socket.inet_aton(ip))
+        except OSError:
+            return None
+
+        words, data, size, base = self._words, self._map, RECORD.size, HEADER.size
+        stride = size // START.size
+        lo, hi = 0, self.count
+
+        # Finds the last range that starts at or before the IP
+        while lo < hi:
+            mid = (lo + hi) // 2
+
+            if words is not None:
+                start = words[mid * stride]
+            else:
+                start = START.unpack_from(data, base + mid * size)[0]
+
+            if start <= number:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        if not lo:
+            return None
+
+        start, end, asn, *fields = RECORD.unpack_from(data, base + (lo - 1) * size)
+
+        if number > end:
+            return None
+
+        country, city, org, postal = map(self._string, fields)
+        return GeoRecord(_to_str(start), _to_str(end), country, city, org, postal, asn)
+
+    def _string(self, offset: int) -> str:
+        offset += self._strings
+
+        try:
+            (length,) = LENGTH.unpack_from(self._map, offset)
+            start = offset + LENGTH.size
+
+            if start + length > len(self._map):
+                raise ValueError("string runs past the end")
+
+            return self._map[start : start + length].decode("utf-8")
+        except (struct.error, ValueError) as e:
+            raise errors.GeoDBError(f"The GeoIP database '{self.path}' is corrupt: {e}.") from e
@@ -0,0 +1,141 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Hedged requests, for cutting the tail latency of slow lookups."""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import time
+import typing as t
+
+from ipq import errors, timings
+
+if t.TYPE_CHECKING:
+    from ipq import dns, whois
+
+__all__ = ("Hedger",)
+
+T = t.TypeVar("T")
+
+MIN_SAMPLES = 20
+
+
+class Hedger:
+    """Sends a backup query when the first is slower than usual.
+
+    Once a query has taken longer than the given percentile of recent
+    ones for its stage, the same query is sent again, to `resolver` or
+    `whois_client` if given, or to the same backend otherwise. Whichever
+    answers first wins, and the other is cancelled. Until enough
+    samples are in, `initial_delay` is used instead.
+    """
+
+    __slots__ = (
+        "initial_delay",
+        "min_delay",
+        "percentile",
+        "resolver",
+        "whois_client",
+        "window",
+        "_samples",
+    )
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        *,
+        resolver: dns.Resolver | None = None,
+        whois_client: whois.WhoisBackend | None = None,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.01,
+        window: int = 256,
+    ) -> None:
+        self.percentile = percentile
+        self.resolver = resolver
+        self.whois_client = whois_client
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.window = window
+        self._samples: t.Dict[str, t.Deque[float]] = {}
+
+    def delay(self, stage: str) -> float:
+        """Gets how long to wait before hedging the stage's queries."""
+        samples = self._samples.get(stage, ())
+
+        if len(samples) < MIN_SAMPLES:
+            return self.initial_delay
+
+        return max(timings.percentile(list(samples), self.percentile), self.min_delay)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Records how long a successful query for the stage took."""
+        if stage not in self._samples:
+            self._samples[stage] = collections.deque(maxlen=self.window)
+
+        self._samples[stage].append(seconds)
+
+    async def run(
+        self,
+        stage: str,
+        primary: t.Callable[[], t.Awaitable[T]],
+        backup: t.Callable[[], t.Awaitable[T]],
+    ) -> T:
+        """Runs the primary query, hedging it with the backup if it is
+        slow. Raises the last error if neither succeeds.
+        """
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(primary())]
+        error: errors.IpqError | None = None
+
+        try:
+            await asyncio.wait(tasks, timeout=self.delay(stage))
+
+            if not tasks[0].done():
+                timings.emit("hedge", time.perf_counter() - start, stage)
+                tasks.append(asyncio.ensure_future(self._backup(stage, backup)))
+
+            for future in asyncio.as_completed(tasks):
+                try:
+                    result = await future
+                except errors.IpqError as e:
+                    error = e
+                    continue
+
+                self.observe(stage, time.perf_counter() - start)
+                return result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        raise t.cast(errors.IpqError, error)
+
+    @staticmethod
+    async def _backup(stage: str, backup: t.Callable[[], t.Awaitable[T]]) -> T:
+        """Runs the backup, so any error it raises is an `IpqError`,
+        and fails only this attempt rather than the lookup.
+        """
+        try:
+            return await backup()
+        except (errors.IpqError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            raise errors.IpqError(f"Hedged {stage} query failed: {e!r}.") from e
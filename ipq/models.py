@@ -18,217 +18,187 @@
 # CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
 # TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
-"""Models the various data retrieved by ipq."""
+"""Models the various data retrieved by ipq.
+
+Models are immutable and slotted, so they stay small when many of them
+are kept around. They hold data only, formatting is left to
+`ipq.output`.
+"""
 
 from __future__ import annotations
 
-import os
-import re
-import subprocess
 import typing as t
-from dataclasses import dataclass, field
-from queue import Queue
+from dataclasses import dataclass
+
+from ipq import errors, parser
+
+if t.TYPE_CHECKING:
+    from ipq import geo
+
+__all__ = ("IPData", "LookupResult", "PTRData", "PingData", "WhoisData")
+
+NOT_FOUND = "Not Found"
+
+
+class _Model:
+    """Lets frozen, slotted models be pickled and copied."""
 
-from ipq import errors, utils
+    __slots__: t.Tuple[str, ...] = ()
 
-T = t.TypeVar("T", str, t.List[str])
-CYAN = utils.Colors.CYAN
-STOP = utils.Colors.STOP
-GREEN = utils.Colors.GREEN
-PURPLE = utils.Colors.PURPLE
-YELLOW = utils.Colors.YELLOW
+    def __getstate__(self) -> t.Tuple[t.Any, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
 
+    def __setstate__(self, state: t.Tuple[t.Any, ...]) -> None:
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
 
-@dataclass
-class WhoisData:
+
+@dataclass(frozen=True)
+class WhoisData(_Model):
     """Represents a domains whois info."""
 
-    queue: Queue[str]
-    domain: str = ""
-    registrar: str = ""
-    created: str = ""
-    updated: str = ""
-    expires: str = ""
-    status: t.List[str] = field(default_factory=list)
-    nameservers: t.List[str] = field(default_factory=list)
+    __slots__ = ("domain", "registrar", "created", "updated", "expires", "status", "nameservers")
+
+    domain: str
+    registrar: str
+    created: str
+    updated: str
+    expires: str
+    status: t.Tuple[str, ...]
+    nameservers: t.Tuple[str, ...]
 
     @classmethod
-    def new(cls, queue: Queue[str], host: str) -> WhoisData:
-        """Creates a new `WhoisData` object with the whois command."""
-        self = cls(queue)
-        host = ".".join(host.split(".")[-2:])
-        self._black_magic(self._whois(host))
-        self.queue.put(str(self))
-        return self
-
-    @staticmethod
-    def _rgx(q: str, data: str) -> str | None:
-        """Parses for values that can only occur once."""
-        rgx = re.compile(f"(?i)^\\s*{q}: (.*)$", re.M)
-        match = rgx.search(data)
-        return match.group(1) if match else None
-
-    @staticmethod
-    def _greedy_rgx(q: str, data: str) -> t.List[str] | None:
-        """Parses for nameservers, which the can be multiple of."""
-        rgx = re.compile(f"(?i)^\\s*{q}: (.*)$", re.M)
-        matches = rgx.findall(data)
-        result: t.List[t.Any] = []
-
-        for m in matches:
-            if m.lower() not in (r.lower() for r in result):
-                result.append(m.split()[0].strip())
-
-        return sorted(list(set(result))) or None
-
-    @staticmethod
-    def _maybe(value: T | None) -> T:
-        """Returns the value, or the appropriate replacement if None."""
-        if isinstance(value, list):
-            return value or []
-
-        elif isinstance(value, str):
-            return value or "Not Found"
-
-        # We should *hopefully* never get here, unless its a bad domain
-        raise errors.InvalidWhoisData("Whois did not return valid data.")
-
-    def __str__(self) -> str:
-        status = "\n".join(f" - {s.split()[0]}" for s in self.status)
-        ns = "\n".join(f" - {n}" for n in self.nameservers)
-
-        return (
-            f"{YELLOW}==========={STOP} {GREEN}WHOIS{STOP} {YELLOW}===========\n{STOP}"
-            f"{CYAN}Domain:       {self.domain}\n{STOP}"
-            f"{PURPLE}Registrar:    {self.registrar}\n{STOP}"
-            f"{CYAN}Created:      {self.created}\n{STOP}"
-            f"{PURPLE}Updated:      {self.updated}\n{STOP}"
-            f"{CYAN}Expires:      {self.expires}\n{STOP}"
-            f"{PURPLE}Nameservers:  \n{ns}\n{STOP}"
-            f"{CYAN}Status:\n{status}\n{STOP}"
-            f"{YELLOW}============================={STOP}"
+    def from_response(cls, data: str) -> WhoisData:
+        """Creates a new `WhoisData` object from a WHOIS response."""
+        fields = parser.parse_domain(data)
+
+        if "domain" not in fields:
+            # We should *hopefully* only get here with a bad domain
+            raise errors.InvalidWhoisData("Whois did not return valid data.")
+
+        return cls(
+            fields["domain"],
+            fields.get("registrar", NOT_FOUND),
+            fields.get("created", NOT_FOUND),
+            fields.get("updated", NOT_FOUND),
+            fields.get("expires", NOT_FOUND),
+            tuple(fields.get("status", ())),
+            tuple(fields.get("nameservers", ())),
         )
 
-    @utils.requires("whois")
-    def _whois(self, host: str) -> str:
-        """Makes a call to the whois command."""
-        proc = subprocess.run(["whois", host.lower()], capture_output=True)
-        return proc.stdout.decode("utf-8")
-
-    def _black_magic(self, data: str) -> None:
-        """Sets all the data to the appropriate attr on this obj."""
-        attr_map: dict[str, str] = {
-            "domain": "domain name",
-            "registrar": "registrar",
-            "created": "creation date",
-            "updated": "updated date",
-            "status": "domain status",
-            "expires": "registry expiry date",
-            "nameservers": "name server",
-        }
-
-        for k, v in attr_map.items():
-            if k in ("nameservers", "status"):
-                setattr(self, k, self._maybe(self._greedy_rgx(v, data)))
-
-            else:
-                setattr(self, k, self._maybe(self._rgx(v, data)))
-
-
-@dataclass
-class IPData:
+
+@dataclass(frozen=True)
+class IPData(_Model):
     """Represents information about the given IP."""
 
-    queue: Queue[str]
-    ip: str = ""
-    hostname: str = ""
-    city: str = ""
-    country: str = ""
-    org: str = ""
-    postal: str = ""
+    __slots__ = ("ip", "hostname", "city", "country", "org", "postal")
+
+    ip: str
+    hostname: str
+    city: str
+    country: str
+    org: str
+    postal: str
+
+    @classmethod
+    def from_response(cls, ip: str, hostname: str, data: str) -> IPData:
+        """Creates a new `IPData` object from an IPs WHOIS response."""
+        fields = parser.parse_ip(data)
+
+        return cls(
+            ip,
+            hostname,
+            fields.get("city", NOT_FOUND),
+            fields.get("country", NOT_FOUND),
+            fields.get("org", NOT_FOUND),
+            fields.get("postal", NOT_FOUND),
+        )
+
+    @classmethod
+    def from_geo(cls, ip: str, hostname: str, record: geo.GeoRecord) -> IPData:
+        """Creates a new `IPData` object from a GeoIP database range.
+
+        The ASN, if known, is put in front of the organization.
+        """
+        org = f"AS{record.asn} {record.org}".strip() if record.asn else record.org
+
+        return cls(
+            ip,
+            hostname,
+            record.city or NOT_FOUND,
+            record.country or NOT_FOUND,
+            org or NOT_FOUND,
+            record.postal or NOT_FOUND,
+        )
+
+
+@dataclass(frozen=True)
+class PingData(_Model):
+    """Round trip times from probing the host, in milliseconds.
+
+    The times are `None` if no probe got a reply.
+    """
+
+    __slots__ = ("address", "method", "sent", "received", "loss", "rtt_min", "rtt_avg", "rtt_max")
+
+    address: str
+    method: str
+    sent: int
+    received: int
+    loss: float
+    rtt_min: float | None
+    rtt_avg: float | None
+    rtt_max: float | None
 
     @classmethod
-    def new(cls, queue: Queue[str], host: str) -> IPData:
-        """Creates a new IP Data object for the given host."""
-        self = cls(queue)
-
-        if utils.DOMAIN_RGX.match(host):
-            self.ip = self._ns_lookup(host, utils.NSLOOKUP_IP_RGX)
-
-        elif utils.IP_RGX.match(host):
-            self.ip = host
-
-        else:
-            raise errors.ShellCommandError(f"{host!r} is not a valid domain or IP address.")
-
-        try:
-            self.hostname = self._ns_lookup(self.ip, utils.NSLOOKUP_HOST_RGX)
-        except errors.ShellCommandError:
-            self.hostname = "Not Found"
-
-        self._red_magic(self.ip)
-        self.queue.put(str(self))
-        return self
-
-    def __str__(self) -> str:
-        return (
-            f"{YELLOW}=========={STOP} {GREEN}IP INFO{STOP} {YELLOW}==========\n{STOP}"
-            f"{CYAN}IP:           {self.ip}\n{STOP}"
-            f"{PURPLE}Hostname:     {self.hostname}\n{STOP}"
-            f"{CYAN}City:         {self.city}\n{STOP}"
-            f"{PURPLE}Country:      {self.country}\n{STOP}"
-            f"{CYAN}Postal code:  {self.postal}\n{STOP}"
-            f"{PURPLE}Organization: {self.org}\n{STOP}"
-            f"{YELLOW}============================={STOP}"
+    def from_rtts(cls, address: str, method: str, sent: int, rtts: t.Sequence[float]) -> PingData:
+        """Creates a new `PingData` object from the RTTs of replies."""
+        loss = (sent - len(rtts)) / sent * 100 if sent else 100.0
+
+        if not rtts:
+            return cls(address, method, sent, 0, loss, None, None, None)
+
+        return cls(
+            address, method, sent, len(rtts), loss, min(rtts), sum(rtts) / len(rtts), max(rtts)
         )
 
-    @utils.requires("whois")
-    def _red_magic(self, host: str) -> str:
-        """Sets all the data to the appropriate attr on this obj."""
-        attr_map: dict[str, str] = {
-            "city": "City",
-            "country": "Country",
-            "org": "OrgName",
-            "postal": ".*Postal\\s?Code",
-        }
 
-        proc = subprocess.run(["whois", host], capture_output=True)
-        data = proc.stdout.decode("utf-8")
+@dataclass(frozen=True)
+class PTRData(_Model):
+    """The hostname an IPs PTR record points to."""
 
-        for k, v in attr_map.items():
-            rgx = re.compile(f"^{v}:\\s+(.*)$", re.M)
-            match = rgx.search(data)
-            setattr(self, k, match.group(1) if match else "Not Found")
+    __slots__ = ("ip", "hostname")
 
-        return ""
+    ip: str
+    hostname: str
 
-    @utils.requires("nslookup")
-    def _ns_lookup(self, host: str, rgx: re.Pattern[str]) -> str:
-        """Runs the nslookup command and returns a regex match."""
-        proc = subprocess.run(["nslookup", host.lower()], capture_output=True)
-        data = proc.stdout.decode("utf-8")
-        match = rgx.search(data)
 
-        if not match:
-            raise errors.ShellCommandError(f"Something went wrong with 'nslookup' for {host!r}")
+@dataclass(frozen=True)
+class LookupResult(_Model):
+    """Everything that was looked up for a host.
 
-        return match.group(1)
+    Sections that were not requested are `None`, as are those that
+    failed, which are listed in `failures` with the reason.
+    """
 
+    __slots__ = ("host", "ip", "whois", "ping", "ptr", "failures")
 
-@dataclass
-class PingData:
-    """Data received from pinging the host."""
+    host: str
+    ip: IPData | None
+    whois: WhoisData | None
+    ping: PingData | None
+    ptr: PTRData | None
+    failures: t.Tuple[t.Tuple[str, str], ...]
 
-    data: str = ""
+    @property
+    def complete(self) -> bool:
+        """Whether every requested section was looked up."""
+        return not self.failures
 
-    @classmethod
-    def new(cls, host: str, count: int) -> PingData:
-        self = cls()
+    @property
+    def sections(self) -> t.List[SectionT]:
+        """The sections that were looked up, in display order."""
+        return [s for s in (self.ip, self.whois, self.ping, self.ptr) if s is not None]
 
-        proc = subprocess.run(
-            ["ping", "-n" if os.name == "nt" else "-c", f"{count}", host.lower()],
-            capture_output=True,
-        )
 
-        self.data = proc.stdout.decode("utf-8")
-        return self
+SectionT = t.Union[IPData, WhoisData, PingData, PTRData]
@@ -0,0 +1,208 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Answers IP WHOIS queries from the netblocks of earlier answers."""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import typing as t
+
+from ipq import cache, parser, whois
+
+__all__ = ("DEFAULT_MIN_PREFIXLEN", "NetblockIndex", "NetblockWhois")
+
+T = t.TypeVar("T")
+
+DEFAULT_MIN_PREFIXLEN = 16
+# Misses in the same /24 as a query in flight wait for its answer
+PENDING_PREFIXLEN = 24
+_MASKS = [(0xFFFFFFFF << (32 - n)) & 0xFFFFFFFF for n in range(33)]
+
+
+class NetblockIndex(t.Generic[T]):
+    """Finds the most specific known netblock an IPv4 address is in.
+
+    Blocks are split into CIDR prefixes and keyed by them, so a lookup
+    is at most one dict lookup per prefix length, most specific first,
+    and nested blocks resolve to the innermost one.
+    """
+
+    __slots__ = ("_prefixes", "_lengths")
+
+    def __init__(self) -> None:
+        self._prefixes: t.Dict[t.Tuple[int, int], T] = {}
+        self._lengths: t.List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._prefixes)
+
+    def add(self, start: int, end: int, value: T) -> None:
+        """Indexes the block from `start` to `end` inclusive."""
+        first, last = ipaddress.IPv4Address(start), ipaddress.IPv4Address(end)
+
+        for network in ipaddress.summarize_address_range(first, last):
+            self._prefixes[(network.prefixlen, int(network.network_address))] = value
+            if network.prefixlen not in self._lengths:
+                self._lengths.append(network.prefixlen)
+                self._lengths.sort(reverse=True)
+
+    def find(self, address: int) -> T | None:
+        """Gets the value of the innermost block with the address."""
+        for length in self._lengths:
+            value = self._prefixes.get((length, address & _MASKS[length]))
+
+            if value is not None:
+                return value
+
+        return None
+
+
+class NetblockWhois(whois.WhoisBackend):
+    """Serves IP WHOIS queries from the netblocks of earlier answers.
+
+    An RIR answer covers a whole netblock, so once one is in, any other
+    IP in it is answered without a query. Blocks larger than
+    `min_prefixlen` are not reused, since they are more likely to hold
+    smaller blocks of their own that the answer did not mention. With
+    a `Cache`, blocks are kept across runs too.
+
+    While a query is in flight, misses in the same /24 wait for its
+    answer rather than all querying at once, since it most likely
+    covers them too. If it does not, they all query at once, and so do
+    later misses in that /24.
+    """
+
+    __slots__ = (
+        "backend",
+        "cache",
+        "min_prefixlen",
+        "_index",
+        "_loaded",
+        "_texts",
+        "_pending",
+        "_split",
+    )
+
+    def __init__(
+        self,
+        backend: whois.WhoisBackend,
+        lookup_cache: cache.Cache | None = None,
+        min_prefixlen: int = DEFAULT_MIN_PREFIXLEN,
+    ) -> None:
+        self.backend = backend
+        self.cache = lookup_cache
+        self.min_prefixlen = min_prefixlen
+        self._index: NetblockIndex[str] = NetblockIndex()
+        self._texts: t.Dict[str, str] = {}
+        self._pending: t.Dict[int, asyncio.Event] = {}
+        # The /24s an answer did not cover the whole of
+        self._split: t.Set[int] = set()
+        self._loaded = False
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    async def query(self, query: str) -> str:
+        ip = whois.ipaddress_query(query)
+
+        if ip is None or ip.version != 4:
+            return await self.backend.query(query)
+
+        address = int(ip)
+        candidate = address & _MASKS[PENDING_PREFIXLEN]
+        text = self._find(address)
+        waited = text is None and candidate in self._pending
+
+        if waited:
+            await self._pending[candidate].wait()
+            text = self._find(address)
+
+        if self.cache:
+            # Counted here, as most hits are served from memory
+            counter = self.cache.misses if text is None else self.cache.hits
+            counter[cache.NETBLOCK] += 1
+
+        if text is not None:
+            return text
+
+        if waited or candidate in self._split:
+            # Waiting on another answer would likely be in vain
+            text = await self.backend.query(query)
+            self._add(text, query)
+            return text
+
+        self._pending[candidate] = answered = asyncio.Event()
+
+        try:
+            text = await self.backend.query(query)
+            block = self._add(text, query)
+        finally:
+            del self._pending[candidate]
+            answered.set()
+
+        if not block or block[0] > candidate or block[1] < candidate | 0xFF:
+            self._split.add(candidate)
+
+        return text
+
+    def _add(self, text: str, query: str) -> t.Tuple[int, int] | None:
+        """Indexes the netblock the answer covers, if small enough,
+        returning it.
+        """
+        block = parser.parse_netblock(text, query)
+
+        if not block or block[1] - block[0] >= 1 << (32 - self.min_prefixlen):
+            return None
+
+        key = "-".join(str(ipaddress.IPv4Address(a)) for a in block)
+        self._index.add(*block, key)
+        self._texts[key] = text
+
+        if self.cache:
+            self.cache.set(cache.NETBLOCK, key, text)
+
+        return block
+
+    def _find(self, address: int) -> str | None:
+        """Gets the answer for the block the address is in, if known."""
+        if not self._loaded and self.cache:
+            for stored in self.cache.keys(cache.NETBLOCK):
+                first, _, last = stored.partition("-")
+                start, end = ipaddress.IPv4Address(first), ipaddress.IPv4Address(last)
+                self._index.add(int(start), int(end), stored)
+
+        self._loaded = True
+        key = self._index.find(address)
+
+        if key is None:
+            return None
+
+        if key not in self._texts and self.cache:
+            text = self.cache.peek(cache.NETBLOCK, key)
+
+            if text is None:
+                # Expired or evicted since it was loaded
+                return None
+
+            self._texts[key] = text
+
+        return self._texts.get(key)
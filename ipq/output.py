@@ -0,0 +1,282 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Formatting and writers for the different output formats."""
+
+from __future__ import annotations
+
+import abc
+import csv
+import dataclasses
+import json
+import sys
+import typing as t
+
+from ipq import errors, models, utils
+
+__all__ = (
+    "CSVWriter",
+    "JSONLinesWriter",
+    "TextWriter",
+    "Writer",
+    "format_ip",
+    "format_ping",
+    "format_ptr",
+    "format_section",
+    "format_whois",
+    "get_writer",
+    "to_record",
+)
+
+CYAN = utils.Colors.CYAN
+STOP = utils.Colors.STOP
+GREEN = utils.Colors.GREEN
+PURPLE = utils.Colors.PURPLE
+YELLOW = utils.Colors.YELLOW
+
+SECTIONS = ("ip", "whois", "ping", "ptr")
+CSV_COLUMNS = (
+    "host",
+    "ip",
+    "hostname",
+    "city",
+    "country",
+    "org",
+    "postal",
+    "domain",
+    "registrar",
+    "created",
+    "updated",
+    "expires",
+    "status",
+    "nameservers",
+    "address",
+    "method",
+    "sent",
+    "received",
+    "loss",
+    "rtt_min",
+    "rtt_avg",
+    "rtt_max",
+    "error",
+)
+
+
+def format_whois(data: models.WhoisData) -> str:
+    """Formats the WHOIS section for the terminal."""
+    status = "\n".join(f" - {s.split()[0]}" for s in data.status)
+    ns = "\n".join(f" - {n}" for n in data.nameservers)
+
+    return (
+        f"{YELLOW}==========={STOP} {GREEN}WHOIS{STOP} {YELLOW}===========\n{STOP}"
+        f"{CYAN}Domain:       {data.domain}\n{STOP}"
+        f"{PURPLE}Registrar:    {data.registrar}\n{STOP}"
+        f"{CYAN}Created:      {data.created}\n{STOP}"
+        f"{PURPLE}Updated:      {data.updated}\n{STOP}"
+        f"{CYAN}Expires:      {data.expires}\n{STOP}"
+        f"{PURPLE}Nameservers:  \n{ns}\n{STOP}"
+        f"{CYAN}Status:\n{status}\n{STOP}"
+        f"{YELLOW}============================={STOP}"
+    )
+
+
+def format_ip(data: models.IPData) -> str:
+    """Formats the IP info section for the terminal."""
+    return (
+        f"{YELLOW}=========={STOP} {GREEN}IP INFO{STOP} {YELLOW}==========\n{STOP}"
+        f"{CYAN}IP:           {data.ip}\n{STOP}"
+        f"{PURPLE}Hostname:     {data.hostname}\n{STOP}"
+        f"{CYAN}City:         {data.city}\n{STOP}"
+        f"{PURPLE}Country:      {data.country}\n{STOP}"
+        f"{CYAN}Postal code:  {data.postal}\n{STOP}"
+        f"{PURPLE}Organization: {data.org}\n{STOP}"
+        f"{YELLOW}============================={STOP}"
+    )
+
+
+def format_ping(data: models.PingData) -> str:
+    """Formats the ping section for the terminal."""
+    if data.received:
+        rtt = f"{data.rtt_min:.2f}/{data.rtt_avg:.2f}/{data.rtt_max:.2f} ms"
+    else:
+        rtt = "No replies"
+
+    return (
+        f"{YELLOW}==========={STOP} {GREEN}PING{STOP} {YELLOW}============\n{STOP}"
+        f"{CYAN}Address:      {data.address}\n{STOP}"
+        f"{PURPLE}Method:       {data.method}\n{STOP}"
+        f"{CYAN}Received:     {data.received}/{data.sent}\n{STOP}"
+        f"{PURPLE}Loss:         {data.loss:.1f}%\n{STOP}"
+        f"{CYAN}Min/avg/max:  {rtt}\n{STOP}"
+        f"{YELLOW}============================={STOP}"
+    )
+
+
+def format_ptr(data: models.PTRData) -> str:
+    """Formats the PTR section for the terminal, on one line so that
+    sweeps of whole networks stay readable.
+    """
+    return f"{CYAN}{data.ip:<15}{STOP} {PURPLE}{data.hostname}{STOP}"
+
+
+def format_section(section: models.SectionT) -> str:
+    """Formats any section for the terminal."""
+    if isinstance(section, models.IPData):
+        return format_ip(section)
+
+    if isinstance(section, models.WhoisData):
+        return format_whois(section)
+
+    if isinstance(section, models.PTRData):
+        return format_ptr(section)
+
+    return format_ping(section)
+
+
+def to_record(
+    host: str, result: models.LookupResult | None, error: errors.IpqError | None = None
+) -> t.Dict[str, t.Any]:
+    """Builds a plain record of a hosts results, ready to serialize.
+
+    Each section is a dict, or `None` if it was not requested or could
+    not be completed. Sections that failed are in `failures`.
+    """
+    record: t.Dict[str, t.Any] = {"host": host, **dict.fromkeys(SECTIONS), "failures": {}}
+
+    if result:
+        for name in SECTIONS:
+            section = getattr(result, name)
+            record[name] = section and {
+                f.name: getattr(section, f.name) for f in dataclasses.fields(section)
+            }
+
+        record["failures"] = dict(result.failures)
+
+    record["error"] = error.message if error else None
+    return record
+
+
+class Writer(abc.ABC):
+    """Base class all output writers inherit from.
+
+    Each record is written and flushed as soon as it is ready, so
+    nothing is buffered between hosts. Messages meant for a person,
+    rather than the records, go to `messages`, stderr by default.
+    """
+
+    __slots__ = ("messages", "stream")
+
+    def __init__(self, stream: t.TextIO, messages: t.TextIO | None = None) -> None:
+        self.stream = stream
+        self.messages = messages or sys.stderr
+
+    @abc.abstractmethod
+    def write(
+        self,
+        host: str,
+        result: models.LookupResult | None,
+        error: errors.IpqError | None = None,
+    ) -> None:
+        """Writes the results for one host."""
+
+
+class TextWriter(Writer):
+    """Writes the coloured, human readable sections."""
+
+    __slots__ = ()
+
+    def write(
+        self,
+        host: str,
+        result: models.LookupResult | None,
+        error: errors.IpqError | None = None,
+    ) -> None:
+        if error:
+            print(f"{host}: {error}", file=self.messages, flush=True)
+            return None
+
+        sections = result.sections if result else []
+        print("\n".join(map(format_section, sections)), file=self.stream, flush=True)
+
+        for name, message in result.failures if result else ():
+            failure = errors.IpqError(message)
+            print(f"{host} ({name}): {failure}", file=self.messages, flush=True)
+
+
+class JSONLinesWriter(Writer):
+    """Writes one JSON object per host."""
+
+    __slots__ = ()
+
+    def write(
+        self,
+        host: str,
+        result: models.LookupResult | None,
+        error: errors.IpqError | None = None,
+    ) -> None:
+        self.stream.write(json.dumps(to_record(host, result, error)) + "\n")
+        self.stream.flush()
+
+
+class CSVWriter(Writer):
+    """Writes one flat CSV row per host, after a header row.
+
+    List values are joined with spaces, and the failures of a partial
+    result are joined into the error column.
+    """
+
+    __slots__ = ("_writer",)
+
+    def __init__(self, stream: t.TextIO, messages: t.TextIO | None = None) -> None:
+        super().__init__(stream, messages)
+        self._writer = csv.DictWriter(stream, CSV_COLUMNS, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def write(
+        self,
+        host: str,
+        result: models.LookupResult | None,
+        error: errors.IpqError | None = None,
+    ) -> None:
+        record = to_record(host, result, error)
+        failures = "; ".join(f"{k}: {v}" for k, v in record["failures"].items())
+        row: t.Dict[str, t.Any] = {"host": host, "error": record["error"] or failures or None}
+
+        for section in SECTIONS:
+            for k, v in (record[section] or {}).items():
+                row[k] = " ".join(v) if isinstance(v, tuple) else v
+
+        self._writer.writerow(row)
+        self.stream.flush()
+
+
+WRITERS: t.Dict[str, t.Type[Writer]] = {
+    "text": TextWriter,
+    "jsonl": JSONLinesWriter,
+    "csv": CSVWriter,
+}
+
+
+def get_writer(name: str, stream: t.TextIO, messages: t.TextIO | None = None) -> Writer:
+    """Gets the writer for the given format name."""
+    try:
+        return WRITERS[name](stream, messages)
+    except KeyError:
+        raise errors.IpqError(f"Unknown output format {name!r}.") from None
@@ -0,0 +1,305 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Single pass parsing of WHOIS responses."""
+
+from __future__ import annotations
+
+import ipaddress
+import re
+import typing as t
+
+__all__ = (
+    "DOMAIN_ALIASES",
+    "IP_ALIASES",
+    "Scanner",
+    "parse",
+    "parse_domain",
+    "parse_ip",
+    "parse_netblock",
+)
+
+_SEPARATORS = str.maketrans("", "", " -_\t")
+
+# Each key also matches with dashes, underscores or nothing in place
+# of its spaces, and in any case
+DOMAIN_ALIASES: t.Dict[str, str] = {
+    "domain name": "domain",
+    "domain": "domain",
+    "registrar": "registrar",
+    "registrar name": "registrar",
+    "sponsoring registrar": "registrar",
+    "creation date": "created",
+    "created": "created",
+    "created on": "created",
+    "created date": "created",
+    "registered on": "created",
+    "registration time": "created",
+    "domain registration date": "created",
+    "updated date": "updated",
+    "last updated": "updated",
+    "last modified": "updated",
+    "last update": "updated",
+    "changed": "updated",
+    "registry expiry date": "expires",
+    "registrar registration expiration date": "expires",
+    "expiration date": "expires",
+    "expiry date": "expires",
+    "expires": "expires",
+    "expires on": "expires",
+    "expiration time": "expires",
+    "paid till": "expires",
+    "domain status": "status",
+    "status": "status",
+    "state": "status",
+    "name server": "nameservers",
+    "name servers": "nameservers",
+    "nserver": "nameservers",
+}
+
+IP_ALIASES: t.Dict[str, str] = {
+    "city": "city",
+    "country": "country",
+    "org name": "org",
+    "owner": "org",
+    "postal code": "postal",
+    "zip code": "postal",
+}
+
+DOMAIN_MULTI = frozenset(("status", "nameservers"))
+
+# ARIN's NetRange and CIDR, the other RIRs inetnum, and the JPNIC and
+# KRNIC equivalents
+NETBLOCK_RGX = re.compile(
+    r"(?im)^[ \t]*(?:[a-z]\.[ \t]*)?\[?"
+    r"(?:netrange|inetnum|cidr|ipv4 address|network number)\]?[ \t]*:?[ \t]*(.+)$"
+)
+
+_MAX_MEMO = 4096
+
+
+class _Fields:
+    """Maps the raw keys of responses to the fields of an alias table.
+
+    Raw keys repeat a lot between responses, so results are memoized
+    to skip normalizing them again.
+    """
+
+    __slots__ = ("memo", "_index")
+
+    def __init__(self, aliases: t.Mapping[str, str]) -> None:
+        self.memo: t.Dict[str, t.Optional[str]] = {}
+        self._index = {k.translate(_SEPARATORS): v for k, v in aliases.items()}
+
+    def lookup(self, key: str) -> str | None:
+        """Maps a raw key to its field, or None if it is not wanted."""
+        if len(self.memo) >= _MAX_MEMO:
+            self.memo.clear()
+
+        name = self.memo[key] = self._index.get(key.lower().translate(_SEPARATORS))
+        return name
+
+
+# Only the module tables are kept, as they live as long as their ids
+_TABLES = {id(table): _Fields(table) for table in (DOMAIN_ALIASES, IP_ALIASES)}
+
+
+def _fields(aliases: t.Mapping[str, str]) -> _Fields:
+    """Gets the fields of the table, built afresh for other tables."""
+    return _TABLES.get(id(aliases)) or _Fields(aliases)
+
+
+def parse(
+    data: str, aliases: t.Mapping[str, str], multi: t.AbstractSet[str] = frozenset()
+) -> t.Dict[str, t.Any]:
+    """Parses a response into fields in a single pass over its lines.
+
+    Keys are mapped to fields through the aliases. The first value
+    wins for most fields, while fields in `multi` collect the first
+    word of every value, without case insensitive duplicates. When
+    there are no `multi` fields, parsing stops as soon as every field
+    is filled.
+    """
+    fields = _fields(aliases)
+    memo = fields.memo
+    remaining = len(set(aliases.values())) if not multi else -1
+    result: t.Dict[str, t.Any] = {}
+    seen: t.Dict[str, t.Set[str]] = {}
+
+    for line in data.splitlines():
+        key, sep, value = line.partition(":")
+
+        if not sep:
+            continue
+
+        try:
+            name = memo[key]
+        except KeyError:
+            name = fields.lookup(key)
+
+        if name is None:
+            continue
+
+        value = value.strip()
+
+        if not value:
+            continue
+
+        if name in multi:
+            word = value.split(None, 1)[0]
+            lowered = word.lower()
+            words = seen.setdefault(name, set())
+
+            if lowered not in words:
+                words.add(lowered)
+                result.setdefault(name, []).append(word)
+
+        elif name not in result:
+            result[name] = value
+            remaining -= 1
+
+            if not remaining:
+                break
+
+    for name in multi:
+        if name in result:
+            result[name].sort()
+
+    return result
+
+
+class Scanner:
+    """Tells when a response, read line by line, has every field that
+    will be parsed from it, so the rest need not be read.
+
+    The response is done at the end of the block, a blank or `>>>`
+    line, in which the last field was filled, so values of `multi`
+    fields that follow their first are still read. With `netblock`,
+    a netblock line is wanted too, and with `referral`, a line the
+    pattern matches, as referrals can come after the fields.
+    """
+
+    __slots__ = ("_fields", "_missing", "_netblock", "_referral")
+
+    def __init__(
+        self,
+        aliases: t.Mapping[str, str],
+        netblock: bool = False,
+        referral: t.Pattern[str] | None = None,
+    ) -> None:
+        self._fields = _fields(aliases)
+        self._missing = set(aliases.values())
+        self._netblock = netblock
+        self._referral = referral
+
+    @classmethod
+    def for_domain(cls, referral: t.Pattern[str] | None = None) -> Scanner:
+        """Scans for the `WhoisData` fields."""
+        return cls(DOMAIN_ALIASES, referral=referral)
+
+    @classmethod
+    def for_ip(cls, referral: t.Pattern[str] | None = None) -> Scanner:
+        """Scans for the `IPData` fields and the netblock."""
+        return cls(IP_ALIASES, netblock=True, referral=referral)
+
+    @property
+    def filled(self) -> bool:
+        """Whether every wanted field has been seen."""
+        return not self._missing and not self._netblock and self._referral is None
+
+    def feed(self, line: str) -> bool:
+        """Scans a line, returning whether the response is done."""
+        if self.filled:
+            stripped = line.strip()
+            return not stripped or stripped.startswith(">>>")
+
+        key, sep, value = line.partition(":")
+
+        if sep and value.strip():
+            name = self._fields.lookup(key)
+
+            if name is not None:
+                self._missing.discard(name)
+
+        if self._netblock and NETBLOCK_RGX.match(line):
+            self._netblock = False
+
+        if self._referral and self._referral.match(line):
+            self._referral = None
+
+        return False
+
+
+def parse_domain(data: str) -> t.Dict[str, t.Any]:
+    """Parses a domains WHOIS response into `WhoisData` fields."""
+    return parse(data, DOMAIN_ALIASES, DOMAIN_MULTI)
+
+
+def parse_ip(data: str) -> t.Dict[str, str]:
+    """Parses an IPs WHOIS response into `IPData` fields."""
+    return parse(data, IP_ALIASES)
+
+
+def parse_netblock(data: str, ip: str) -> t.Tuple[int, int] | None:
+    """Finds the smallest netblock in an IPv4 WHOIS response that
+    contains the IP, as its first and last address.
+    """
+    try:
+        address = int(ipaddress.IPv4Address(ip))
+    except ValueError:
+        return None
+
+    best: t.Tuple[int, int] | None = None
+
+    for match in NETBLOCK_RGX.finditer(data):
+        for start, end in _netblocks(match.group(1)):
+            if start <= address <= end and (best is None or end - start < best[1] - best[0]):
+                best = (start, end)
+
+    return best
+
+
+def _netblocks(value: str) -> t.Iterator[t.Tuple[int, int]]:
+    """Parses a range, or a list of possibly abbreviated CIDRs."""
+    value = value.partition("(")[0]
+
+    if "-" in value:
+        first, _, last = value.partition("-")
+
+        try:
+            start = int(ipaddress.IPv4Address(first.strip()))
+            end = int(ipaddress.IPv4Address(last.strip()))
+        except ValueError:
+            return
+
+        yield start, end
+        return
+
+    for token in re.split(r"[,\s]+", value):
+        address, _, prefix = token.partition("/")
+        # LACNIC leaves out trailing zero octets, as in 200.160/12
+        octets = (address.split(".") + ["0"] * 3)[:4]
+
+        try:
+            network = ipaddress.IPv4Network(f"{'.'.join(octets)}/{prefix}", strict=False)
+        except ValueError:
+            continue
+
+        yield int(network.network_address), int(network.broadcast_address)
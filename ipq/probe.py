@@ -0,0 +1,300 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""A native reachability prober.
+
+Probes with unprivileged ICMP echo sockets where the kernel allows
+them, and falls back to timing TCP connects otherwise. One socket per
+address family is shared by every probe, so many hosts can be probed
+at once without a process per host.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import itertools
+import os
+import socket
+import struct
+import time
+import typing as t
+
+from ipq import errors, models
+
+__all__ = ("DEFAULT_PORTS", "METHODS", "Prober", "icmp_available")
+
+DEFAULT_PORTS = (443, 80)
+METHODS = ("auto", "icmp", "tcp")
+
+# Echo request and reply types for each IP version
+ICMP_ECHO = {4: (8, 0), 6: (128, 129)}
+
+_FAMILIES = {4: (socket.AF_INET, socket.IPPROTO_ICMP), 6: (socket.AF_INET6, socket.IPPROTO_ICMPV6)}
+
+
+def icmp_available(version: int = 4) -> bool:
+    """Checks whether unprivileged ICMP echo sockets can be opened.
+
+    On Linux this depends on the `net.ipv4.ping_group_range` sysctl.
+    """
+    family, proto = _FAMILIES[version]
+
+    try:
+        socket.socket(family, socket.SOCK_DGRAM, proto).close()
+    except OSError:
+        return False
+
+    return True
+
+
+def _checksum(data: bytes) -> int:
+    """The internet checksum of the data."""
+    if len(data) % 2:
+        data += b"\0"
+
+    total: int = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+class _ICMPProtocol(asyncio.DatagramProtocol):
+    """Matches echo replies on one socket to pending probes."""
+
+    def __init__(self, version: int) -> None:
+        self.reply_type = ICMP_ECHO[version][1]
+        self.waiters: t.Dict[t.Tuple[str, int], asyncio.Future[float]] = {}
+
+    def datagram_received(self, data: bytes, addr: t.Any) -> None:
+        if data and data[0] >> 4 == 4 and len(data) >= 20 and self.reply_type == 0:
+            # Some platforms leave the IPv4 header on
+            data = data[(data[0] & 0x0F) * 4 :]
+
+        if len(data) < 8 or data[0] != self.reply_type:
+            return None
+
+        (seq,) = struct.unpack_from("!H", data, 6)
+        waiter = self.waiters.pop((ipaddress.ip_address(addr[0]).compressed, seq), None)
+
+        if waiter and not waiter.done():
+            waiter.set_result(time.perf_counter())
+
+    def error_received(self, exc: Exception) -> None:
+        # Unreachable errors are not tied to one probe, they just
+        # show up as loss once the probe times out
+        pass
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        for waiter in self.waiters.values():
+            if not waiter.done():
+                waiter.set_exception(exc or ConnectionError("ICMP socket closed"))
+
+        self.waiters.clear()
+
+
+class Prober:
+    """Probes hosts and reports their round trip times.
+
+    `method` is `icmp`, `tcp`, or `auto` to use ICMP where the kernel
+    allows it and TCP otherwise. TCP probes race a connect to each of
+    `ports`, and count the first connect or refused connection as a
+    reply, since the host still answered. Each host is sent `count`
+    probes, `interval` seconds apart, each waiting up to `timeout`
+    seconds for a reply.
+    """
+
+    __slots__ = (
+        "count",
+        "interval",
+        "max_in_flight",
+        "method",
+        "ports",
+        "timeout",
+        "_endpoints",
+        "_seq",
+        "_slots",
+    )
+
+    def __init__(
+        self,
+        count: int = 1,
+        interval: float = 1.0,
+        timeout: float = 1.0,
+        ports: t.Sequence[int] = DEFAULT_PORTS,
+        method: str = "auto",
+        max_in_flight: int = 256,
+    ) -> None:
+        if method not in METHODS:
+            raise errors.ProbeError(f"Unknown probe method {method!r}.")
+
+        if not ports and method != "icmp":
+            raise errors.ProbeError("At least one port is required for TCP probes.")
+
+        self.count = max(count, 1)
+        self.interval = interval
+        self.timeout = timeout
+        self.ports = tuple(ports)
+        self.method = method
+        self.max_in_flight = max_in_flight
+        self._endpoints: t.Dict[int, t.Tuple[asyncio.DatagramTransport, _ICMPProtocol]] = {}
+        self._seq = itertools.count(os.getpid())
+        self._slots: asyncio.Semaphore | None = None
+
+    async def __aenter__(self) -> Prober:
+        return self
+
+    async def __aexit__(self, *_: t.Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Closes the ICMP sockets."""
+        for transport, _ in self._endpoints.values():
+            transport.close()
+
+        self._endpoints.clear()
+
+    async def probe(self, address: str) -> models.PingData:
+        """Probes the IP address `count` times."""
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            raise errors.ProbeError(f"{address!r} is not a valid IP address.") from None
+
+        method = "tcp" if self.method == "tcp" else await self._icmp_or_tcp(ip.version)
+        send = self._icmp if method == "icmp" else self._tcp
+
+        if self._slots is None:
+            # Created lazily so it binds to the running loop
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+        async def one(i: int) -> float | None:
+            await asyncio.sleep(i * self.interval)
+
+            async with t.cast(asyncio.Semaphore, self._slots):
+                return await send(ip)
+
+        results = await asyncio.gather(*(one(i) for i in range(self.count)))
+        return models.PingData.from_rtts(
+            ip.compressed, method, self.count, [r * 1e3 for r in results if r is not None]
+        )
+
+    async def _icmp_or_tcp(self, version: int) -> str:
+        """Picks the method, opening the ICMP socket if need be."""
+        if version in self._endpoints:
+            return "icmp"
+
+        try:
+            await self._endpoint(version)
+        except (OSError, NotImplementedError) as e:
+            if self.method == "icmp":
+                raise errors.ProbeError(f"Cannot open an ICMP socket: {e}.") from e
+
+            return "tcp"
+
+        return "icmp"
+
+    async def _endpoint(self, version: int) -> t.Tuple[asyncio.DatagramTransport, _ICMPProtocol]:
+        if version not in self._endpoints:
+            family, proto = _FAMILIES[version]
+            sock = socket.socket(family, socket.SOCK_DGRAM, proto)
+            sock.setblocking(False)
+            self._endpoints[version] = await asyncio.get_event_loop().create_datagram_endpoint(
+                lambda: _ICMPProtocol(version), sock=sock
+            )
+
+        return self._endpoints[version]
+
+    async def _icmp(self, ip: ipaddress.IPv4Address | ipaddress.IPv6Address) -> float | None:
+        """Sends one echo request, returning the RTT or None if lost."""
+        transport, protocol = await self._endpoint(ip.version)
+        key = (ip.compressed, next(self._seq) & 0xFFFF)
+
+        while key in protocol.waiters:
+            key = (key[0], next(self._seq) & 0xFFFF)
+
+        # The kernel fills in the identifier, and the checksum for v6
+        header = struct.pack("!2B3H", ICMP_ECHO[ip.version][0], 0, 0, 0, key[1])
+        payload = struct.pack("!d", time.time())
+
+        if ip.version == 4:
+            checksum = _checksum(header + payload)
+            header = header[:2] + struct.pack("!H", checksum) + header[4:]
+
+        waiter: asyncio.Future[float] = asyncio.get_event_loop().create_future()
+        protocol.waiters[key] = waiter
+        start = time.perf_counter()
+
+        try:
+            transport.sendto(header + payload, (ip.compressed, 0))
+            return await asyncio.wait_for(waiter, self.timeout) - start
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            protocol.waiters.pop(key, None)
+
+    async def _connect(
+        self, ip: ipaddress.IPv4Address | ipaddress.IPv6Address, port: int
+    ) -> float | None:
+        """Times one TCP connect, returning the RTT or None if lost."""
+        start = time.perf_counter()
+
+        try:
+            _, writer = await asyncio.open_connection(ip.compressed, port)
+        except ConnectionRefusedError:
+            return time.perf_counter() - start
+        except OSError:
+            return None
+
+        rtt = time.perf_counter() - start
+        writer.close()
+        return rtt
+
+    async def _tcp(self, ip: ipaddress.IPv4Address | ipaddress.IPv6Address) -> float | None:
+        """Times a TCP connect, returning the RTT or None if lost.
+
+        Ports are raced within the one timeout, and the first connect
+        or refusal wins, so a filtered port does not hide an open one.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.timeout
+        pending = {asyncio.ensure_future(self._connect(ip, port)) for port in self.ports}
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=deadline - loop.time(), return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    break
+
+                for task in done:
+                    rtt = task.result()
+
+                    if rtt is not None:
+                        return rtt
+        finally:
+            for task in pending:
+                task.cancel()
+
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        return None
@@ -0,0 +1,509 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""An RDAP backend, querying registries over pooled HTTP connections.
+
+RDAP answers are structured JSON, found through the IANA bootstrap
+files, which are cached locally. They are rendered as the `key: value`
+lines the WHOIS parser reads, so the cache and netblock index work
+the same for every backend.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import json
+import os
+import ssl
+import time
+import typing as t
+from dataclasses import dataclass
+from pathlib import Path
+from urllib import parse
+
+import ipq
+from ipq import cache, errors, timings, whois
+
+__all__ = ("ConnectionPool", "RdapClient", "Response", "format_domain", "format_ip")
+
+DEFAULT_BOOTSTRAP = "https://data.iana.org/rdap/"
+BOOTSTRAP_TTL = 7 * 24 * 60 * 60
+MAX_REDIRECTS = 3
+
+_EVENTS = {
+    "registration": "Creation Date",
+    "last changed": "Updated Date",
+    "expiration": "Registry Expiry Date",
+}
+
+_Connection = t.Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+@dataclass(frozen=True)
+class Response:
+    """A HTTP response, read in full."""
+
+    status: int
+    headers: t.Dict[str, str]
+    body: bytes
+
+    def json(self) -> t.Any:
+        """Decodes the body as JSON."""
+        try:
+            return json.loads(self.body)
+        except ValueError as e:
+            raise errors.WhoisError(f"Invalid RDAP response: {e}.") from None
+
+
+class ConnectionPool:
+    """Keeps HTTP/1.1 connections alive for reuse, per host.
+
+    At most `max_connections` requests are in flight to each host, and
+    connections are returned to the pool once their response has been
+    read. A pooled connection the server has since closed is replaced
+    transparently.
+    """
+
+    __slots__ = ("connect_timeout", "max_connections", "timeout", "_idle", "_limits", "_ssl")
+
+    def __init__(
+        self, max_connections: int = 8, timeout: float = 10.0, connect_timeout: float = 5.0
+    ) -> None:
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._idle: t.Dict[t.Tuple[str, str, int], t.List[_Connection]] = {}
+        self._limits: t.Dict[t.Tuple[str, str, int], asyncio.Semaphore] = {}
+        self._ssl: ssl.SSLContext | None = None
+
+    async def close(self) -> None:
+        """Closes every idle connection."""
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+
+        self._idle.clear()
+
+    async def get(self, url: str) -> Response:
+        """Sends a GET request for the URL."""
+        parts = parse.urlsplit(url)
+        https = parts.scheme == "https"
+        host = parts.hostname or ""
+        port = parts.port or (443 if https else 80)
+        key = (parts.scheme, host, port)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        header = host if parts.port is None else f"{host}:{port}"
+
+        if key not in self._limits:
+            self._limits[key] = asyncio.Semaphore(self.max_connections)
+
+        async with self._limits[key]:
+            while True:
+                idle = self._idle.get(key)
+                reused = bool(idle)
+                conn = idle.pop() if idle else await self._connect(host, port, https)
+
+                try:
+                    response, keep = await asyncio.wait_for(
+                        self._exchange(conn, header, target), self.timeout
+                    )
+                except asyncio.TimeoutError:
+                    conn[1].close()
+                    raise errors.WhoisError(f"Timed out waiting on {host!r}.") from None
+                except (OSError, EOFError, ValueError) as e:
+                    conn[1].close()
+
+                    if reused:
+                        # Closed by the server while it sat idle
+                        continue
+
+                    raise errors.WhoisError(f"Lost connection to {host!r}: {e}.") from e
+
+                if keep:
+                    self._idle.setdefault(key, []).append(conn)
+                else:
+                    conn[1].close()
+
+                return response
+
+    async def _connect(self, host: str, port: int, https: bool) -> _Connection:
+        context = None
+
+        if https:
+            context = self._ssl = self._ssl or ssl.create_default_context()
+
+        with timings.stage("rdap.connect", host):
+            try:
+                return await asyncio.wait_for(
+                    asyncio.open_connection(host, port, ssl=context), self.connect_timeout
+                )
+            except asyncio.TimeoutError:
+                raise errors.WhoisError(f"Timed out connecting to {host!r}.") from None
+            except OSError as e:
+                raise errors.WhoisError(f"Could not connect to {host!r}: {e}.") from e
+
+    @staticmethod
+    async def _exchange(conn: _Connection, host: str, target: str) -> t.Tuple[Response, bool]:
+        """Sends the request, returning the response and whether the
+        connection may be reused.
+        """
+        reader, writer = conn
+        writer.write(
+            f"GET {target} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Accept: application/rdap+json, application/json\r\n"
+            f"User-Agent: ipq/{ipq.__version__}\r\n"
+            "Connection: keep-alive\r\n\r\n".encode("ascii")
+        )
+        await writer.drain()
+
+        status_line = await reader.readline()
+
+        if not status_line:
+            raise EOFError("the connection was closed")
+
+        version, status, *_ = status_line.decode("latin-1").split(None, 2)
+        headers: t.Dict[str, str] = {}
+
+        while True:
+            line = await reader.readline()
+
+            if not line.strip():
+                break
+
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await ConnectionPool._read_chunked(reader)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body, keep = await reader.read(), False
+
+        return Response(int(status), headers, body), keep
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks: t.List[bytes] = []
+
+        while True:
+            size = int((await reader.readline()).split(b";", 1)[0], 16)
+
+            if not size:
+                # Skip any trailers, up to the blank line
+                while (await reader.readline()).strip():
+                    pass
+
+                return b"".join(chunks)
+
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+
+class RdapClient(whois.WhoisBackend):
+    """Queries the RDAP server of the registry or RIR responsible.
+
+    Servers are found in the IANA bootstrap files under `bootstrap`,
+    which are kept in `cache_dir` for a week. Each server gets the
+    `RateLimiter` its `ServerConfig` in `servers` describes, and its
+    connections are kept alive in a `ConnectionPool`.
+    """
+
+    __slots__ = (
+        "bootstrap",
+        "cache_dir",
+        "pool",
+        "servers",
+        "_limiters",
+        "_loading",
+        "_services",
+    )
+
+    def __init__(
+        self,
+        bootstrap: str = DEFAULT_BOOTSTRAP,
+        *,
+        servers: t.Mapping[str, whois.ServerConfig] | None = None,
+        cache_dir: str | Path | None = None,
+        pool: ConnectionPool | None = None,
+    ) -> None:
+        self.bootstrap = bootstrap.rstrip("/") + "/"
+        self.servers = dict(servers or {})
+        self.cache_dir = Path(cache_dir) if cache_dir else cache.default_path().parent
+        self.pool = pool or ConnectionPool()
+        self._limiters: t.Dict[str, whois.RateLimiter] = {}
+        self._services: t.Dict[str, t.List[t.Tuple[t.List[str], t.List[str]]]] = {}
+        self._loading: asyncio.Lock | None = None
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    async def query(self, query: str) -> str:
+        query = query.lower()
+
+        if not query.isascii():
+            query = query.encode("idna").decode("ascii")
+
+        address = whois.ipaddress_query(query)
+
+        if address is None:
+            base = self._find_domain(await self.services("dns"), query)
+        else:
+            base = self._find_ip(await self.services(f"ipv{address.version}"), address)
+
+        if base is None:
+            raise errors.WhoisError(f"No RDAP server is known for {query!r}.")
+
+        path = f"domain/{query}" if address is None else f"ip/{query}"
+        response = await self.fetch(parse.urljoin(base.rstrip("/") + "/", path))
+
+        if response.status == 404:
+            # Parsed as a response without data, as WHOIS would be
+            return ""
+
+        if response.status != 200:
+            raise errors.WhoisError(f"RDAP query for {query!r} failed: {response.status}.")
+
+        data = response.json()
+        return format_domain(data) if address is None else format_ip(data)
+
+    async def fetch(self, url: str) -> Response:
+        """Gets the URL, following redirects and pacing each server.
+
+        Raises `RateLimitError` if a server is still throttling us after
+        every retry.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            host = parse.urlsplit(url).hostname or ""
+            limiter = self.limiter(host)
+
+            for _ in range(limiter.config.max_retries + 1):
+                await limiter.acquire()
+
+                with timings.stage("rdap.server", host):
+                    response = await self.pool.get(url)
+
+                if response.status != 429:
+                    limiter.succeeded()
+                    break
+
+                limiter.throttled()
+            else:
+                raise errors.RateLimitError(f"{host!r} is rate limiting queries.")
+
+            location = response.headers.get("location")
+
+            if response.status not in (301, 302, 303, 307, 308) or not location:
+                return response
+
+            url = parse.urljoin(url, location)
+
+        raise errors.WhoisError(f"Too many redirects from {url!r}.")
+
+    def limiter(self, host: str) -> whois.RateLimiter:
+        """Gets the rate limiter of the given server."""
+        if host not in self._limiters:
+            self._limiters[host] = whois.RateLimiter(self.servers.get(host, whois.ServerConfig()))
+
+        return self._limiters[host]
+
+    async def services(self, kind: str) -> t.List[t.Tuple[t.List[str], t.List[str]]]:
+        """Gets the `dns`, `ipv4` or `ipv6` bootstrap services.
+
+        They are loaded once per client, from the local copy if it is
+        fresh. A stale copy is still used if fetching a new one fails.
+        """
+        if kind in self._services:
+            return self._services[kind]
+
+        if self._loading is None:
+            self._loading = asyncio.Lock()
+
+        async with self._loading:
+            if kind not in self._services:
+                self._services[kind] = await self._load(kind)
+
+        return self._services[kind]
+
+    async def _load(self, kind: str) -> t.List[t.Tuple[t.List[str], t.List[str]]]:
+        path = self.cache_dir / f"rdap-{kind}.json"
+        data = None
+
+        try:
+            if time.time() - path.stat().st_mtime < BOOTSTRAP_TTL:
+                data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            pass
+
+        if data is None:
+            try:
+                response = await self.fetch(f"{self.bootstrap}{kind}.json")
+
+                if response.status != 200:
+                    raise errors.WhoisError(f"Bootstrap fetch failed: {response.status}.")
+
+                data = response.json()
+                self._save(path, response.body)
+            except errors.WhoisError:
+                if not path.exists():
+                    raise
+
+                data = json.loads(path.read_text(encoding="utf-8"))
+
+        return [(list(keys), list(urls)) for keys, urls in data["services"]]
+
+    @staticmethod
+    def _save(path: Path, body: bytes) -> None:
+        """Writes the bootstrap file atomically, ignoring failures."""
+        tmp = path.with_suffix(".tmp")
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _find_domain(
+        services: t.List[t.Tuple[t.List[str], t.List[str]]], domain: str
+    ) -> str | None:
+        """Finds the server of the longest matching suffix."""
+        bases = {key.lower(): urls for keys, urls in services for key in keys}
+        labels = domain.split(".")
+
+        for i in range(len(labels)):
+            urls = bases.get(".".join(labels[i:]))
+
+            if urls:
+                return _prefer_https(urls)
+
+        return None
+
+    @staticmethod
+    def _find_ip(
+        services: t.List[t.Tuple[t.List[str], t.List[str]]],
+        address: ipaddress.IPv4Address | ipaddress.IPv6Address,
+    ) -> str | None:
+        """Finds the server of the most specific matching network."""
+        best: t.Tuple[int, str] | None = None
+
+        for keys, urls in services:
+            for key in keys:
+                try:
+                    network = ipaddress.ip_network(key, strict=False)
+                except ValueError:
+                    continue
+
+                if address in network and (best is None or network.prefixlen > best[0]):
+                    best = (network.prefixlen, _prefer_https(urls))
+
+        return best and best[1]
+
+
+def _prefer_https(urls: t.List[str]) -> str:
+    return next((url for url in urls if url.startswith("https:")), urls[0])
+
+
+def _entities(data: t.Mapping[str, t.Any], role: str) -> t.Iterator[t.Mapping[str, t.Any]]:
+    """Yields the entities with the role, including nested ones."""
+    for entity in data.get("entities") or ():
+        if role in (entity.get("roles") or ()):
+            yield entity
+
+        yield from _entities(entity, role)
+
+
+def _vcard(entity: t.Mapping[str, t.Any], name: str) -> t.List[t.Any]:
+    """Gets a vCard property of the entity, with its parameters."""
+    try:
+        properties = entity["vcardArray"][1]
+    except (KeyError, IndexError, TypeError):
+        return []
+
+    return next((p for p in properties if p and p[0] == name), [])
+
+
+def _status(status: str) -> str:
+    """Turns an RDAP status into its EPP form, as WHOIS shows it."""
+    first, *rest = status.split()
+    return first + "".join(word.capitalize() for word in rest)
+
+
+def format_domain(data: t.Mapping[str, t.Any]) -> str:
+    """Renders an RDAP domain as the lines of a WHOIS answer."""
+    lines = []
+
+    if data.get("ldhName"):
+        lines.append(f"Domain Name: {data['ldhName'].upper()}")
+
+    for entity in _entities(data, "registrar"):
+        name = _vcard(entity, "fn")
+
+        if name:
+            lines.append(f"Registrar: {name[3]}")
+            break
+
+    for event in data.get("events") or ():
+        label = _EVENTS.get(event.get("eventAction", ""))
+
+        if label and event.get("eventDate"):
+            lines.append(f"{label}: {event['eventDate']}")
+
+    lines.extend(f"Domain Status: {_status(s)}" for s in data.get("status") or ())
+
+    for server in data.get("nameservers") or ():
+        if server.get("ldhName"):
+            lines.append(f"Name Server: {server['ldhName'].upper()}")
+
+    return "\n".join(lines) + "\n"
+
+
+def format_ip(data: t.Mapping[str, t.Any]) -> str:
+    """Renders an RDAP IP network as the lines of a WHOIS answer."""
+    lines = []
+
+    if data.get("startAddress") and data.get("endAddress"):
+        lines.append(f"inetnum: {data['startAddress']} - {data['endAddress']}")
+
+    for entity in _entities(data, "registrant"):
+        name, address = _vcard(entity, "fn"), _vcard(entity, "adr")
+
+        if name:
+            lines.append(f"OrgName: {name[3]}")
+
+        if address and isinstance(address[3], list) and len(address[3]) > 5:
+            if address[3][3]:
+                lines.append(f"City: {address[3][3]}")
+
+            if address[3][5]:
+                lines.append(f"PostalCode: {address[3][5]}")
+
+        if name:
+            break
+
+    if data.get("country"):
+        lines.append(f"Country: {data['country']}")
+
+    return "\n".join(lines) + "\n"
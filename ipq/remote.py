@@ -0,0 +1,139 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Forwards lookups to a running `ipq serve` daemon.
+
+Kept light, with no asyncio or lookup backends, so a forwarded run
+costs little more than starting the interpreter.
+
+A request is a line of JSON holding the host, the options, and
+whether a hosts file follows. If it does, the file is sent after it as
+is, line by line, until the client shuts down its side of the socket.
+The daemon replies with lines of `{"out": text}` or `{"err": text}`,
+then `{"ok": bool}` when done.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import typing as t
+from pathlib import Path
+
+__all__ = ("connect", "forward", "running", "socket_path")
+
+ANSI_RGX = re.compile(r"\x1b\[[\d;]*m")
+
+
+def socket_path() -> Path:
+    """Gets where the daemon listens, `$IPQ_SOCKET` if it is set."""
+    if "IPQ_SOCKET" in os.environ:
+        return Path(os.environ["IPQ_SOCKET"])
+
+    base = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("XDG_CACHE_HOME")
+    return Path(base or Path.home() / ".cache") / "ipq" / "daemon.sock"
+
+
+def connect(path: Path | None = None) -> socket.socket | None:
+    """Connects to the daemon, or returns None if none is running."""
+    path = path or socket_path()
+
+    if not hasattr(socket, "AF_UNIX") or not path.exists():
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+
+    return sock
+
+
+def running(path: Path | None = None) -> bool:
+    """Checks whether a daemon is listening."""
+    sock = connect(path)
+
+    if sock is None:
+        return False
+
+    sock.close()
+    return True
+
+
+def forward(
+    host: str | None, hosts_file: t.TextIO | None, options: t.Mapping[str, t.Any]
+) -> bool | None:
+    """Runs the lookups on the daemon, printing what it sends back.
+
+    Returns whether every host succeeded, or None if no daemon is
+    running, in which case nothing was done.
+    """
+    sock = connect()
+
+    if sock is None:
+        return None
+
+    request = {"host": host, "hosts": hosts_file is not None, "options": options}
+    streams = {"out": sys.stdout, "err": sys.stderr}
+    colors = {name: stream.isatty() for name, stream in streams.items()}
+    sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+
+    if hosts_file is not None:
+        # Sent from a thread, so replies are read while the file is
+        # still going out and neither side blocks on a full buffer
+        threading.Thread(target=_send_hosts, args=(sock, hosts_file), daemon=True).start()
+
+    with sock, sock.makefile("rb") as conn:
+        for line in conn:
+            reply = json.loads(line)
+
+            if "ok" in reply:
+                return bool(reply["ok"])
+
+            for name, text in reply.items():
+                # The daemon always colours its output
+                text = text if colors[name] else ANSI_RGX.sub("", text)
+                streams[name].write(text)
+                streams[name].flush()
+
+    print("The ipq daemon closed the connection early.", file=sys.stderr)
+    return False
+
+
+def _send_hosts(sock: socket.socket, hosts_file: t.TextIO) -> None:
+    """Sends the hosts file line by line, then shuts down writing."""
+    try:
+        for line in hosts_file:
+            if not line.endswith("\n"):
+                line += "\n"
+
+            sock.sendall(line.encode("utf-8"))
+
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        # The daemon went away, and the reader reports that
+        pass
@@ -0,0 +1,309 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Runs the lookups the command line asked for.
+
+Kept apart from `ipq.cli`, so parsing arguments, `--help` and
+`--version` never import asyncio and the lookup backends.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import sys
+import time
+import typing as t
+from dataclasses import dataclass
+
+import ipq
+from ipq import (
+    bulk,
+    cache,
+    client,
+    dns,
+    errors,
+    geo,
+    hedge,
+    models,
+    output,
+    probe,
+    timings,
+    utils,
+)
+
+__all__ = ("Options", "execute", "open_client", "run")
+
+
+@dataclass
+class Options:
+    """Options shared by every lookup in a run."""
+
+    include_whois: bool
+    ping: bool
+    ptr: bool
+    skip_no_ptr: bool
+    whois_backend: str
+    output_format: str
+    concurrency: int
+    use_cache: bool
+    refresh: bool
+    cache_stats: bool
+    show_timings: bool
+    count: int
+    interval: float
+    probe_timeout: float
+    ports: t.Tuple[int, ...]
+    probe_method: str
+    deadline: float | None
+    stage_timeout: float | None
+    hedge: float | None
+    hedge_nameservers: t.Tuple[str, ...]
+    geo_db: str | None
+    netblocks: bool
+
+
+def run(host: str | None, hosts_file: t.TextIO | None, options: Options) -> bool:
+    """Looks up the host, or every host in the file.
+
+    CIDR blocks and IP ranges, as the host or in the file, are looked
+    up address by address.
+
+    Returns whether every host succeeded.
+    """
+    lookup_cache = cache.Cache(refresh=options.refresh) if options.use_cache else None
+    recorder = timings.Recorder() if options.show_timings else None
+    hosts = bulk.read_hosts(hosts_file) if hosts_file else None
+
+    if recorder:
+        timings.subscribe(recorder)
+        timings.emit("startup", time.perf_counter() - ipq.IMPORT_STARTED)
+
+    async def main() -> bool:
+        async with open_client(options, lookup_cache) as session:
+            return await execute(host, hosts, options, session, recorder=recorder)
+
+    try:
+        return asyncio.run(main())
+    finally:
+        if lookup_cache:
+            if options.cache_stats:
+                print(f"Cache: {lookup_cache.stats() or 'unused'}", file=sys.stderr)
+
+            lookup_cache.close()
+
+        if recorder:
+            timings.unsubscribe(recorder)
+            print(recorder.format_summary(), file=sys.stderr)
+
+
+async def execute(
+    host: str | None,
+    hosts: t.Iterable[str] | t.AsyncIterable[str] | None,
+    options: Options,
+    session: client.Client,
+    out: t.TextIO | None = None,
+    err: t.TextIO | None = None,
+    recorder: timings.Recorder | None = None,
+    drain: t.Callable[[], t.Awaitable[None]] | None = None,
+) -> bool:
+    """Looks up the host, or the hosts, with an open client.
+
+    Output goes to `out` and `err`, or stdout and stderr by default.
+    If they buffer, `drain` is awaited after each host or section is
+    written, so a slow reader holds the lookups back. Returns whether
+    every host succeeded. With `cache_stats`, how many queries were
+    deduplicated is printed to `err` at the end.
+    """
+    state = _State(options, recorder, out or sys.stdout, err or sys.stderr, drain or _drained)
+    addresses = bulk.network(host) if host else None
+    ok = True
+
+    if isinstance(hosts, t.AsyncIterable):
+        ok = await _bulk(bulk.stream(hosts), options.concurrency, session, state)
+    elif hosts is not None:
+        hosts = bulk.expand(bulk.prepare(hosts))
+        ok = await _bulk(hosts, options.concurrency, session, state)
+    elif addresses is not None:
+        ok = await _bulk(addresses, options.concurrency, session, state)
+    elif options.output_format == "text":
+        ok = await _single(t.cast(str, host), session, state)
+    else:
+        ok = await _bulk([t.cast(str, host)], 1, session, state)
+
+    if options.cache_stats:
+        counts = ", ".join(f"{k} {v}" for k, v in session.deduplicated.items() if v)
+        print(f"Deduplicated: {counts or 'none'}", file=state.err)
+
+    return ok
+
+
+async def _drained() -> None:
+    """Waits for nothing, for output that does not buffer."""
+
+
+@dataclass
+class _State:
+    """What every lookup in a run shares."""
+
+    options: Options
+    recorder: timings.Recorder | None
+    out: t.TextIO
+    err: t.TextIO
+    drain: t.Callable[[], t.Awaitable[None]]
+
+
+def _timings_key(host: str) -> str:
+    """Gets the host that timings for the given input are kept under."""
+    try:
+        return utils.normalize_host(host)
+    except errors.InvalidHost:
+        return host
+
+
+def _missing_ptr(result: models.LookupResult | errors.IpqError) -> bool:
+    """Checks whether the lookup found that the IP has no PTR record."""
+    if isinstance(result, errors.IpqError):
+        return False
+
+    section = result.ptr or result.ip
+    return section is not None and section.hostname == models.NOT_FOUND
+
+
+@contextlib.asynccontextmanager
+async def open_client(
+    options: Options, lookup_cache: cache.Cache | None
+) -> t.AsyncIterator[client.Client]:
+    """Opens a client set up as the options ask."""
+    prober = probe.Prober(
+        options.count,
+        options.interval,
+        options.probe_timeout,
+        options.ports,
+        options.probe_method,
+    )
+
+    async with contextlib.AsyncExitStack() as stack:
+        hedger = None
+
+        if options.hedge:
+            backup = None
+
+            if options.hedge_nameservers:
+                backup = dns.UDPResolver(options.hedge_nameservers)
+                await stack.enter_async_context(backup)
+
+            hedger = hedge.Hedger(options.hedge, resolver=backup)
+
+        geo_db = stack.enter_context(geo.GeoDB(options.geo_db)) if options.geo_db else None
+        await stack.enter_async_context(prober)
+        yield await stack.enter_async_context(
+            client.Client(
+                whois_backend=options.whois_backend,
+                prober=prober,
+                lookup_cache=lookup_cache,
+                deadline=options.deadline,
+                stage_timeout=options.stage_timeout,
+                hedger=hedger,
+                geo_db=geo_db,
+                netblocks=options.netblocks,
+            )
+        )
+
+
+async def _single(host: str, session: client.Client, state: _State) -> bool:
+    """Queries one host, printing each section as it becomes ready.
+
+    Sections that fail are reported to `err`, and the rest are still
+    printed. Returns whether every section succeeded.
+    """
+    ok = True
+    host = utils.normalize_host(host)
+    sections = session.stream(
+        host,
+        whois=state.options.include_whois,
+        ping=state.options.ping,
+        ptr=state.options.ptr,
+    )
+
+    async for name, section in sections:
+        if isinstance(section, errors.IpqError):
+            print(f"{host} ({name}): {section}", file=state.err, flush=True)
+            ok = False
+        else:
+            with timings.for_host(host), timings.stage("format"):
+                print(output.format_section(section), file=state.out, flush=True)
+
+        await state.drain()
+
+    if state.recorder:
+        print(state.recorder.format_host(host), file=state.err)
+
+    return ok
+
+
+async def _bulk(
+    hosts: t.Iterable[str] | t.AsyncIterable[str],
+    concurrency: int,
+    session: client.Client,
+    state: _State,
+) -> bool:
+    """Queries every host, writing each one out as it finishes.
+
+    Returns whether every host succeeded.
+    """
+    ok = True
+    writer = output.get_writer(state.options.output_format, state.out, state.err)
+    results = client.alookup_many(
+        hosts,
+        whois=state.options.include_whois,
+        ping=state.options.ping,
+        ptr=state.options.ptr,
+        concurrency=concurrency,
+        client=session,
+    )
+
+    try:
+        async for host, result in results:
+            key = _timings_key(host)
+
+            if state.options.skip_no_ptr and _missing_ptr(result):
+                if state.recorder:
+                    # Skipped hosts get no timings block either
+                    state.recorder.pop(key)
+
+                continue
+
+            with timings.for_host(key), timings.stage("format"):
+                if isinstance(result, errors.IpqError):
+                    writer.write(host, None, result)
+                    ok = False
+                else:
+                    writer.write(host, result)
+                    ok = ok and result.complete
+
+            if state.recorder:
+                print(state.recorder.format_host(key), file=state.err)
+
+            await state.drain()
+    finally:
+        await results.aclose()
+
+    return ok
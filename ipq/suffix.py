@@ -0,0 +1,138 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Finds registrable domains with the public suffix list."""
+
+from __future__ import annotations
+
+import functools
+import os
+import typing as t
+from pathlib import Path
+
+from ipq import errors
+
+__all__ = ("SuffixList", "load", "registrable_domain")
+
+BUNDLED_PATH = Path(__file__).with_name("public_suffix_list.dat")
+
+# Marks a trie node that ends a rule, and cannot clash with a label
+_END = ""
+
+
+class SuffixList:
+    """A trie of public suffix rules, keyed by label from the right.
+
+    Finding a suffix walks one node per label, however many rules
+    there are. Wildcard (`*.ck`) and exception (`!www.ck`) rules are
+    supported, and any TLD without a rule is a suffix by itself.
+    Labels are compared in their ASCII form, so IDN rules and domains
+    match whether they are written in Unicode or punycode.
+    """
+
+    __slots__ = ("_root",)
+
+    def __init__(self, rules: t.Iterable[str]) -> None:
+        self._root: t.Dict[str, t.Any] = {}
+
+        for line in rules:
+            rule = line.strip().split(" ", 1)[0].lower()
+
+            if not rule or rule.startswith("//"):
+                continue
+
+            node = self._root
+
+            for label in reversed(rule.split(".")):
+                node = node.setdefault(_ascii(label), {})
+
+            node[_END] = True
+
+    def suffix_length(self, labels: t.Sequence[str]) -> int:
+        """Gets how many of the rightmost labels are the suffix."""
+        node, length = self._root, 1
+
+        for i, label in enumerate(reversed(labels)):
+            label = _ascii(label)
+
+            if f"!{label}" in node:
+                return i
+
+            child = node.get(label) or node.get("*")
+
+            if child is None:
+                break
+
+            node = child
+
+            if _END in node:
+                length = i + 1
+
+        return length
+
+    def public_suffix(self, domain: str) -> str:
+        """Gets the public suffix of the domain, like `co.uk`."""
+        labels = domain.lower().rstrip(".").split(".")
+        return ".".join(labels[-self.suffix_length(labels) :])
+
+    def registrable_domain(self, domain: str) -> str | None:
+        """Gets the domain one label below its public suffix.
+
+        Returns None if the domain is itself a public suffix.
+        """
+        labels = domain.lower().rstrip(".").split(".")
+        length = self.suffix_length(labels)
+
+        if length >= len(labels):
+            return None
+
+        return ".".join(labels[-length - 1 :])
+
+
+def _ascii(label: str) -> str:
+    """Gets the punycode form of a Unicode label."""
+    if label.isascii():
+        return label
+
+    try:
+        return label.encode("idna").decode("ascii")
+    except UnicodeError:
+        return label
+
+
+@functools.lru_cache(maxsize=None)
+def load(path: str | None = None) -> SuffixList:
+    """Loads the list once, and reuses it after.
+
+    Uses the file at `path`, then `$IPQ_PUBLIC_SUFFIX_LIST`, and the
+    subset bundled with ipq if neither is set.
+    """
+    source = Path(path or os.environ.get("IPQ_PUBLIC_SUFFIX_LIST") or BUNDLED_PATH)
+
+    try:
+        with source.open(encoding="utf-8") as f:
+            return SuffixList(f)
+    except OSError as e:
+        raise errors.IpqError(f"Could not read the public suffix list: {e}.") from None
+
+
+def registrable_domain(domain: str) -> str | None:
+    """Gets the registrable domain with the default list."""
+    return load().registrable_domain(domain)
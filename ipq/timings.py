@@ -0,0 +1,237 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Per stage timing instrumentation.
+
+Each stage of a lookup, like the forward DNS lookup, a query to one
+WHOIS server or parsing a response, is timed and passed to every
+subscribed hook as a `Timing`. Nothing is timed while there are no
+hooks.
+
+```py
+from ipq import timings
+
+timings.subscribe(lambda timing: print(timing))
+```
+"""
+
+from __future__ import annotations
+
+import collections
+import contextlib
+import contextvars
+import random
+import time
+import typing as t
+from dataclasses import dataclass
+
+__all__ = (
+    "Hook",
+    "Recorder",
+    "Reservoir",
+    "Timing",
+    "emit",
+    "for_host",
+    "percentile",
+    "stage",
+    "subscribe",
+    "unsubscribe",
+)
+
+Hook = t.Callable[["Timing"], None]
+
+current_host: contextvars.ContextVar[str] = contextvars.ContextVar("ipq_host", default="")
+
+_hooks: t.List[Hook] = []
+
+
+@dataclass(frozen=True)
+class Timing:
+    """How long one stage of a lookup took.
+
+    `host` is empty outside of a lookup, and `target` is the server
+    the stage talked to, if any. `ok` is false if the stage raised.
+    """
+
+    __slots__ = ("host", "stage", "target", "seconds", "ok")
+
+    host: str
+    stage: str
+    target: str
+    seconds: float
+    ok: bool
+
+
+def subscribe(hook: Hook) -> Hook:
+    """Calls the hook with every `Timing` from now on.
+
+    Returns the hook, so this can be used as a decorator.
+    """
+    _hooks.append(hook)
+    return hook
+
+
+def unsubscribe(hook: Hook) -> None:
+    """Stops calling the hook. Does nothing if it is not subscribed."""
+    with contextlib.suppress(ValueError):
+        _hooks.remove(hook)
+
+
+def emit(name: str, seconds: float, target: str = "", ok: bool = True) -> None:
+    """Passes a timing for the current host to every hook."""
+    if _hooks:
+        timing = Timing(current_host.get(), name, target, seconds, ok)
+
+        for hook in tuple(_hooks):
+            hook(timing)
+
+
+@contextlib.contextmanager
+def stage(name: str, target: str = "") -> t.Iterator[None]:
+    """Times the body of the `with` block as the given stage."""
+    if not _hooks:
+        yield
+        return
+
+    ok = False
+    start = time.perf_counter()
+
+    try:
+        yield
+        ok = True
+    finally:
+        emit(name, time.perf_counter() - start, target, ok)
+
+
+@contextlib.contextmanager
+def for_host(host: str) -> t.Iterator[None]:
+    """Attributes timings in the `with` block to the host."""
+    token = current_host.set(host)
+
+    try:
+        yield
+    finally:
+        current_host.reset(token)
+
+
+def percentile(samples: t.Sequence[float], pct: float) -> float:
+    """The nearest rank percentile of the samples."""
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, round(len(ordered) * pct / 100) - 1))]
+
+
+class Reservoir:
+    """A fixed size, uniform sample of the durations of one stage.
+
+    Keeps at most `size` durations, so long bulk runs use constant
+    memory, while `count` and `max` stay exact.
+    """
+
+    __slots__ = ("size", "count", "max", "samples", "_random")
+
+    def __init__(self, size: int = 4096, seed: int | None = None) -> None:
+        self.size = size
+        self.count = 0
+        self.max = 0.0
+        self.samples: t.List[float] = []
+        self._random = random.Random(seed)
+
+    def add(self, seconds: float) -> None:
+        """Adds a duration, replacing a random sample once full."""
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+        if len(self.samples) < self.size:
+            self.samples.append(seconds)
+            return
+
+        index = self._random.randrange(self.count)
+
+        if index < self.size:
+            self.samples[index] = seconds
+
+
+class Recorder:
+    """Collects timings per host, and overall for percentiles.
+
+    Subscribes itself while open. Per host timings are kept until they
+    are popped, while the overall ones are kept as a `Reservoir` of
+    bare durations per stage and target.
+    """
+
+    __slots__ = ("hosts", "samples", "size")
+
+    def __init__(self, size: int = 4096) -> None:
+        self.size = size
+        self.hosts: t.DefaultDict[str, t.List[Timing]] = collections.defaultdict(list)
+        self.samples: t.Dict[t.Tuple[str, str], Reservoir] = {}
+
+    def __enter__(self) -> Recorder:
+        subscribe(self)
+        return self
+
+    def __exit__(self, *_: t.Any) -> None:
+        unsubscribe(self)
+
+    def __call__(self, timing: Timing) -> None:
+        self.hosts[timing.host].append(timing)
+        key = timing.stage, timing.target
+
+        if key not in self.samples:
+            self.samples[key] = Reservoir(self.size)
+
+        self.samples[key].add(timing.seconds)
+
+    def pop(self, host: str) -> t.List[Timing]:
+        """Removes and returns the timings of the host."""
+        return self.hosts.pop(host, [])
+
+    def format_host(self, host: str) -> str:
+        """Pops the hosts timings and formats them, one per line."""
+        lines = [f"{host} timings:"]
+
+        for timing in self.pop(host):
+            status = "" if timing.ok else " (failed)"
+            lines.append(
+                f"  {timing.stage:<14} {timing.target:<24} "
+                f"{timing.seconds * 1e3:9.2f} ms{status}"
+            )
+
+        return "\n".join(lines)
+
+    def format_summary(self) -> str:
+        """Formats percentiles of every stage and target, in ms.
+
+        Past the reservoir size the percentiles are estimates, while
+        the count and max are exact.
+        """
+        lines = [
+            f"  {'stage':<14} {'target':<24} {'count':>6} "
+            f"{'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+        ]
+
+        for (name, target), reservoir in sorted(self.samples.items()):
+            p50, p95, p99 = (percentile(reservoir.samples, p) * 1e3 for p in (50, 95, 99))
+            lines.append(
+                f"  {name:<14} {target:<24} {reservoir.count:>6} "
+                f"{p50:9.2f} {p95:9.2f} {p99:9.2f} {reservoir.max * 1e3:9.2f}"
+            )
+
+        return "Timings (ms):\n" + "\n".join(lines)
@@ -22,22 +22,23 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import functools
 import re
 import shutil
 import sys
 import typing as t
+from urllib import parse
 
 from ipq import errors
 
-ReturnT = t.Callable[..., str]
-RequiresT = t.Callable[[ReturnT], ReturnT]
-
-
 DOMAIN_RGX = re.compile(r"^((?!-)[\w\d-]{1,63}(?<!-)\.)+[a-zA-Z][\w]{1,5}$")
 IP_RGX = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$")
-NSLOOKUP_IP_RGX = re.compile(r"\n\nNon-authoritative answer:\n.*\nAddress: (.*)\n")
-NSLOOKUP_HOST_RGX = re.compile(r"name = (.*)\n")
+CIDR_RGX = re.compile(r"^\d{1,3}(?:\.\d{1,3}){3}/\d{1,2}$")
+RANGE_RGX = re.compile(r"^(\d{1,3}(?:\.\d{1,3}){3})-(\d{1,3}(?:\.\d{1,3}){3}|\d{1,3})$")
+NSLOOKUP_IP_RGX = re.compile(r"^\s*(?:Address(?:es)?:)?\s*([\da-fA-F.:]+)\s*$", re.M)
+NSLOOKUP_HOST_RGX = re.compile(r"name = (\S+)")
 
 
 @functools.lru_cache
@@ -46,25 +47,105 @@ def check_availability(command: str) -> bool:
     return shutil.which(command) is not None
 
 
-def requires(*commands: str) -> RequiresT:
-    """Decorator to require the given commands."""
+def normalize_host(host: str) -> str:
+    """Strips any URL parts from the host and validates it.
+
+    Raises `InvalidHost` if it is not a domain or an IPv4 address.
+    """
+    parsed = parse.urlparse(host)
+    host = parsed.netloc or parsed.path or host
+
+    if not DOMAIN_RGX.match(host) and not IP_RGX.match(host):
+        raise errors.InvalidHost(f"{host!r} is not a valid domain or IP address.")
+
+    return host
+
+
+async def run_command(*args: str, timeout: float | None = None) -> str:
+    """Runs the shell command and returns its decoded stdout.
+
+    Output that is not valid UTF-8 has the bad bytes replaced. The
+    command is killed if it outlives the timeout, raising
+    `ShellCommandError`, or if the caller is cancelled.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        raise errors.ShellCommandError(f"{args[0]!r} timed out after {timeout:g}s.") from None
+    finally:
+        if proc.returncode is None:
+            with contextlib.suppress(ProcessLookupError):
+                proc.kill()
+
+            await proc.wait()
+
+    return stdout.decode("utf-8", "replace")
+
+
+async def stream_command(
+    *args: str, until: t.Callable[[str], bool], timeout: float | None = None
+) -> bytes:
+    """Runs the shell command, reading its stdout a line at a time.
+
+    Once `until` returns True for a line, the command is killed and
+    what it wrote so far is returned. Timeouts and cancellation are
+    handled as in `run_command`.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    lines: t.List[bytes] = []
 
-    def inner(func: ReturnT) -> ReturnT:
-        """Decorates the function and checks for the commands."""
-        for command in commands:
-            if not check_availability(command):
-                raise errors.MissingShellCommand(
-                    f"ipq requires the {command!r} command, please install it."
-                )
+    async def read(stdout: asyncio.StreamReader) -> None:
+        async for line in stdout:
+            lines.append(line)
 
-        @functools.wraps(func)
-        def wrapper(*args: t.Any, **kwargs: t.Any) -> str:
-            """Wraps and executes the decorated function."""
-            return func(*args, **kwargs)
+            if until(line.decode("utf-8", "replace")):
+                return
 
-        return wrapper
+        await proc.wait()
 
-    return inner
+    try:
+        await asyncio.wait_for(read(t.cast(asyncio.StreamReader, proc.stdout)), timeout)
+    except asyncio.TimeoutError:
+        raise errors.ShellCommandError(f"{args[0]!r} timed out after {timeout:g}s.") from None
+    finally:
+        if proc.returncode is None:
+            with contextlib.suppress(ProcessLookupError):
+                proc.kill()
+
+            await proc.wait()
+
+    return b"".join(lines)
+
+
+def decode(data: bytes) -> str:
+    """Decodes output from a command or server, as UTF-8 if it can.
+
+    Otherwise its encoding is detected with `cchardet`, from the
+    `speedups` extra, if it is installed. Bytes that still do not
+    decode are replaced.
+    """
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+
+    try:
+        import cchardet
+    except ImportError:
+        encoding = None
+    else:
+        encoding = cchardet.detect(data).get("encoding")
+
+    try:
+        return data.decode(encoding or "utf-8", "replace")
+    except LookupError:
+        return data.decode("utf-8", "replace")
 
 
 class Colors:
@@ -79,8 +160,22 @@ class Colors:
     CYAN = "\033[1;36m"
 
 
-if not sys.stdout.isatty():
-    for attr in dir(Colors):
-        if not attr.startswith("_"):
-            # Disable color if not in a TTY
-            setattr(Colors, attr, "")
+if sys.platform == "win32" and sys.version_info < (3, 8):
+    # Subprocesses need the proactor loop, the default as of 3.8
+    asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+_COLORS = {k: v for k, v in vars(Colors).items() if not k.startswith("_")}
+
+
+def set_colors(enabled: bool) -> None:
+    """Turns coloured output on or off.
+
+    Modules copy the colours when they are imported, so this only
+    affects those imported after it is called.
+    """
+    for name, code in _COLORS.items():
+        setattr(Colors, name, code if enabled else "")
+
+
+# Disable color if not in a TTY
+set_colors(sys.stdout.isatty())
@@ -0,0 +1,366 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""Watches domains for WHOIS and IP changes, re-querying only those
+that are due.
+
+The last known sections of each host are kept in a SQLite state
+store. Each host is due again after an interval that shrinks as its
+expiry date nears, so a portfolio is checked a slice at a time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import datetime
+import json
+import re
+import sqlite3
+import sys
+import time
+import typing as t
+from pathlib import Path
+
+from ipq import bulk, cache, client, errors, models, utils
+
+__all__ = ("Change", "State", "default_path", "diff", "due", "next_check", "watch")
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+MIN_AGE = HOUR
+DEFAULT_MAX_AGE = 7 * DAY
+
+DATE_RGX = re.compile(r"(\d{4})[-./](\d{2})[-./](\d{2})")
+_MONTH_DATE_FORMATS = ("%d-%b-%Y", "%d %b %Y", "%b %d %Y")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    checked REAL,
+    expires REAL,
+    sections TEXT NOT NULL
+);
+"""
+
+# The old and new value of one field, or None if it was not known
+Change = t.Tuple[str, t.Any, t.Any]
+Record = t.Dict[str, t.Any]
+
+
+def default_path() -> Path:
+    """Gets the default location of the state store."""
+    return cache.default_path().with_name("watch.sqlite3")
+
+
+def parse_date(text: str) -> float | None:
+    """Parses a WHOIS date into a timestamp, or None if it cannot."""
+    match = DATE_RGX.search(text)
+    date: datetime.datetime | None
+
+    try:
+        if match:
+            year, month, day = map(int, match.groups())
+            date = datetime.datetime(year, month, day)
+        else:
+            date = _parse_month_date(text)
+    except ValueError:
+        return None
+
+    if date is None:
+        return None
+
+    return date.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def _parse_month_date(text: str) -> datetime.datetime | None:
+    """Parses dates like `14-sep-2028`, or returns None."""
+    head = " ".join(text.replace(",", "").split()[:3])
+
+    for fmt in _MONTH_DATE_FORMATS:
+        for candidate in (head, head.split(" ", 1)[0]):
+            try:
+                return datetime.datetime.strptime(candidate, fmt)
+            except ValueError:
+                continue
+
+    return None
+
+
+def next_check(checked: float, expires: float | None, max_age: float) -> float:
+    """Gets when a host checked at `checked` is due again.
+
+    Hosts are checked every `max_age` seconds, and more often as their
+    expiry nears, a tenth of the time left, but at most hourly. Once
+    expired, they are checked daily.
+    """
+    interval = max_age
+
+    if expires is not None:
+        left = expires - checked
+        interval = min(max_age, DAY if left <= 0 else max(MIN_AGE, left / 10))
+
+    return checked + interval
+
+
+def to_sections(result: models.LookupResult) -> Record:
+    """Gets the sections of the result that completed, as records."""
+    sections = {}
+
+    for name in ("whois", "ip"):
+        section = getattr(result, name)
+
+        if section is not None:
+            # Round tripped so tuples compare equal to stored lists
+            sections[name] = json.loads(json.dumps(dataclasses.asdict(section)))
+
+    return sections
+
+
+def diff(old: Record, new: Record) -> t.List[Change]:
+    """Gets the fields that differ between two sets of sections.
+
+    Sections missing from `new` could not be queried, so are not
+    compared.
+    """
+    changes = []
+
+    for name, fields in new.items():
+        before = old.get(name) or {}
+
+        for field, value in fields.items():
+            if before.get(field) != value:
+                changes.append((f"{name}.{field}", before.get(field), value))
+
+    return changes
+
+
+class State:
+    """The last known sections of each watched host, in SQLite."""
+
+    __slots__ = ("path", "_conn")
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self.path = Path(path) if path else default_path()
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), isolation_level=None, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        except (OSError, sqlite3.Error) as e:
+            raise errors.IpqError(f"Could not open the watch state at '{self.path}': {e}.")
+
+    def __enter__(self) -> State:
+        return self
+
+    def __exit__(self, *_: t.Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the underlying database."""
+        self._conn.close()
+
+    def add(self, hosts: t.Iterable[str]) -> None:
+        """Starts watching the hosts, if they are not already."""
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO hosts VALUES (?, NULL, NULL, '{}')",
+            ((host,) for host in hosts),
+        )
+
+    def remove(self, hosts: t.Iterable[str]) -> t.List[str]:
+        """Stops watching the hosts, returning those that were."""
+        removed = []
+
+        for host in hosts:
+            if self._conn.execute("DELETE FROM hosts WHERE host = ?", (host,)).rowcount:
+                removed.append(host)
+
+        return removed
+
+    def hosts(self) -> t.List[str]:
+        """Gets every watched host."""
+        return [host for (host,) in self._conn.execute("SELECT host FROM hosts")]
+
+    def get(self, host: str) -> Record:
+        """Gets the last known sections of the host."""
+        row = self._conn.execute("SELECT sections FROM hosts WHERE host = ?", (host,))
+        found = row.fetchone()
+        return t.cast(Record, json.loads(found[0])) if found else {}
+
+    def set(self, host: str, sections: Record, checked: float) -> None:
+        """Stores the hosts sections, merged over the last known."""
+        sections = {**self.get(host), **sections}
+        expires = parse_date((sections.get("whois") or {}).get("expires", ""))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO hosts VALUES (?, ?, ?, ?)",
+            (host, checked, expires, json.dumps(sections)),
+        )
+
+    def schedule(self) -> t.Iterator[t.Tuple[str, float | None, float | None]]:
+        """Yields every host, with when it was last checked and when it
+        expires.
+        """
+        yield from self._conn.execute("SELECT host, checked, expires FROM hosts")
+
+
+def due(
+    state: State, now: float, max_age: float = DEFAULT_MAX_AGE, limit: int | None = None
+) -> t.List[str]:
+    """Gets the hosts due a check, the most overdue first.
+
+    Hosts never checked come first. At most `limit` are returned.
+    """
+    pending = []
+
+    for host, checked, expires in state.schedule():
+        at = 0.0 if checked is None else next_check(checked, expires, max_age)
+
+        if at <= now:
+            pending.append((at, host))
+
+    pending.sort()
+    return [host for _, host in pending[:limit]]
+
+
+async def check(
+    hosts: t.Sequence[str], state: State, session: client.Client, concurrency: int
+) -> t.AsyncIterator[t.Tuple[str, t.List[Change] | errors.IpqError]]:
+    """Queries the hosts, storing and yielding what changed.
+
+    Domains are queried for WHOIS and IP info, and IPs for IP info.
+    Failures are yielded as errors. Sections that did complete are
+    still stored, but a host with none is retried on the next run.
+    """
+    domains = [host for host in hosts if not utils.IP_RGX.match(host)]
+    ips = [host for host in hosts if utils.IP_RGX.match(host)]
+
+    for whois, group in ((True, domains), (False, ips)):
+        results = client.alookup_many(group, whois=whois, concurrency=concurrency, client=session)
+
+        async for host, result in results:
+            if isinstance(result, errors.IpqError):
+                yield host, result
+                continue
+
+            sections = to_sections(result)
+            changes = diff(state.get(host), sections)
+
+            if sections:
+                state.set(host, sections, time.time())
+
+            for _, message in result.failures:
+                yield host, errors.IpqError(message)
+
+            yield host, changes
+
+
+def format_changes(host: str, changes: t.List[Change], known: t.Collection[str] = ()) -> str:
+    """Formats a hosts changes for the terminal, one per line.
+
+    `known` are the sections stored before the check. A host with none
+    gets a single line instead, as does each section seen for the
+    first time.
+    """
+    expires = dict((field, new) for field, _, new in changes).get("whois.expires")
+    expiry = f", expires {expires}" if expires else ""
+
+    if not known:
+        return f"{host}: added{expiry}"
+
+    lines = []
+    first_seen = set()
+
+    for field, old, new in changes:
+        section = field.split(".", 1)[0]
+
+        if section in known:
+            lines.append(f"{host}: {field}: {_format_value(old)} -> {_format_value(new)}")
+        elif section not in first_seen:
+            first_seen.add(section)
+            lines.append(f"{host}: {section}: first seen" + (expiry if section == "whois" else ""))
+
+    return "\n".join(lines)
+
+
+def _format_value(value: t.Any) -> str:
+    return ", ".join(value) if isinstance(value, list) else str(value)
+
+
+def watch(
+    hosts: t.Iterable[str],
+    *,
+    remove: bool = False,
+    path: str | Path | None = None,
+    max_age: float = DEFAULT_MAX_AGE,
+    limit: int | None = None,
+    concurrency: int = bulk.DEFAULT_CONCURRENCY,
+    whois_backend: str = "native",
+    output_format: str = "text",
+) -> bool:
+    """Adds the hosts to the watch list, then checks every host that
+    is due, printing what changed.
+
+    Hosts that are not a domain or an IP address are reported and left
+    out. With `remove`, the hosts are instead taken off the watch list,
+    and nothing is checked.
+
+    Returns whether every host was accepted and checked successfully.
+    """
+    ok = True
+
+    def accept(hosts: t.Iterable[str]) -> t.Iterator[str]:
+        nonlocal ok
+
+        for host in hosts:
+            try:
+                yield utils.normalize_host(host)
+            except errors.InvalidHost as e:
+                print(e, file=sys.stderr, flush=True)
+                ok = False
+
+    async def main() -> None:
+        nonlocal ok
+
+        async with client.Client(whois_backend=whois_backend) as session:
+            async for host, changes in check(pending, state, session, concurrency):
+                if isinstance(changes, errors.IpqError):
+                    print(f"{host}: {changes}", file=sys.stderr, flush=True)
+                    ok = False
+                elif output_format == "jsonl" and changes:
+                    record = {field: {"old": old, "new": new} for field, old, new in changes}
+                    print(json.dumps({"host": host, "changes": record}), flush=True)
+                elif changes:
+                    print(format_changes(host, changes, known[host]), flush=True)
+
+    with State(path) as state:
+        if remove:
+            # Not validated, so entries stored by older versions can go
+            for host in state.remove(bulk.prepare(hosts)):
+                print(f"{host}: removed", flush=True)
+
+            return ok
+
+        state.add(accept(bulk.prepare(hosts)))
+        pending = due(state, time.time(), max_age, limit)
+        known = {host: list(state.get(host)) for host in pending}
+        asyncio.run(main())
+
+    return ok
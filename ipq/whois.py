@@ -0,0 +1,473 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""WHOIS backends, for querying domain and IP registration data."""
+
+from __future__ import annotations
+
+import abc
+import asyncio
+import ipaddress
+import re
+import time
+import typing as t
+from dataclasses import dataclass
+
+from ipq import bulk, errors, parser, timings, utils
+
+__all__ = (
+    "RateLimiter",
+    "ServerConfig",
+    "WhoisBackend",
+    "WhoisClient",
+    "WhoisCommand",
+    "get_backend",
+)
+
+IANA_SERVER = "whois.iana.org"
+REFERRAL_RGX = re.compile(
+    r"(?i)^[ \t]*(?:refer|whois|ReferralServer|Registrar WHOIS Server):[ \t]*(\S+)", re.M
+)
+THROTTLE_RGX = re.compile(
+    r"(?i)limit exceeded|exceeded the (?:\w+ )?(?:query|request) limit|passed the daily limit"
+    r"|too many (?:queries|requests|connections)|access control limit|access denied"
+    r"|try again later"
+)
+MIN_RATE = 0.1
+
+
+@dataclass
+class ServerConfig:
+    """Connection, timeout and rate limit settings for a WHOIS server.
+
+    `rate` is the most queries sent per second, with bursts of up to
+    `burst`, or None for no limit. A server that says it is throttling
+    us is left alone for `backoff` seconds, doubling each time in a
+    row up to `max_backoff`, and the query is retried up to
+    `max_retries` times.
+    """
+
+    port: int = 43
+    connect_timeout: float = 5.0
+    timeout: float = 10.0
+    max_connections: int = 8
+    query_format: str = "{query}"
+    rate: float | None = None
+    burst: int = 10
+    backoff: float = 1.0
+    max_backoff: float = 60.0
+    max_retries: int = 3
+
+
+SERVERS: t.Dict[str, ServerConfig] = {
+    # The RIRs throttle bulk queries the hardest
+    "whois.afrinic.net": ServerConfig(rate=2.0, burst=5),
+    "whois.apnic.net": ServerConfig(rate=2.0, burst=5),
+    "whois.arin.net": ServerConfig(query_format="n + {query}", rate=2.0, burst=5),
+    "whois.lacnic.net": ServerConfig(rate=1.0, burst=2),
+    "whois.ripe.net": ServerConfig(rate=2.0, burst=5),
+    "whois.denic.de": ServerConfig(query_format="-T dn,ace {query}"),
+    "whois.verisign-grs.com": ServerConfig(query_format="domain {query}"),
+    "whois.jprs.jp": ServerConfig(query_format="{query}/e"),
+}
+
+
+class RateLimiter:
+    """Paces the queries sent to one WHOIS server.
+
+    A token bucket holds queries to the servers rate. When the server
+    throttles us anyway, every query to it waits out a cooldown and
+    the rate is halved, then it creeps back up with each success.
+    Waiting happens before a connection slot is taken, and gives up
+    the hosts `bulk.run` slot, so queries to other servers carry on in
+    the meantime.
+    """
+
+    __slots__ = ("config", "cooldown_until", "rate", "throttles", "tokens", "_updated")
+
+    def __init__(self, config: ServerConfig) -> None:
+        self.config = config
+        self.rate = config.rate
+        self.tokens = float(config.burst)
+        self.throttles = 0
+        self.cooldown_until = 0.0
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        """Waits until a query may be sent to the server."""
+        while True:
+            now = time.monotonic()
+
+            if now < self.cooldown_until:
+                delay = self.cooldown_until - now
+            elif self.rate is None:
+                return
+            else:
+                elapsed, self._updated = now - self._updated, now
+                self.tokens = min(float(self.config.burst), self.tokens + elapsed * self.rate)
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                delay = (1 - self.tokens) / self.rate
+
+            with bulk.waiting():
+                await asyncio.sleep(delay)
+
+    def throttled(self) -> None:
+        """Backs off after the server refused a query as too many."""
+        now = time.monotonic()
+
+        if now < self.cooldown_until:
+            # Sent before the last backoff, so already accounted for
+            return
+
+        self.throttles += 1
+        delay = min(self.config.backoff * 2 ** (self.throttles - 1), self.config.max_backoff)
+        self.cooldown_until = self._updated = now + delay
+        self.rate = max((self.rate or float(self.config.burst)) / 2, MIN_RATE)
+        self.tokens = 0.0
+
+    def succeeded(self) -> None:
+        """Recovers the rate a step after a query was answered."""
+        self.throttles = 0
+
+        if self.rate is None:
+            return
+
+        ceiling = self.config.rate or float(self.config.burst)
+        self.rate = min(self.rate + ceiling / 10, ceiling)
+
+        if self.config.rate is None and self.rate >= ceiling:
+            self.rate = None
+
+
+class WhoisBackend(abc.ABC):
+    """Base class all WHOIS backends inherit from.
+
+    Backends are async context managers, and should be closed once
+    they are no longer needed.
+    """
+
+    __slots__ = ()
+
+    async def __aenter__(self) -> WhoisBackend:
+        return self
+
+    async def __aexit__(self, *_: t.Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Releases any resources held by the backend."""
+
+    @abc.abstractmethod
+    async def query(self, query: str) -> str:
+        """Returns the WHOIS text for the domain or IP."""
+
+
+class WhoisCommand(WhoisBackend):
+    """Queries by running the system `whois` command, killing it if it
+    runs longer than `timeout` seconds.
+    """
+
+    __slots__ = ("timeout",)
+
+    def __init__(self, timeout: float = 30.0) -> None:
+        if not utils.check_availability("whois"):
+            raise errors.MissingShellCommand(
+                "ipq requires the 'whois' command, please install it."
+            )
+
+        self.timeout = timeout
+
+    async def query(self, query: str) -> str:
+        try:
+            data = await utils.stream_command(
+                "whois", query.lower(), until=_follow(query), timeout=self.timeout
+            )
+        except errors.ShellCommandError as e:
+            raise errors.WhoisError(e.message) from None
+
+        text = utils.decode(data)
+
+        if throttled(text):
+            raise errors.RateLimitError(f"WHOIS is rate limiting queries for {query!r}.")
+
+        return text
+
+
+class WhoisClient(WhoisBackend):
+    """A built in WHOIS client that talks to servers over TCP.
+
+    Queries start at IANA and follow referrals on to the registry and
+    registrar, or to the right RIR for IPs. The server IANA refers to
+    is remembered per TLD or IPv4 /8, so later queries skip that hop.
+
+    Each server has its own `RateLimiter`, and throttled responses are
+    retried rather than parsed, so they never turn into bad results.
+    """
+
+    __slots__ = (
+        "default",
+        "iana",
+        "max_referrals",
+        "servers",
+        "_limiters",
+        "_limits",
+        "_referrals",
+    )
+
+    def __init__(
+        self,
+        servers: t.Mapping[str, ServerConfig] | None = None,
+        default: ServerConfig | None = None,
+        max_referrals: int = 3,
+        iana: str = IANA_SERVER,
+    ) -> None:
+        self.servers = {**SERVERS, **(servers or {})}
+        self.default = default or ServerConfig()
+        self.max_referrals = max_referrals
+        self.iana = iana
+        self._limits: t.Dict[str, asyncio.Semaphore] = {}
+        self._limiters: t.Dict[str, RateLimiter] = {}
+        self._referrals: t.Dict[str, str] = {}
+
+    def config(self, server: str) -> ServerConfig:
+        """Gets the settings to use for the given server."""
+        return self.servers.get(server, self.default)
+
+    def limiter(self, server: str) -> RateLimiter:
+        """Gets the rate limiter of the given server."""
+        host = server.partition(":")[0]
+
+        if host not in self._limiters:
+            self._limiters[host] = RateLimiter(self.config(host))
+
+        return self._limiters[host]
+
+    async def query(self, query: str) -> str:
+        query = query.lower()
+
+        if not query.isascii():
+            query = query.encode("idna").decode("ascii")
+
+        key = self._referral_key(query)
+        server = self._referrals.get(key, self.iana)
+        visited: t.Set[str] = set()
+        hops: t.List[t.Tuple[str, str]] = []
+
+        for hop in range(self.max_referrals + 1):
+            visited.add(server)
+            # Past a registry or RIR, or out of hops, nothing is
+            # followed on, so the answer can be cut short
+            final = hop == self.max_referrals or any(s != self.iana for s, _ in hops)
+
+            try:
+                text = await self.query_server(query, server, final)
+            except errors.WhoisError:
+                if any(s != self.iana for s, _ in hops):
+                    # Registrars are flaky, the registry answer will do
+                    break
+
+                raise
+
+            hops.append((server, text))
+            referral = self._referral(text, visited)
+
+            if not referral:
+                break
+
+            if server == self.iana and key:
+                self._referrals[key] = referral
+
+            server = referral
+
+        responses = [text for s, text in hops if s != self.iana] or [hops[0][1]]
+
+        if ipaddress_query(query):
+            # RIRs refer on to the more specific registry, whose
+            # answer should win over the RIR that passed it along
+            responses.reverse()
+
+        return "\n".join(responses)
+
+    async def query_server(self, query: str, server: str, final: bool = True) -> str:
+        """Sends one query to the server, returning its raw response.
+
+        Unless `final`, reading only stops early once a referral has
+        been read too. Raises `RateLimitError` if the server is still
+        throttling us after every retry.
+        """
+        limiter = self.limiter(server)
+
+        for _ in range(limiter.config.max_retries + 1):
+            await limiter.acquire()
+            text = await self._send(query, server, final)
+
+            if not throttled(text):
+                limiter.succeeded()
+                return text
+
+            limiter.throttled()
+
+        raise errors.RateLimitError(f"{server!r} is rate limiting queries.")
+
+    async def _send(self, query: str, server: str, final: bool) -> str:
+        """Sends the query over a new connection to the server."""
+        host, _, port = server.partition(":")
+        config = self.config(host)
+
+        if host not in self._limits:
+            self._limits[host] = asyncio.Semaphore(config.max_connections)
+
+        async with self._limits[host]:
+            with timings.stage("whois.server", server):
+                try:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(host, int(port or config.port)),
+                        config.connect_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    raise errors.WhoisError(f"Timed out connecting to {server!r}.") from None
+                except OSError as e:
+                    raise errors.WhoisError(f"Could not connect to {server!r}: {e}.") from e
+
+                try:
+                    request = config.query_format.format(query=query) + "\r\n"
+                    writer.write(request.encode("utf-8"))
+                    scanner = scanner_for(query, None if final else REFERRAL_RGX)
+                    receive = self._receive(reader, scanner)
+                    data = await asyncio.wait_for(receive, config.timeout)
+                except asyncio.TimeoutError:
+                    raise errors.WhoisError(f"Timed out waiting on {server!r}.") from None
+                except OSError as e:
+                    raise errors.WhoisError(f"Lost connection to {server!r}: {e}.") from e
+                finally:
+                    writer.close()
+
+        return utils.decode(data)
+
+    @staticmethod
+    async def _receive(reader: asyncio.StreamReader, scanner: parser.Scanner) -> bytes:
+        """Reads the response until it ends or the scanner is done."""
+        lines: t.List[bytes] = []
+
+        async for line in reader:
+            lines.append(line)
+
+            if scanner.feed(line.decode("utf-8", "replace")):
+                break
+
+        return b"".join(lines)
+
+    @staticmethod
+    def _referral(text: str, visited: t.Set[str]) -> str | None:
+        """Finds the first referral to a server not yet visited."""
+        for match in REFERRAL_RGX.finditer(text):
+            scheme, sep, server = match.group(1).lower().rpartition("://")
+
+            if sep and scheme != "whois":
+                # rwhois and web referrals speak other protocols
+                continue
+
+            server = server.rstrip("/")
+
+            if server and server not in visited and "." in server:
+                return server
+
+        return None
+
+    @staticmethod
+    def _referral_key(query: str) -> str:
+        """Gets the key IANA referrals for this query are kept under."""
+        ip = ipaddress_query(query)
+
+        if ip is None:
+            return "." + query.rpartition(".")[2]
+
+        if ip.version == 4:
+            return str(ip).partition(".")[0] + "."
+
+        return ""
+
+
+def throttled(text: str) -> bool:
+    """Checks whether a WHOIS response is a refusal to answer because
+    of too many queries.
+    """
+    return THROTTLE_RGX.search(text) is not None
+
+
+def ipaddress_query(query: str) -> ipaddress.IPv4Address | ipaddress.IPv6Address | None:
+    """Gets the query as an IP address, or None if it is a domain."""
+    try:
+        return ipaddress.ip_address(query)
+    except ValueError:
+        return None
+
+
+def scanner_for(query: str, referral: t.Pattern[str] | None = None) -> parser.Scanner:
+    """Gets a scanner for the fields wanted from the querys response."""
+    if ipaddress_query(query):
+        return parser.Scanner.for_ip(referral)
+
+    return parser.Scanner.for_domain(referral)
+
+
+def _follow(query: str) -> t.Callable[[str], bool]:
+    """Tells when the output of the `whois` command is done.
+
+    The command follows referrals itself, printing each answer in
+    turn, so it is only done once every field was read after one.
+    """
+    scanner: parser.Scanner | None = None
+
+    def feed(line: str) -> bool:
+        nonlocal scanner
+
+        if REFERRAL_RGX.match(line):
+            # The answer of the server referred to follows
+            scanner = scanner_for(query)
+            return False
+
+        return scanner is not None and scanner.feed(line)
+
+    return feed
+
+
+def get_backend(name: str = "native") -> WhoisBackend:
+    """Gets the WHOIS backend with the given name.
+
+    `native` talks to WHOIS servers directly, `command` runs the
+    system `whois` command, and `rdap` queries RDAP servers.
+    """
+    if name == "native":
+        return WhoisClient()
+
+    if name == "command":
+        return WhoisCommand()
+
+    if name == "rdap":
+        from ipq.rdap import RdapClient
+
+        return RdapClient()
+
+    raise errors.WhoisError(f"Unknown WHOIS backend {name!r}.")
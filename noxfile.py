@@ -39,6 +39,12 @@ def get_dependencies() -> dict[str, str]:
 DEPS = get_dependencies()
 
 
+@nox.session(reuse_venv=True)
+def tests(session: nox.Session) -> None:
+    session.install("-U", DEPS["pytest"], DEPS["click"])
+    session.run("pytest", "tests", *session.posargs)
+
+
 @nox.session(reuse_venv=True)
 def types(session: nox.Session) -> None:
     session.install("-U", DEPS["pyright"], DEPS["mypy"], DEPS["click"])
@@ -89,3 +95,15 @@ def licensing(session: nox.Session) -> None:
             "\nThe following files are missing their license:\n"
             + "\n".join(f" - {m}" for m in missing)
         )
+
+
+@nox.session(reuse_venv=True)
+def benchmarks(session: nox.Session) -> None:
+    session.install("-U", DEPS["click"])
+    session.run("python", "benchmarks/run.py", *session.posargs)
+
+
+@nox.session(reuse_venv=True)
+def importtime(session: nox.Session) -> None:
+    session.install("-U", DEPS["click"])
+    session.run("python", "benchmarks/importtime.py", *session.posargs)
@@ -0,0 +1,149 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import typing as t
+
+import pytest
+
+from ipq import bulk, errors, whois
+
+
+def test_prepare_drops_repeats() -> None:
+    hosts = ["example.com", "https://example.com/path", "10.0.0.0/30", "example.org"]
+    assert list(bulk.prepare(hosts)) == ["example.com", "10.0.0.0/30", "example.org"]
+
+
+def test_prepare_forgets_hosts_outside_the_window() -> None:
+    hosts = ["a.com", "b.com", "a.com", "c.com", "b.com"]
+    assert list(bulk.prepare(hosts, window=2)) == ["a.com", "b.com", "c.com", "b.com"]
+
+
+@pytest.mark.parametrize(
+    "host, expected",
+    [
+        ("10.0.0.7/32", ["10.0.0.7"]),
+        ("10.0.0.6/31", ["10.0.0.6", "10.0.0.7"]),
+        ("10.0.0.0/30", ["10.0.0.1", "10.0.0.2"]),
+        ("10.0.0.5/30", ["10.0.0.5", "10.0.0.6"]),
+        (
+            "10.0.0.250-10.0.1.1",
+            [
+                "10.0.0.250",
+                "10.0.0.251",
+                "10.0.0.252",
+                "10.0.0.253",
+                "10.0.0.254",
+                "10.0.0.255",
+                "10.0.1.0",
+                "10.0.1.1",
+            ],
+        ),
+        ("10.0.0.1-3", ["10.0.0.1", "10.0.0.2", "10.0.0.3"]),
+        ("10.0.0.4-4", ["10.0.0.4"]),
+        ("10.0.0.4-10.0.0.4", ["10.0.0.4"]),
+    ],
+)
+def test_network_expands_blocks_and_ranges(host: str, expected: t.List[str]) -> None:
+    addresses = bulk.network(host)
+
+    assert addresses is not None
+    assert list(addresses) == expected
+
+
+@pytest.mark.parametrize("host", ["example.com", "10.0.0.1", "my-host.example", "a-b", "::1"])
+def test_network_ignores_other_hosts(host: str) -> None:
+    assert bulk.network(host) is None
+
+
+@pytest.mark.parametrize(
+    "host, message",
+    [
+        ("10.0.0.9-3", "is not a valid IP range"),
+        ("10.0.0.9-10.0.0.3", "is not a valid IP range"),
+        ("10.0.0.1-256", "is not a valid IP range"),
+        ("10.0.0.1-10.0.0.300", "is not a valid IP range"),
+        ("10.0.0.0/33", "is not a valid CIDR block"),
+        ("10.0.0.1-::5", "mixes IPv4 and IPv6"),
+        ("::1-10.0.0.5", "mixes IPv4 and IPv6"),
+        ("2001:db8::/126", "IPv6 block or range"),
+        ("2001:db8::1-2001:db8::5", "IPv6 block or range"),
+        ("10.0.0.0/7", "has 33554432 addresses, more than the limit of 16777216"),
+        ("0.0.0.0-1.0.0.0", "has 16777217 addresses"),
+    ],
+)
+def test_network_rejects_bad_blocks_and_ranges(host: str, message: str) -> None:
+    with pytest.raises(errors.InvalidHost) as info:
+        bulk.network(host)
+
+    assert f"{host!r} " in str(info.value)
+    assert message in str(info.value)
+
+
+def test_network_allows_up_to_the_limit() -> None:
+    addresses = bulk.network("10.0.0.0/8")
+
+    assert addresses is not None
+    assert next(addresses) == "10.0.0.1"
+
+    with pytest.raises(errors.InvalidHost, match="more than the limit of 3"):
+        bulk.network("10.0.0.1-4", limit=3)
+
+    assert list(bulk.network("10.0.0.1-3", limit=3) or ()) == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+
+
+def test_expand_is_lazy_and_passes_bad_hosts_through() -> None:
+    hosts = ["example.com", "10.0.0.0/31", "::1-::2", "10.0.0.0/7", "10.0.0.1-2", "0.0.0.0/0"]
+    expanded = bulk.expand(hosts)
+
+    assert list(itertools.islice(expanded, 8)) == [
+        "example.com",
+        "10.0.0.0",
+        "10.0.0.1",
+        "::1-::2",
+        "10.0.0.0/7",
+        "10.0.0.1",
+        "10.0.0.2",
+        "0.0.0.0/0",
+    ]
+    assert list(bulk.expand(["10.0.0.0/0", "10.0.0.1-3"], limit=2)) == ["10.0.0.0/0", "10.0.0.1-3"]
+
+
+def test_hosts_waiting_on_a_rate_limit_give_up_their_slot() -> None:
+    limiter = whois.RateLimiter(whois.ServerConfig(backoff=0.3))
+    limiter.throttled()
+    items = ["throttled-1", "throttled-2", "other-1", "other-2", "other-3"]
+
+    async def query(item: str) -> str:
+        if item.startswith("throttled"):
+            await limiter.acquire()
+
+        return item
+
+    async def main() -> t.List[str]:
+        return [item async for item, _ in bulk.run(query, items, 2)]
+
+    finished = asyncio.run(main())
+    assert sorted(finished[:3]) == items[2:]
+    assert sorted(finished[3:]) == items[:2]
@@ -0,0 +1,168 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+import typing as t
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from ipq import cache, cli, client, dns, runner, whois
+
+
+class Clock:
+    """Stands in for `time.time`, moving only when told to."""
+
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture()
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(time, "time", clock)
+    return clock
+
+
+class CountingWhois(whois.WhoisBackend):
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.calls = 0
+
+    async def query(self, query: str) -> str:
+        self.calls += 1
+        return self.text
+
+
+def test_entries_expire_after_their_ttl(tmp_path: Path, clock: Clock) -> None:
+    with cache.Cache(tmp_path / "cache.sqlite3", ttls={cache.DNS: 60}) as store:
+        store.set(cache.DNS, "A example.com", "[]")
+        store.set(cache.WHOIS, "example.com", "Domain Name: EXAMPLE.COM")
+        clock.now += 61
+
+        assert store.get(cache.DNS, "A example.com") is None
+        assert store.get(cache.WHOIS, "example.com") == "Domain Name: EXAMPLE.COM"
+        assert store.keys(cache.DNS) == []
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path, clock: Clock) -> None:
+    with cache.Cache(tmp_path / "cache.sqlite3", max_entries=2) as store:
+        for key in ("a", "b", "c"):
+            clock.now += 1
+            store.set(cache.WHOIS, key, key)
+
+        clock.now += 1
+        store.peek(cache.WHOIS, "a")
+        store.evict()
+
+        assert sorted(store.keys(cache.WHOIS)) == ["a", "c"]
+
+
+def test_hits_and_misses_are_counted(tmp_path: Path) -> None:
+    with cache.Cache(tmp_path / "cache.sqlite3") as store:
+        store.set(cache.WHOIS, "example.com", "text")
+        store.get(cache.WHOIS, "example.com")
+        store.get(cache.WHOIS, "example.org")
+        store.get(cache.DNS, "A example.com")
+        store.peek(cache.DNS, "A example.com")
+
+        assert store.stats() == "dns 0 hits/1 misses, whois 1 hits/1 misses"
+
+
+def test_refresh_misses_but_still_stores(tmp_path: Path) -> None:
+    path = tmp_path / "cache.sqlite3"
+
+    with cache.Cache(path) as store:
+        store.set(cache.WHOIS, "example.com", "old")
+
+    with cache.Cache(path, refresh=True) as store:
+        assert store.get(cache.WHOIS, "example.com") is None
+        store.set(cache.WHOIS, "example.com", "new")
+
+    with cache.Cache(path) as store:
+        assert store.get(cache.WHOIS, "example.com") == "new"
+
+
+def test_cached_whois_stores_only_real_answers(tmp_path: Path) -> None:
+    async def main(backend: CountingWhois) -> None:
+        with cache.Cache(tmp_path / "cache.sqlite3") as store:
+            cached = cache.CachedWhois(backend, store)
+
+            for _ in range(2):
+                await cached.query("Example.com")
+                await cached.query("10.0.0.1")
+
+    answered, empty = CountingWhois("Domain Name: EXAMPLE.COM\n"), CountingWhois(" \n")
+    asyncio.run(main(answered))
+    assert answered.calls == 2
+
+    with cache.Cache(tmp_path / "cache.sqlite3") as store:
+        assert store.keys(cache.WHOIS) == ["example.com"]
+        assert store.keys(cache.IP_WHOIS) == ["10.0.0.1"]
+        store.clear()
+
+    asyncio.run(main(empty))
+    assert empty.calls == 4
+
+
+class StaticResolver(dns.Resolver):
+    async def _query(self, name: str, qtype: str) -> t.List[str]:
+        return ["10.0.0.1"] if qtype == "A" else ["host.example"]
+
+
+@pytest.mark.parametrize("no_cache", [False, True])
+def test_no_cache_skips_the_cache(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, no_cache: bool
+) -> None:
+    caches: t.List[cache.Cache | None] = []
+
+    @contextlib.asynccontextmanager
+    async def open_client(
+        options: runner.Options, lookup_cache: cache.Cache | None
+    ) -> t.AsyncIterator[client.Client]:
+        caches.append(lookup_cache)
+        resolver: dns.Resolver = StaticResolver()
+        backend: whois.WhoisBackend = CountingWhois("OrgName: Example Org\n")
+
+        if lookup_cache:
+            resolver = cache.CachedResolver(resolver, lookup_cache)
+            backend = cache.CachedWhois(backend, lookup_cache)
+
+        async with client.Client(resolver, backend) as session:
+            yield session
+
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setattr(runner, "open_client", open_client)
+    args = ["--no-daemon", "--cache-stats", "example.com"] + ["--no-cache"] * no_cache
+    result = CliRunner().invoke(cli.invoke, args)
+
+    assert result.exit_code == 0, result.output
+    assert (caches[0] is None) == no_cache
+    assert (tmp_path / "ipq" / "cache.sqlite3").exists() != no_cache
+    assert ("Cache: dns 0 hits/2 misses, ip-whois 0 hits/1 misses" in result.output) != no_cache
@@ -0,0 +1,108 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import contextlib
+import typing as t
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from ipq import cli, client, dns, errors, runner, whois
+
+
+class FakeResolver(dns.Resolver):
+    """Resolves every name to one IP."""
+
+    async def _query(self, name: str, qtype: str) -> t.List[str]:
+        return ["10.0.0.1"] if qtype == "A" else ["host.example"]
+
+
+class IPOnlyWhois(whois.WhoisBackend):
+    """Answers IP queries, and fails domain ones."""
+
+    async def query(self, query: str) -> str:
+        if query == "10.0.0.1":
+            return "NetRange: 10.0.0.0 - 10.0.0.255\nOrgName: Example Org\nCountry: US\n"
+
+        raise errors.WhoisError(f"No WHOIS server answered for {query!r}.")
+
+
+@pytest.fixture()
+def fake_client(monkeypatch: pytest.MonkeyPatch) -> t.List[runner.Options]:
+    """Makes runs use fake backends, recording the options of each."""
+    opened: t.List[runner.Options] = []
+
+    @contextlib.asynccontextmanager
+    async def open_client(options: runner.Options, *_: t.Any) -> t.AsyncIterator[client.Client]:
+        opened.append(options)
+
+        async with client.Client(FakeResolver(), IPOnlyWhois()) as session:
+            yield session
+
+    monkeypatch.setattr(runner, "open_client", open_client)
+    return opened
+
+
+def test_failed_section_does_not_hide_the_others(fake_client: t.List[runner.Options]) -> None:
+    result = CliRunner().invoke(cli.invoke, ["-w", "example.com", "--no-daemon", "--no-cache"])
+
+    assert result.exit_code == 1
+    assert "10.0.0.1" in result.output
+    assert "Example Org" in result.output
+    assert "example.com (whois): " in result.output
+    assert "No WHOIS server answered for 'example.com'." in result.output
+
+
+def test_compiling_a_geo_db_keeps_the_ping_count(
+    fake_client: t.List[runner.Options], tmp_path: Path
+) -> None:
+    source = tmp_path / "ranges.csv"
+    ranges = ["10.0.0.0,10.0.0.255,US,,Example Org,AS64500", "10.0.1.0,10.0.1.255,US,,,"]
+    source.write_text("\n".join(ranges))
+    args = ["--compile-geo-db", str(source), "--geo-db", str(tmp_path / "geo.db")]
+    result = CliRunner().invoke(cli.invoke, [*args, "--no-daemon", "--no-cache", "10.0.0.1"])
+
+    assert result.exit_code == 0, result.output
+    assert "Compiled 2 ranges" in result.output
+    assert fake_client[0].count == 1
+
+
+@pytest.mark.parametrize("nameserver", ["bogus", "1.2.3.4#x", "1.2.3.4#0", "nonexistent.invalid"])
+def test_bad_hedge_nameservers_are_rejected(
+    fake_client: t.List[runner.Options], nameserver: str
+) -> None:
+    args = ["--hedge", "95", "--hedge-nameserver", nameserver, "--no-daemon", "example.com"]
+    result = CliRunner().invoke(cli.invoke, args)
+
+    assert result.exit_code == 2
+    assert "Invalid value for '--hedge-nameserver'" in result.output
+    assert not fake_client
+
+
+def test_hedge_nameservers_may_have_ports(fake_client: t.List[runner.Options]) -> None:
+    args = ["--hedge", "95", "--hedge-nameserver", "::1#5353", "--no-daemon", "--no-cache"]
+    result = CliRunner().invoke(cli.invoke, [*args, "example.com"])
+
+    assert result.exit_code == 0, result.output
+    assert fake_client[0].hedge_nameservers == ("::1#5353",)
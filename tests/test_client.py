@@ -0,0 +1,135 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import asyncio
+import time
+import typing as t
+
+from ipq import client, dns, hedge, whois
+
+
+class SlowOnceWhois(whois.WhoisBackend):
+    """Answers slowly the first time, then quickly."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def query(self, query: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(0.5 if self.calls == 1 else 0)
+        return f"Domain Name: {query.upper()}\nRegistrar: Example\n"
+
+
+class SlowOnceResolver(dns.Resolver):
+    """Answers slowly the first time, then quickly."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = 0
+
+    async def _query(self, name: str, qtype: str) -> t.List[str]:
+        self.calls += 1
+        await asyncio.sleep(0.5 if self.calls == 1 else 0)
+        return ["10.0.0.1"] if qtype == "A" else ["host.example"]
+
+
+def test_hedged_whois_query_is_sent_again() -> None:
+    backend = SlowOnceWhois()
+
+    async def main() -> float:
+        hedger = hedge.Hedger(95, initial_delay=0.05)
+
+        async with client.Client(whois_client=backend, hedger=hedger) as session:
+            start = time.perf_counter()
+            data = await session.lookup_whois("example.com")
+            assert data.domain == "EXAMPLE.COM"
+            return time.perf_counter() - start
+
+    elapsed = asyncio.run(main())
+    assert backend.calls == 2
+    assert elapsed < 0.4
+
+
+def test_hedged_dns_query_is_sent_again() -> None:
+    resolver = SlowOnceResolver()
+
+    async def main() -> float:
+        hedger = hedge.Hedger(95, initial_delay=0.05)
+
+        async with client.Client(resolver, hedger=hedger) as session:
+            start = time.perf_counter()
+            assert await session.lookup_ptr("example.com")
+            return time.perf_counter() - start
+
+    elapsed = asyncio.run(main())
+    assert resolver.calls == 3
+    assert elapsed < 0.4
+
+
+def test_broken_backup_does_not_fail_the_lookup() -> None:
+    async def primary() -> str:
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def backup() -> str:
+        raise OSError("Network is unreachable")
+
+    hedger = hedge.Hedger(95, initial_delay=0.01)
+    assert asyncio.run(hedger.run("dns", primary, backup)) == "answer"
+
+
+def test_identical_queries_in_flight_are_coalesced() -> None:
+    backend = SlowOnceWhois()
+
+    async def main() -> t.Dict[str, int]:
+        async with client.Client(whois_client=backend, netblocks=False) as session:
+            await asyncio.gather(*(session.lookup_whois("example.com") for _ in range(5)))
+            return session.deduplicated
+
+    assert asyncio.run(main())["whois"] == 4
+    assert backend.calls == 1
+
+
+def test_subdomains_in_flight_share_one_whois_query() -> None:
+    backend = SlowOnceWhois()
+    hosts = ["www.example.co.uk", "mail.example.co.uk", "example.co.uk"]
+
+    async def main() -> t.List[str | None]:
+        async with client.Client(whois_client=backend) as session:
+            results = await asyncio.gather(*map(session.lookup_whois, hosts))
+            return [data.domain for data in results]
+
+    assert asyncio.run(main()) == ["EXAMPLE.CO.UK"] * 3
+    assert backend.calls == 1
+
+
+def test_stream_yields_sections_that_beat_the_deadline() -> None:
+    resolver = SlowOnceResolver()
+    resolver.calls = 1
+
+    async def main() -> t.List[t.Tuple[str, str]]:
+        async with client.Client(resolver, SlowOnceWhois(), deadline=0.2) as session:
+            sections = session.stream("example.com", whois=True)
+            return [(name, type(section).__name__) async for name, section in sections]
+
+    assert asyncio.run(main()) == [("ip", "IPData"), ("whois", "LookupTimeout")]
@@ -0,0 +1,125 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import io
+import threading
+import typing as t
+from pathlib import Path
+
+import pytest
+
+from ipq import daemon, remote, runner
+
+
+def make_options(**changes: t.Any) -> runner.Options:
+    options = runner.Options(
+        include_whois=False,
+        ping=False,
+        ptr=False,
+        skip_no_ptr=False,
+        whois_backend="native",
+        output_format="csv",
+        concurrency=16,
+        use_cache=False,
+        refresh=False,
+        cache_stats=False,
+        show_timings=False,
+        count=1,
+        interval=1.0,
+        probe_timeout=1.0,
+        ports=(443, 80),
+        probe_method="auto",
+        deadline=None,
+        stage_timeout=None,
+        hedge=None,
+        hedge_nameservers=(),
+        geo_db=None,
+        netblocks=True,
+    )
+    return dataclasses.replace(options, **changes)
+
+
+@pytest.fixture()
+def socket_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> t.Iterator[Path]:
+    """Runs a daemon in a thread, listening on a temporary socket."""
+    path = tmp_path / "ipq.sock"
+    monkeypatch.setenv("IPQ_SOCKET", str(path))
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    task: asyncio.Future[None] | None = None
+
+    async def serve() -> None:
+        async with daemon.Server(path) as server:
+            await server.serve(ready.set)
+
+    def run() -> None:
+        nonlocal task
+        task = loop.create_task(serve())
+
+        with pytest.raises(asyncio.CancelledError):
+            loop.run_until_complete(task)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert ready.wait(5)
+    yield path
+
+    loop.call_soon_threadsafe(t.cast("asyncio.Future[None]", task).cancel)
+    thread.join(5)
+    loop.close()
+
+
+def test_forwarded_hosts_file_is_streamed(
+    socket_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    # Far past the 64 KiB a single line of the request may take
+    hosts = io.StringIO("".join(f"invalid_host_{i}!\n" for i in range(10_000)))
+    options = dataclasses.asdict(make_options())
+
+    assert remote.forward(None, hosts, options) is False
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 10_001
+    assert lines[-1].startswith("invalid_host_")
+
+
+def test_idle_sessions_past_the_limit_are_closed() -> None:
+    async def main() -> t.List[int]:
+        sizes = []
+
+        async with daemon.Server("unused.sock", max_sessions=1) as server:
+            async with server.session(make_options(count=1)) as first:
+                async with server.session(make_options(count=2)):
+                    sizes.append(len(server._sessions))
+
+                sizes.append(len(server._sessions))
+
+                async with server.session(make_options(count=1)) as again:
+                    assert again is first
+
+            sizes.append(len(server._sessions))
+
+        return sizes
+
+    assert asyncio.run(main()) == [2, 1, 1]
@@ -0,0 +1,194 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import struct
+import typing as t
+from pathlib import Path
+
+import pytest
+
+from ipq import dns, errors
+
+
+def encode_name(name: str) -> bytes:
+    labels = name.encode().split(b".")
+    return b"".join(bytes((len(label),)) + label for label in labels) + b"\0"
+
+
+def record(rtype: int, rdata: bytes) -> bytes:
+    # Named by a pointer back to the question
+    return b"\xc0\x0c" + struct.pack("!2HIH", rtype, 1, 60, len(rdata)) + rdata
+
+
+class StubServer(asyncio.DatagramProtocol):
+    """Answers A queries through a CNAME, PTR queries, and NXDOMAIN
+    for names starting with `missing`. A silent server answers none.
+    """
+
+    def __init__(self, silent: bool = False) -> None:
+        self.silent = silent
+        self.queries: t.List[t.Tuple[str, int]] = []
+        self.transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = t.cast(asyncio.DatagramTransport, transport)
+
+    def datagram_received(self, data: bytes, addr: t.Any) -> None:
+        qid, _, _ = struct.unpack_from("!3H", data)
+        offset, labels = 12, []
+
+        while data[offset]:
+            labels.append(data[offset + 1 : offset + 1 + data[offset]].decode())
+            offset += data[offset] + 1
+
+        name = ".".join(labels)
+        (qtype,) = struct.unpack_from("!H", data, offset + 1)
+        question = data[12 : offset + 5]
+        self.queries.append((name, qtype))
+
+        if self.silent:
+            return
+
+        if name.startswith("missing"):
+            reply = struct.pack("!6H", qid, 0x8183, 1, 0, 0, 0) + question
+        else:
+            if qtype == 1:
+                answers = [record(5, encode_name("cname.test"))]
+                answers += [record(1, bytes((10, 0, 0, i))) for i in (1, 2)]
+            elif qtype == 12:
+                answers = [record(12, encode_name("stub-host.example"))]
+            else:
+                answers = []
+
+            header = struct.pack("!6H", qid, 0x8180, 1, len(answers), 0, 0)
+            reply = header + question + b"".join(answers)
+
+        t.cast(asyncio.DatagramTransport, self.transport).sendto(reply, addr)
+
+
+@contextlib.asynccontextmanager
+async def stub_server(silent: bool = False) -> t.AsyncIterator[t.Tuple[StubServer, str]]:
+    """Runs a stub server on a free port, yielding its nameserver."""
+    loop = asyncio.get_event_loop()
+    transport, server = await loop.create_datagram_endpoint(
+        lambda: StubServer(silent), local_addr=("127.0.0.1", 0)
+    )
+
+    try:
+        yield server, f"127.0.0.1#{transport.get_extra_info('sockname')[1]}"
+    finally:
+        transport.close()
+
+
+def test_resolve_follows_the_answers_past_a_cname() -> None:
+    async def main() -> t.List[str]:
+        async with stub_server() as (_, nameserver), dns.UDPResolver([nameserver]) as resolver:
+            return await resolver.resolve("example.com")
+
+    assert asyncio.run(main()) == ["10.0.0.1", "10.0.0.2"]
+
+
+def test_reverse_queries_the_ptr_record() -> None:
+    async def main() -> t.Tuple[str, t.List[t.Tuple[str, int]]]:
+        async with stub_server() as (server, nameserver), dns.UDPResolver(
+            [nameserver]
+        ) as resolver:
+            return await resolver.reverse("10.0.0.1"), server.queries
+
+    assert asyncio.run(main()) == ("stub-host.example", [("1.0.0.10.in-addr.arpa", 12)])
+
+
+def test_missing_name_raises() -> None:
+    async def main() -> None:
+        async with stub_server() as (_, nameserver), dns.UDPResolver([nameserver]) as resolver:
+            await resolver.query("missing.example.com", "A")
+
+    with pytest.raises(errors.ResolverError, match="does not exist"):
+        asyncio.run(main())
+
+
+def test_unanswered_query_is_retried_on_the_next_nameserver() -> None:
+    async def main() -> t.Tuple[t.List[str], int]:
+        async with stub_server(silent=True) as (silent, first), stub_server() as (_, second):
+            async with dns.UDPResolver([first, second], timeout=1.0) as resolver:
+                return await resolver.query("example.com", "A"), len(silent.queries)
+
+    assert asyncio.run(main()) == (["10.0.0.1", "10.0.0.2"], 1)
+
+
+def test_unreachable_nameservers_are_skipped() -> None:
+    async def main() -> t.List[str]:
+        async with stub_server() as (_, nameserver):
+            # Link-local without a scope cannot be connected to
+            servers = ["fe80::1", "127.0.0.1#dns", nameserver]
+
+            async with dns.UDPResolver(servers, attempts=3) as resolver:
+                return await resolver.query("example.com", "A")
+
+    assert asyncio.run(main()) == ["10.0.0.1", "10.0.0.2"]
+
+
+def test_resolve_falls_back_to_ipv6_only_without_ipv4_records() -> None:
+    async def main() -> t.Tuple[t.List[t.Tuple[str, int]], t.List[t.Tuple[str, int]]]:
+        async with stub_server() as (server, nameserver):
+            async with dns.UDPResolver([nameserver]) as resolver:
+                with pytest.raises(errors.NoRecordsError):
+                    await resolver.resolve("missing.example.com")
+
+        async with stub_server(silent=True) as (silent, nameserver):
+            async with dns.UDPResolver([nameserver], timeout=0.2) as resolver:
+                with pytest.raises(errors.ResolverError, match="timed out"):
+                    await resolver.resolve("example.com")
+
+        return server.queries, silent.queries
+
+    answered, unanswered = asyncio.run(main())
+    assert answered == [("missing.example.com", 1), ("missing.example.com", 28)]
+    assert {qtype for _, qtype in unanswered} == {1}
+
+
+def test_unanswered_query_times_out() -> None:
+    async def main() -> None:
+        async with stub_server(silent=True) as (_, nameserver):
+            async with dns.UDPResolver([nameserver], timeout=0.2) as resolver:
+                await resolver.query("example.com", "A")
+
+    with pytest.raises(errors.ResolverError, match="timed out|No nameserver answered"):
+        asyncio.run(main())
+
+
+def test_parse_response_rejects_truncated_packets() -> None:
+    query = dns._build_query(1, "example.com", dns.QTYPES["A"])
+    header = struct.pack("!6H", 1, 0x8180, 1, 1, 0, 0)
+
+    with pytest.raises(errors.ResolverError, match="Malformed"):
+        dns._parse_response(header + query[12:] + b"\xc0\x0c\x00", "example.com", 1)
+
+
+def test_read_nameservers(tmp_path: Path) -> None:
+    path = tmp_path / "resolv.conf"
+    path.write_text("# comment\nnameserver 10.0.0.53\nsearch example\nnameserver fe80::1%eth0\n")
+    assert dns.read_nameservers(str(path)) == ["10.0.0.53", "fe80::1%eth0"]
+    assert dns.read_nameservers(str(tmp_path / "missing")) == []
@@ -0,0 +1,135 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import asyncio
+import typing as t
+from pathlib import Path
+
+import pytest
+
+from ipq import client, dns, errors, geo, whois
+
+CSV = (
+    "start,end,country,city,org,asn,postal\n"
+    '10.0.0.0,10.0.0.255,US,"Mountain View, CA",Example Org,AS15169,94043\n'
+    '10.0.2.0,10.0.2.255,NL,Amsterdam,"Quoted ""Org""",1136,\n'
+    "167772928,167773183,DE,Berlin,Other Org,,10115\n"
+)
+
+
+class StaticResolver(dns.Resolver):
+    """Resolves every name to 10.0.0.1, which has no PTR record."""
+
+    async def _query(self, name: str, qtype: str) -> t.List[str]:
+        return ["10.0.0.1"] if qtype == "A" else []
+
+
+class CountingWhois(whois.WhoisBackend):
+    def __init__(self) -> None:
+        self.queries: t.List[str] = []
+
+    async def query(self, query: str) -> str:
+        self.queries.append(query)
+        return "OrgName: From WHOIS\n"
+
+
+@pytest.fixture()
+def database(tmp_path: Path) -> Path:
+    source, target = tmp_path / "ranges.csv", tmp_path / "geo.bin"
+    source.write_text(CSV)
+    assert geo.compile_csv(source, target) == 3
+    return target
+
+
+@pytest.mark.parametrize("ip", ["10.0.0.0", "10.0.0.77", "10.0.0.255"])
+def test_lookup_anywhere_in_a_block(database: Path, ip: str) -> None:
+    with geo.GeoDB(database) as db:
+        record = db.lookup(ip)
+
+    assert record == geo.GeoRecord(
+        "10.0.0.0", "10.0.0.255", "US", "Mountain View, CA", "Example Org", "94043", 15169
+    )
+
+
+def test_integer_ranges_and_missing_fields(database: Path) -> None:
+    with geo.GeoDB(database) as db:
+        assert len(db) == 3
+        berlin = db.lookup("10.0.3.1")
+        amsterdam = db.lookup("10.0.2.1")
+
+    assert berlin == geo.GeoRecord(
+        "10.0.3.0", "10.0.3.255", "DE", "Berlin", "Other Org", "10115", 0
+    )
+    assert amsterdam is not None
+    assert (amsterdam.org, amsterdam.postal) == ('Quoted "Org"', "")
+
+
+@pytest.mark.parametrize("ip", ["9.255.255.255", "10.0.1.0", "10.0.1.255", "10.0.4.0", "::1"])
+def test_lookup_outside_every_block(database: Path, ip: str) -> None:
+    with geo.GeoDB(database) as db:
+        assert db.lookup(ip) is None
+
+
+def test_overlapping_ranges_are_rejected(tmp_path: Path) -> None:
+    source = tmp_path / "ranges.csv"
+    source.write_text("10.0.0.0,10.0.0.255,US,,,\n10.0.0.128,10.0.1.0,US,,,\n")
+
+    with pytest.raises(errors.GeoDBError, match="overlaps"):
+        geo.compile_csv(source, tmp_path / "geo.bin")
+
+
+def test_corrupt_files_are_rejected(database: Path, tmp_path: Path) -> None:
+    data = database.read_bytes()
+    empty, foreign, truncated = (tmp_path / name for name in ("empty", "foreign", "truncated"))
+    empty.write_bytes(b"")
+    foreign.write_bytes(b"GIF89a" + data[6:])
+    truncated.write_bytes(data[: geo.HEADER.size + geo.RECORD.size])
+
+    for path in (empty, foreign, truncated, tmp_path / "missing"):
+        with pytest.raises(errors.GeoDBError):
+            geo.GeoDB(path)
+
+
+def test_truncated_strings_are_rejected(database: Path) -> None:
+    data = database.read_bytes()
+    database.write_bytes(data[:-4])
+
+    with geo.GeoDB(database) as db, pytest.raises(errors.GeoDBError, match="corrupt"):
+        db.lookup("10.0.3.1")
+
+
+def test_lookups_in_the_database_skip_whois(database: Path) -> None:
+    backend = CountingWhois()
+
+    async def main() -> t.Any:
+        with geo.GeoDB(database) as db:
+            async with client.Client(StaticResolver(), backend, geo_db=db) as session:
+                return await session.lookup_ip("example.com")
+
+    data = asyncio.run(main())
+    assert (data.ip, data.city, data.org) == (
+        "10.0.0.1",
+        "Mountain View, CA",
+        "AS15169 Example Org",
+    )
+    assert backend.queries == []
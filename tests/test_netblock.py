@@ -0,0 +1,90 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+from ipq import errors, netblock, whois
+
+
+class BlockWhois(whois.WhoisBackend):
+    """Answers slowly with the block of `size` IPs around the IP."""
+
+    def __init__(self, size: int = 256) -> None:
+        self.size = size
+        self.calls = 0
+
+    async def query(self, query: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(0.05)
+
+        if query.startswith("10.9."):
+            raise errors.WhoisError("Server unavailable.")
+
+        network, _, last = query.rpartition(".")
+        start = int(last) // self.size * self.size
+        end = start + self.size - 1
+        return f"NetRange: {network}.{start} - {network}.{end}\nOrgName: Example Org\n"
+
+
+def test_concurrent_misses_in_one_block_share_a_query() -> None:
+    backend = BlockWhois()
+    blocks = netblock.NetblockWhois(backend)
+    queries = [f"10.0.{n}.{i}" for n in (1, 2) for i in range(1, 33)]
+
+    async def main() -> None:
+        answers = await asyncio.gather(*map(blocks.query, queries))
+        assert all("10.0.1.0 - 10.0.1.255" in text for text in answers[:32])
+        assert all("10.0.2.0 - 10.0.2.255" in text for text in answers[32:])
+
+    asyncio.run(main())
+    assert backend.calls == 2
+
+
+def test_failed_query_lets_waiting_misses_try_again() -> None:
+    backend = BlockWhois()
+    blocks = netblock.NetblockWhois(backend)
+
+    async def main() -> None:
+        results = await asyncio.gather(
+            blocks.query("10.9.0.1"), blocks.query("10.9.0.2"), return_exceptions=True
+        )
+        assert all(isinstance(result, errors.WhoisError) for result in results)
+
+    asyncio.run(main())
+    assert backend.calls == 2
+
+
+def test_misses_an_answer_did_not_cover_query_at_once() -> None:
+    backend = BlockWhois(size=1)
+    blocks = netblock.NetblockWhois(backend)
+
+    async def main() -> float:
+        start = time.perf_counter()
+        await asyncio.gather(*(blocks.query(f"10.0.0.{i}") for i in range(1, 65)))
+        await asyncio.gather(*(blocks.query(f"10.0.0.{i}") for i in range(65, 129)))
+        return time.perf_counter() - start
+
+    # One answer, all of the rest at once, then the next 64 at once
+    assert asyncio.run(main()) < 0.5
+    assert backend.calls == 128
@@ -0,0 +1,142 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import typing as t
+
+import pytest
+
+from ipq import errors, models, output
+
+IP = models.IPData("10.0.0.1", "host.example", "Mountain View, CA", "US", "Example Org", "94043")
+WHOIS = models.WhoisData(
+    "EXAMPLE.COM",
+    'Registrar "One"',
+    "2000-01-01",
+    "2020-01-01",
+    "2030-01-01",
+    ("clientTransferProhibited", "serverHold"),
+    ("NS1.EXAMPLE.COM", "NS2.EXAMPLE.COM"),
+)
+PING = models.PingData("10.0.0.1", "tcp", 3, 2, 33.3, 1.0, 1.5, 2.0)
+FULL = models.LookupResult("example.com", IP, WHOIS, PING, None, ())
+PARTIAL = models.LookupResult(
+    "example.org", IP, None, None, None, (("whois", "No answer,\nnot even a line."),)
+)
+
+
+class FlushLog(io.StringIO):
+    """Remembers what had been written at each flush."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.flushed: t.List[str] = []
+
+    def flush(self) -> None:
+        super().flush()
+        self.flushed.append(self.getvalue())
+
+
+def write_all(name: str) -> FlushLog:
+    stream = FlushLog()
+    writer = output.get_writer(name, stream, io.StringIO())
+    writer.write("example.com", FULL)
+    writer.write("example.org", PARTIAL)
+    writer.write("bad host", None, errors.InvalidHost("'bad host' is not valid."))
+    return stream
+
+
+def test_jsonl_writes_one_object_per_host() -> None:
+    stream = write_all("jsonl")
+    full, partial, failed = map(json.loads, stream.getvalue().splitlines())
+
+    assert full["host"] == "example.com"
+    assert full["whois"]["status"] == ["clientTransferProhibited", "serverHold"]
+    assert full["ping"] == {
+        "address": "10.0.0.1",
+        "method": "tcp",
+        "sent": 3,
+        "received": 2,
+        "loss": 33.3,
+        "rtt_min": 1.0,
+        "rtt_avg": 1.5,
+        "rtt_max": 2.0,
+    }
+    assert (full["ptr"], full["failures"], full["error"]) == (None, {}, None)
+    assert partial["whois"] is None
+    assert partial["failures"] == {"whois": "No answer,\nnot even a line."}
+    assert failed == {
+        "host": "bad host",
+        "ip": None,
+        "whois": None,
+        "ping": None,
+        "ptr": None,
+        "failures": {},
+        "error": "'bad host' is not valid.",
+    }
+
+
+def test_csv_writes_the_header_once_in_a_fixed_order() -> None:
+    rows = list(csv.reader(io.StringIO(write_all("csv").getvalue())))
+
+    assert rows[0] == list(output.CSV_COLUMNS)
+    assert len(rows) == 4
+    assert all(len(row) == len(output.CSV_COLUMNS) for row in rows)
+
+
+def test_csv_quotes_and_flattens_values() -> None:
+    text = write_all("csv").getvalue()
+    full, partial, failed = csv.DictReader(io.StringIO(text))
+
+    assert full["city"] == "Mountain View, CA"
+    assert full["registrar"] == 'Registrar "One"'
+    assert full["status"] == "clientTransferProhibited serverHold"
+    assert full["nameservers"] == "NS1.EXAMPLE.COM NS2.EXAMPLE.COM"
+    assert (full["method"], full["received"], full["loss"], full["rtt_max"]) == (
+        "tcp",
+        "2",
+        "33.3",
+        "2.0",
+    )
+    assert (full["domain"], full["error"]) == ("EXAMPLE.COM", "")
+    assert (partial["domain"], partial["sent"]) == ("", "")
+    assert partial["error"] == "whois: No answer,\nnot even a line."
+    assert (failed["host"], failed["ip"]) == ("bad host", "")
+    assert failed["error"] == "'bad host' is not valid."
+
+
+@pytest.mark.parametrize("name, header", [("jsonl", 0), ("csv", 1)])
+def test_each_host_is_flushed_as_it_is_written(name: str, header: int) -> None:
+    stream = write_all(name)
+    lines = stream.getvalue().splitlines(keepends=True)
+    # The quoted newline in the partial results error spans two lines
+    ends = [header + 1, header + 3, header + 4] if name == "csv" else [1, 2, 3]
+
+    assert stream.flushed == ["".join(lines[:end]) for end in ends]
+
+
+def test_unknown_format_raises() -> None:
+    with pytest.raises(errors.IpqError, match="Unknown output format"):
+        output.get_writer("xml", io.StringIO())
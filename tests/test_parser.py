@@ -0,0 +1,54 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+from ipq import parser
+
+
+def test_parse_with_custom_alias_tables() -> None:
+    # Each table is freed before the next, which may reuse its id
+    for field in ("first", "second", "third"):
+        aliases = {"owner": field}
+        result = parser.parse("Owner: Example\n", aliases)
+        del aliases
+        assert result == {field: "Example"}
+
+
+def test_parse_domain() -> None:
+    data = (
+        "Domain Name: EXAMPLE.COM\n"
+        "Registrar: Example Registrar\n"
+        "Name Server: NS2.EXAMPLE.COM\n"
+        "Name Server: ns1.example.com extra\n"
+        "Name Server: ns2.example.com\n"
+    )
+    assert parser.parse_domain(data) == {
+        "domain": "EXAMPLE.COM",
+        "registrar": "Example Registrar",
+        "nameservers": ["NS2.EXAMPLE.COM", "ns1.example.com"],
+    }
+
+
+def test_scanner_is_done_at_the_end_of_the_filled_block() -> None:
+    scanner = parser.Scanner({"owner": "org", "country": "country"})
+    lines = ["Owner: Example", "Country: US", "Remarks: more", "", ">>> Last update"]
+    assert [scanner.feed(line) for line in lines] == [False, False, False, True, True]
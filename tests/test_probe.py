@@ -0,0 +1,135 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import asyncio
+import socket
+import typing as t
+
+import pytest
+
+from ipq import errors, models, probe
+
+
+def free_port() -> int:
+    """Gets a port nothing is listening on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return t.cast(int, sock.getsockname()[1])
+
+
+async def probe_listener(prober: probe.Prober) -> models.PingData:
+    """Probes a TCP listener on a local port."""
+    server = await asyncio.start_server(lambda _, writer: writer.close(), "127.0.0.1", 0)
+    prober.ports = (server.sockets[0].getsockname()[1],)
+
+    async with server, prober:
+        return await prober.probe("127.0.0.1")
+
+
+def test_tcp_probe_times_a_connect() -> None:
+    prober = probe.Prober(count=3, interval=0.01, method="tcp")
+    data = asyncio.run(probe_listener(prober))
+
+    assert (data.address, data.method) == ("127.0.0.1", "tcp")
+    assert (data.sent, data.received, data.loss) == (3, 3, 0)
+    assert data.rtt_min is not None and data.rtt_min <= t.cast(float, data.rtt_max)
+
+
+def test_refused_connect_counts_as_a_reply() -> None:
+    async def main() -> models.PingData:
+        async with probe.Prober(ports=(free_port(),), method="tcp") as prober:
+            return await prober.probe("127.0.0.1")
+
+    assert asyncio.run(main()).received == 1
+
+
+@pytest.mark.parametrize("listening", [True, False])
+def test_filtered_port_does_not_hide_the_others(
+    monkeypatch: pytest.MonkeyPatch, listening: bool
+) -> None:
+    filtered = free_port()
+    open_connection = asyncio.open_connection
+
+    async def drop(host: str, port: int) -> t.Any:
+        # A firewall that drops the SYN, so the connect never ends
+        if port == filtered:
+            await asyncio.sleep(3600)
+
+        return await open_connection(host, port)
+
+    async def main() -> models.PingData:
+        server = await asyncio.start_server(lambda _, writer: writer.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1] if listening else free_port()
+        prober = probe.Prober(
+            ports=(filtered, port), count=2, interval=0.01, timeout=5, method="tcp"
+        )
+
+        async with server, prober:
+            return await prober.probe("127.0.0.1")
+
+    monkeypatch.setattr(asyncio, "open_connection", drop)
+    data = asyncio.run(asyncio.wait_for(main(), 2))
+
+    assert (data.sent, data.received, data.loss) == (2, 2, 0)
+    assert t.cast(float, data.rtt_max) < 1
+
+
+def test_filtered_ports_are_lost_after_the_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def drop(*_: t.Any) -> t.Any:
+        await asyncio.sleep(3600)
+
+    async def main() -> models.PingData:
+        async with probe.Prober(ports=(443, 80), timeout=0.05, method="tcp") as prober:
+            return await prober.probe("127.0.0.1")
+
+    monkeypatch.setattr(asyncio, "open_connection", drop)
+    data = asyncio.run(asyncio.wait_for(main(), 2))
+
+    assert (data.sent, data.received, data.loss) == (1, 0, 100)
+
+
+@pytest.mark.skipif(not probe.icmp_available(), reason="ICMP echo sockets are not permitted")
+def test_icmp_probe_gets_echo_replies() -> None:
+    async def main() -> models.PingData:
+        async with probe.Prober(count=2, interval=0.01, method="icmp") as prober:
+            return await prober.probe("127.0.0.1")
+
+    data = asyncio.run(main())
+    assert (data.method, data.received) == ("icmp", 2)
+
+
+def test_auto_falls_back_to_tcp_without_icmp() -> None:
+    prober = probe.Prober(method="auto")
+    data = asyncio.run(probe_listener(prober))
+
+    assert data.method == ("icmp" if probe.icmp_available() else "tcp")
+    assert data.received == 1
+
+
+def test_invalid_address_raises() -> None:
+    with pytest.raises(errors.ProbeError, match="not a valid IP address"):
+        asyncio.run(probe.Prober().probe("example.com"))
+
+
+def test_checksum() -> None:
+    assert probe._checksum(b"\x08\x00\x00\x00\x00\x01\x00\x01") == 0xF7FD
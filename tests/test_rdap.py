@@ -0,0 +1,321 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import asyncio
+import json
+import typing as t
+from pathlib import Path
+
+from ipq import errors, parser, rdap, whois
+
+Reply = t.Tuple[int, t.Any]
+
+
+class StubServer:
+    """A HTTP server answering GETs with JSON.
+
+    Paths in `routes` get the next of their replies, a status and the
+    JSON to send, and the last one once they run out. Other paths get
+    their own path back as a handle. Each connection is closed, without
+    warning, after `per_connection` responses.
+    """
+
+    def __init__(
+        self,
+        per_connection: int = 0,
+        chunked: bool = False,
+        routes: t.Mapping[str, t.List[Reply]] | None = None,
+    ) -> None:
+        self.per_connection = per_connection
+        self.chunked = chunked
+        self.routes = {path: list(replies) for path, replies in (routes or {}).items()}
+        self.connections: t.List[t.List[str]] = []
+        self.closed = 0
+        self.url = ""
+        self._server: asyncio.AbstractServer | None = None
+
+    async def __aenter__(self) -> StubServer:
+        self._server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.url = "http://127.0.0.1:%d" % self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *_: t.Any) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        requests: t.List[str] = []
+        self.connections.append(requests)
+
+        try:
+            while not self.per_connection or len(requests) < self.per_connection:
+                request_line = await reader.readline()
+
+                if not request_line:
+                    break
+
+                while (await reader.readline()).strip():
+                    pass
+
+                path = request_line.decode().split()[1]
+                requests.append(path)
+                status, data = 200, {"handle": path}
+
+                if path in self.routes:
+                    replies = self.routes[path]
+                    status, data = replies.pop(0) if len(replies) > 1 else replies[0]
+
+                body = json.dumps(data).encode()
+
+                if self.chunked:
+                    head = b"Transfer-Encoding: chunked\r\n\r\n"
+                    body = b"%x\r\n%s\r\n0\r\n\r\n" % (len(body), body)
+                else:
+                    head = b"Content-Length: %d\r\n\r\n" % len(body)
+
+                writer.write(b"HTTP/1.1 %d Stub\r\n" % status + head + body)
+                await writer.drain()
+        finally:
+            writer.close()
+            self.closed += 1
+
+
+async def _closed(server: StubServer, count: int) -> None:
+    async def wait() -> None:
+        while server.closed < count:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(wait(), 5)
+
+
+def test_connections_are_reused() -> None:
+    async def main() -> t.Tuple[t.List[t.Any], StubServer]:
+        async with StubServer() as server:
+            pool = rdap.ConnectionPool()
+
+            try:
+                handles = [
+                    (await pool.get(f"{server.url}/ip/{n}")).json()["handle"] for n in range(3)
+                ]
+            finally:
+                await pool.close()
+                await _closed(server, 1)
+
+        return handles, server
+
+    handles, server = asyncio.run(main())
+
+    assert handles == ["/ip/0", "/ip/1", "/ip/2"]
+    assert server.connections == [["/ip/0", "/ip/1", "/ip/2"]]
+
+
+def test_chunked_responses_keep_the_connection() -> None:
+    async def main() -> t.Tuple[t.List[t.Any], StubServer]:
+        async with StubServer(chunked=True) as server:
+            pool = rdap.ConnectionPool()
+
+            try:
+                handles = [
+                    (await pool.get(f"{server.url}/domain/{n}")).json()["handle"] for n in range(2)
+                ]
+            finally:
+                await pool.close()
+                await _closed(server, 1)
+
+        return handles, server
+
+    handles, server = asyncio.run(main())
+
+    assert handles == ["/domain/0", "/domain/1"]
+    assert len(server.connections) == 1
+
+
+def test_connections_closed_by_the_server_are_replaced() -> None:
+    async def main() -> t.Tuple[t.List[t.Any], StubServer]:
+        async with StubServer(per_connection=1) as server:
+            pool = rdap.ConnectionPool()
+
+            try:
+                handles = [(await pool.get(f"{server.url}/ip/0")).json()["handle"]]
+                # The pooled connection is now stale
+                await _closed(server, 1)
+                handles.append((await pool.get(f"{server.url}/ip/1")).json()["handle"])
+            finally:
+                await pool.close()
+                await _closed(server, 2)
+
+        return handles, server
+
+    handles, server = asyncio.run(main())
+
+    assert handles == ["/ip/0", "/ip/1"]
+    assert server.connections == [["/ip/0"], ["/ip/1"]]
+
+
+DOMAIN = {
+    "ldhName": "example.test",
+    "entities": [
+        {
+            "roles": ["registrar"],
+            "vcardArray": ["vcard", [["version", {}, "text", "4.0"], ["fn", {}, "text", "Reg"]]],
+        }
+    ],
+    "events": [
+        {"eventAction": "registration", "eventDate": "2020-01-01T00:00:00Z"},
+        {"eventAction": "expiration", "eventDate": "2030-01-01T00:00:00Z"},
+    ],
+    "status": ["client transfer prohibited"],
+    "nameservers": [{"ldhName": "ns1.example.test"}],
+}
+
+NETWORK = {
+    "startAddress": "10.0.0.0",
+    "endAddress": "10.0.255.255",
+    "country": "NL",
+    "entities": [
+        {
+            "roles": ["registrant"],
+            "vcardArray": [
+                "vcard",
+                [
+                    ["fn", {}, "text", "Example Org"],
+                    ["adr", {}, "text", ["", "", "Street 1", "Amsterdam", "", "1012", "NL"]],
+                ],
+            ],
+        }
+    ],
+}
+
+
+def bootstrap(url: str) -> t.Dict[str, t.List[Reply]]:
+    return {
+        "/bootstrap/dns.json": [(200, {"services": [[["test"], [f"{url}/rdap/"]]]})],
+        "/bootstrap/ipv4.json": [(200, {"services": [[["10.0.0.0/8"], [f"{url}/rdap"]]]})],
+    }
+
+
+async def query(server: StubServer, cache_dir: Path, *queries: str) -> t.List[t.Any]:
+    """Queries a client bootstrapped from the server, returning each
+    answer or error.
+    """
+    for path, replies in bootstrap(server.url).items():
+        server.routes.setdefault(path, replies)
+
+    config = whois.ServerConfig(backoff=0.01, max_retries=1)
+    client = rdap.RdapClient(
+        f"{server.url}/bootstrap/", servers={"127.0.0.1": config}, cache_dir=cache_dir
+    )
+    results: t.List[t.Any] = []
+
+    async with client:
+        for q in queries:
+            try:
+                results.append(await client.query(q))
+            except errors.IpqError as e:
+                results.append(e)
+
+    await _closed(server, len(server.connections))
+    return results
+
+
+def test_domain_and_ip_answers_read_like_whois(tmp_path: Path) -> None:
+    routes = {"/rdap/domain/example.test": [(200, DOMAIN)], "/rdap/ip/10.0.0.1": [(200, NETWORK)]}
+
+    async def main() -> t.List[t.Any]:
+        async with StubServer(routes=routes) as server:
+            return await query(server, tmp_path, "Example.TEST", "10.0.0.1")
+
+    domain, ip = asyncio.run(main())
+
+    assert domain == (
+        "Domain Name: EXAMPLE.TEST\nRegistrar: Reg\nCreation Date: 2020-01-01T00:00:00Z\n"
+        "Registry Expiry Date: 2030-01-01T00:00:00Z\n"
+        "Domain Status: clientTransferProhibited\nName Server: NS1.EXAMPLE.TEST\n"
+    )
+    assert parser.parse_ip(ip) == {
+        "org": "Example Org",
+        "city": "Amsterdam",
+        "postal": "1012",
+        "country": "NL",
+    }
+    assert parser.parse_netblock(ip, "10.0.0.1") == (0x0A000000, 0x0A00FFFF)
+
+
+def test_unknown_suffixes_and_missing_answers(tmp_path: Path) -> None:
+    routes = {"/rdap/domain/missing.test": [(404, {"errorCode": 404})]}
+
+    async def main() -> t.List[t.Any]:
+        async with StubServer(routes=routes) as server:
+            return await query(server, tmp_path, "example.org", "missing.test")
+
+    unknown, missing = asyncio.run(main())
+
+    assert isinstance(unknown, errors.WhoisError)
+    assert "No RDAP server is known for 'example.org'" in str(unknown)
+    assert missing == ""
+
+
+def test_throttled_queries_are_retried(tmp_path: Path) -> None:
+    routes = {
+        "/rdap/domain/example.test": [(429, {}), (200, DOMAIN)],
+        "/rdap/domain/busy.test": [(429, {})],
+    }
+
+    async def main() -> t.List[t.Any]:
+        async with StubServer(routes=routes) as server:
+            return await query(server, tmp_path, "example.test", "busy.test")
+
+    answer, busy = asyncio.run(main())
+
+    assert answer.startswith("Domain Name: EXAMPLE.TEST\n")
+    assert isinstance(busy, errors.RateLimitError)
+
+
+def test_bootstrap_files_are_kept(tmp_path: Path) -> None:
+    async def main() -> t.List[str]:
+        async with StubServer() as server:
+            await query(server, tmp_path, "example.test")
+            await query(server, tmp_path, "example.test")
+
+        return [path for requests in server.connections for path in requests]
+
+    assert asyncio.run(main()) == [
+        "/bootstrap/dns.json",
+        "/rdap/domain/example.test",
+        "/rdap/domain/example.test",
+    ]
+    assert (tmp_path / "rdap-dns.json").exists()
+
+
+def test_failed_bootstrap_raises(tmp_path: Path) -> None:
+    routes = {"/bootstrap/dns.json": [(500, {})]}
+
+    async def main() -> t.List[t.Any]:
+        async with StubServer(routes=routes) as server:
+            return await query(server, tmp_path, "example.test")
+
+    (error,) = asyncio.run(main())
+
+    assert isinstance(error, errors.WhoisError)
+    assert "Bootstrap fetch failed: 500" in str(error)
@@ -0,0 +1,92 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import typing as t
+from pathlib import Path
+
+import pytest
+
+from ipq import errors, suffix
+
+RULES = suffix.SuffixList(["// comment", "", "uk", "co.uk", "*.ck", "!www.ck", "公司.cn", "cn"])
+
+
+@pytest.mark.parametrize(
+    "domain, expected",
+    [
+        ("example.co.uk", "example.co.uk"),
+        ("www.Example.CO.uk.", "example.co.uk"),
+        ("example.uk", "example.uk"),
+        ("foo.example.ck", "foo.example.ck"),
+        ("bar.foo.example.ck", "foo.example.ck"),
+        ("www.ck", "www.ck"),
+        ("a.www.ck", "www.ck"),
+        ("shop.example.test", "example.test"),
+        ("www.例子.公司.cn", "例子.公司.cn"),
+        ("www.xn--fsqu00a.xn--55qx5d.cn", "xn--fsqu00a.xn--55qx5d.cn"),
+    ],
+)
+def test_registrable_domain(domain: str, expected: str) -> None:
+    assert RULES.registrable_domain(domain) == expected
+
+
+@pytest.mark.parametrize("domain", ["co.uk", "uk", "example.ck", "test", "公司.cn"])
+def test_public_suffixes_have_no_registrable_domain(domain: str) -> None:
+    assert RULES.registrable_domain(domain) is None
+
+
+def test_public_suffix() -> None:
+    assert RULES.public_suffix("www.example.co.uk") == "co.uk"
+    assert RULES.public_suffix("www.ck") == "ck"
+    assert RULES.public_suffix("example.test") == "test"
+
+
+def test_bundled_list() -> None:
+    assert suffix.load(str(suffix.BUNDLED_PATH)).registrable_domain("a.b.co.uk") == "b.co.uk"
+
+
+@pytest.fixture()
+def fresh_load() -> t.Iterator[None]:
+    suffix.load.cache_clear()
+    yield
+    suffix.load.cache_clear()
+
+
+def test_environment_overrides_the_bundled_list(
+    fresh_load: None, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    path = tmp_path / "list.dat"
+    path.write_text("example.test\n", encoding="utf-8")
+    monkeypatch.setenv("IPQ_PUBLIC_SUFFIX_LIST", str(path))
+
+    assert suffix.registrable_domain("www.foo.example.test") == "foo.example.test"
+    assert suffix.registrable_domain("www.example.co.uk") == "co.uk"
+
+
+def test_missing_list_raises(
+    fresh_load: None, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("IPQ_PUBLIC_SUFFIX_LIST", str(tmp_path / "missing.dat"))
+
+    with pytest.raises(errors.IpqError, match="public suffix list"):
+        suffix.registrable_domain("example.com")
@@ -0,0 +1,163 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import contextlib
+import typing as t
+
+import pytest
+from click.testing import CliRunner
+
+from ipq import cli, client, dns, runner, timings, whois
+
+
+class FakeResolver(dns.Resolver):
+    """Resolves every name to one IP."""
+
+    async def _query(self, name: str, qtype: str) -> t.List[str]:
+        return ["10.0.0.1"] if qtype == "A" else ["host.example"]
+
+
+class FakeWhois(whois.WhoisBackend):
+    """Answers every query with the same organization."""
+
+    async def query(self, query: str) -> str:
+        return "OrgName: Example Org\nCountry: US\n"
+
+
+@pytest.mark.parametrize(
+    "pct, expected", [(0, 1.0), (1, 1.0), (50, 50.0), (95, 95.0), (99, 99.0), (100, 100.0)]
+)
+def test_percentile_is_the_nearest_rank(pct: float, expected: float) -> None:
+    samples = [float(n) for n in range(100, 0, -1)]
+
+    assert timings.percentile(samples, pct) == expected
+
+
+def test_percentile_of_few_samples() -> None:
+    assert timings.percentile([0.5], 99) == 0.5
+    assert timings.percentile([3.0, 1.0], 50) == 1.0
+    assert timings.percentile([3.0, 1.0], 95) == 3.0
+
+
+def test_stages_are_only_timed_while_subscribed() -> None:
+    seen: t.List[timings.Timing] = []
+
+    with timings.stage("before"):
+        pass
+
+    with timings.Recorder() as recorder:
+        timings.subscribe(seen.append)
+
+        try:
+            with timings.for_host("example.com"), timings.stage("dns", "1.1.1.1"):
+                pass
+
+            with pytest.raises(ValueError):
+                with timings.stage("parse"):
+                    raise ValueError
+        finally:
+            timings.unsubscribe(seen.append)
+
+    with timings.stage("after"):
+        pass
+
+    assert [(s.host, s.stage, s.target, s.ok) for s in seen] == [
+        ("example.com", "dns", "1.1.1.1", True),
+        ("", "parse", "", False),
+    ]
+    assert set(recorder.samples) == {("dns", "1.1.1.1"), ("parse", "")}
+
+
+def test_host_timings_are_formatted_and_popped() -> None:
+    recorder = timings.Recorder()
+    recorder(timings.Timing("example.com", "dns", "1.1.1.1", 0.0125, True))
+    recorder(timings.Timing("example.com", "whois.server", "whois.iana.org", 0.5, False))
+    text = recorder.format_host("example.com")
+
+    assert text.splitlines()[0] == "example.com timings:"
+    assert "dns" in text.splitlines()[1]
+    assert text.splitlines()[1].endswith("12.50 ms")
+    assert text.splitlines()[2].endswith("500.00 ms (failed)")
+    assert recorder.pop("example.com") == []
+    assert recorder.format_host("example.com") == "example.com timings:"
+
+
+def test_summary_has_percentiles_per_stage_and_target() -> None:
+    recorder = timings.Recorder()
+
+    for n in range(1, 101):
+        recorder(timings.Timing(f"host{n}", "dns", "1.1.1.1", n / 1e3, True))
+
+    recorder(timings.Timing("host1", "dns", "8.8.8.8", 0.25, True))
+    header, first, second = recorder.format_summary().splitlines()[1:]
+
+    assert header.split() == ["stage", "target", "count", "p50", "p95", "p99", "max"]
+    assert first.split() == ["dns", "1.1.1.1", "100", "50.00", "95.00", "99.00", "100.00"]
+    assert second.split() == ["dns", "8.8.8.8", "1", "250.00", "250.00", "250.00", "250.00"]
+
+
+def test_reservoir_keeps_a_fixed_number_of_samples() -> None:
+    reservoir = timings.Reservoir(size=100, seed=1)
+    values = [n / 1e3 for n in range(10_000)]
+
+    for value in values:
+        reservoir.add(value)
+
+    assert len(reservoir.samples) == 100
+    assert reservoir.count == 10_000
+    assert reservoir.max == values[-1]
+    assert set(reservoir.samples) <= set(values)
+    # A uniform sample of 0..10s has its median near 5s
+    assert 3.5 < timings.percentile(reservoir.samples, 50) < 6.5
+
+
+def test_recorder_summary_counts_past_the_reservoir_size() -> None:
+    recorder = timings.Recorder(size=8)
+
+    for n in range(1000):
+        recorder(timings.Timing(f"host{n}", "ping", "", n / 1e3, True))
+
+    row = recorder.format_summary().splitlines()[2].split()
+
+    assert len(recorder.samples["ping", ""].samples) == 8
+    assert (row[1], row[-1]) == ("1000", "999.00")
+
+
+def test_timings_option_prints_each_host_and_the_summary(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    @contextlib.asynccontextmanager
+    async def open_client(*_: t.Any) -> t.AsyncIterator[client.Client]:
+        async with client.Client(FakeResolver(), FakeWhois()) as session:
+            yield session
+
+    monkeypatch.setattr(runner, "open_client", open_client)
+    args = ["--timings", "--no-daemon", "--no-cache", "-o", "jsonl", "example.com"]
+    result = CliRunner().invoke(cli.invoke, args)
+    summary = result.output[result.output.index("Timings (ms):") :]
+
+    assert result.exit_code == 0, result.output
+    assert "example.com timings:" in result.output
+    assert "startup" in summary
+    assert "dns" in summary
+    assert "format" in summary
@@ -0,0 +1,42 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import asyncio
+import sys
+
+import pytest
+
+from ipq import errors, utils
+
+
+def test_run_command_replaces_invalid_utf8() -> None:
+    code = "import sys; sys.stdout.buffer.write(b'Registrant: Caf\\xe9\\n')"
+    output = asyncio.run(utils.run_command(sys.executable, "-c", code))
+    assert output == "Registrant: Caf�\n"
+
+
+def test_run_command_times_out() -> None:
+    code = "import time; time.sleep(5)"
+
+    with pytest.raises(errors.ShellCommandError, match="timed out"):
+        asyncio.run(utils.run_command(sys.executable, "-c", code, timeout=0.2))
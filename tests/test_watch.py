@@ -0,0 +1,81 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from ipq import watch
+
+
+def test_invalid_hosts_are_not_watched(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    path = tmp_path / "watch.sqlite3"
+
+    with watch.State(path) as state:
+        state.add(["example.com"])
+        state.set("example.com", {"ip": {"isp": "Example"}}, checked=0)
+
+    ok = watch.watch(["10.0.0.0/8", "not a host"], path=path, max_age=1e12)
+
+    with watch.State(path) as state:
+        assert state.hosts() == ["example.com"]
+
+    assert not ok
+    errors = capsys.readouterr().err.splitlines()
+    assert len(errors) == 2
+    assert errors[0].endswith("'10.0.0.0/8' is not a valid domain or IP address.")
+    assert errors[1].endswith("'not a host' is not a valid domain or IP address.")
+
+
+def test_hosts_can_be_removed(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    path = tmp_path / "watch.sqlite3"
+
+    with watch.State(path) as state:
+        state.add(["example.com", "example.org", "10.0.0.0/8"])
+
+    ok = watch.watch(["https://example.com/", "10.0.0.0/8", "example.net"], path=path, remove=True)
+
+    with watch.State(path) as state:
+        assert state.hosts() == ["example.org"]
+
+    assert ok
+    assert capsys.readouterr().out.splitlines() == ["example.com: removed", "10.0.0.0/8: removed"]
+
+
+def test_new_hosts_are_added() -> None:
+    changes = [("whois.expires", None, "2030-01-01"), ("ip.isp", None, "Example")]
+
+    assert watch.format_changes("example.com", changes) == "example.com: added, expires 2030-01-01"
+
+
+def test_new_sections_are_first_seen() -> None:
+    changes = [
+        ("whois.expires", None, "2030-01-01"),
+        ("whois.registrar", None, "Example Registrar"),
+        ("ip.isp", "Old ISP", "Example"),
+    ]
+
+    assert watch.format_changes("example.com", changes, known=["ip"]).splitlines() == [
+        "example.com: whois: first seen, expires 2030-01-01",
+        "example.com: ip.isp: Old ISP -> Example",
+    ]
@@ -0,0 +1,196 @@
+# Copyright (c) 2022-present Jonxslays
+
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+import typing as t
+
+import pytest
+
+from ipq import errors, parser, whois
+
+
+class StubServer:
+    """A WHOIS server that sends each query the next of its replies.
+
+    Replies are sent after `delay` seconds, and the connection is then
+    held open for `hold` seconds before it is closed.
+    """
+
+    def __init__(self, *replies: str, delay: float = 0, hold: float = 0) -> None:
+        self.replies = replies
+        self.delay = delay
+        self.hold = hold
+        self.queries: t.List[str] = []
+        self.address = ""
+        self._server: asyncio.AbstractServer | None = None
+
+    async def __aenter__(self) -> StubServer:
+        self._server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.address = "127.0.0.1:%d" % self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *_: t.Any) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            self.queries.append((await reader.readline()).decode().strip())
+            reply = self.replies[min(len(self.queries), len(self.replies)) - 1]
+            await asyncio.sleep(self.delay)
+            writer.write(reply.encode())
+            await writer.drain()
+            await asyncio.sleep(self.hold)
+        finally:
+            writer.close()
+
+
+DOMAIN = "Domain Name: EXAMPLE.TEST\nRegistrar: Example Registrar\n"
+
+
+def test_referrals_are_followed_and_remembered() -> None:
+    async def main() -> t.Tuple[str, StubServer, StubServer, StubServer]:
+        async with contextlib.AsyncExitStack() as servers:
+            registrar = await servers.enter_async_context(
+                StubServer(DOMAIN + "Creation Date: 2020-01-01\n")
+            )
+            registry = await servers.enter_async_context(
+                StubServer(f"{DOMAIN}Registrar WHOIS Server: {registrar.address}\n")
+            )
+            iana = await servers.enter_async_context(StubServer(f"refer: {registry.address}\n"))
+            client = whois.WhoisClient(iana=iana.address)
+
+            text = await client.query("example.test")
+            await client.query("other.test")
+            return text, iana, registry, registrar
+
+    text, iana, registry, registrar = asyncio.run(main())
+    assert "Registrar WHOIS Server" in text
+    assert "Creation Date: 2020-01-01" in text
+    assert iana.queries == ["example.test"]
+    assert registry.queries == ["example.test", "other.test"]
+    assert registrar.queries == ["example.test", "other.test"]
+
+
+def test_failing_registrar_falls_back_to_the_registry_answer() -> None:
+    async def main() -> str:
+        async with contextlib.AsyncExitStack() as servers:
+            registry = await servers.enter_async_context(
+                StubServer(f"{DOMAIN}Registrar WHOIS Server: 127.0.0.1:1\n")
+            )
+            iana = await servers.enter_async_context(StubServer(f"refer: {registry.address}\n"))
+            return await whois.WhoisClient(iana=iana.address).query("example.test")
+
+    assert asyncio.run(main()).startswith(DOMAIN)
+
+
+def test_unanswered_query_times_out() -> None:
+    async def main() -> None:
+        async with contextlib.AsyncExitStack() as servers:
+            iana = await servers.enter_async_context(StubServer(DOMAIN, delay=2))
+            config = whois.ServerConfig(timeout=0.2)
+            await whois.WhoisClient(default=config, iana=iana.address).query("example.test")
+
+    with pytest.raises(errors.WhoisError, match="Timed out waiting"):
+        asyncio.run(main())
+
+
+def test_throttled_query_is_retried() -> None:
+    async def main() -> t.Tuple[str, int]:
+        async with contextlib.AsyncExitStack() as servers:
+            iana = await servers.enter_async_context(
+                StubServer("Query rate limit exceeded\n", DOMAIN)
+            )
+            config = whois.ServerConfig(backoff=0.05)
+            text = await whois.WhoisClient(default=config, iana=iana.address).query("example.test")
+            return text, len(iana.queries)
+
+    assert asyncio.run(main()) == (DOMAIN, 2)
+
+
+def test_reading_stops_once_every_field_is_in() -> None:
+    fields = (
+        "Domain Name: EXAMPLE.TEST\nRegistrar: Example\nCreation Date: 2020-01-01\n"
+        "Updated Date: 2021-01-01\nRegistry Expiry Date: 2030-01-01\n"
+        "Domain Status: ok\nName Server: ns1.example.test\n"
+    )
+
+    async def main() -> float:
+        async with contextlib.AsyncExitStack() as servers:
+            registrar = await servers.enter_async_context(StubServer(fields + "\n", hold=2))
+            registry = await servers.enter_async_context(
+                StubServer(f"{fields}Registrar WHOIS Server: {registrar.address}\n\n", hold=2)
+            )
+            iana = await servers.enter_async_context(StubServer(f"refer: {registry.address}\n"))
+            start = time.perf_counter()
+            await whois.WhoisClient(iana=iana.address).query("example.test")
+            return time.perf_counter() - start
+
+    assert asyncio.run(main()) < 1
+
+
+def test_referrals_after_the_fields_are_followed() -> None:
+    async def main() -> str:
+        async with contextlib.AsyncExitStack() as servers:
+            ripe = await servers.enter_async_context(
+                StubServer(
+                    "inetnum: 193.0.0.0 - 193.0.7.255\nOrgName: Real Owner\nCountry: NL\n"
+                    "City: Amsterdam\nPostal Code: 1012\n\n"
+                )
+            )
+            arin = await servers.enter_async_context(
+                StubServer(
+                    "NetRange: 193.0.0.0 - 193.255.255.255\nOrgName: Intermediate Org\n"
+                    "Country: US\nCity: Chantilly\nPostal Code: 20151\n\n"
+                    f"ReferralServer: whois://{ripe.address}\n\n",
+                    hold=2,
+                )
+            )
+            iana = await servers.enter_async_context(StubServer(f"refer: {arin.address}\n"))
+            return await whois.WhoisClient(iana=iana.address).query("193.0.0.1")
+
+    assert parser.parse_ip(asyncio.run(main()))["org"] == "Real Owner"
+
+
+def test_command_output_is_only_cut_short_after_a_referral() -> None:
+    done = whois._follow("193.0.0.1")
+    lines = [
+        "NetRange: 193.0.0.0 - 193.255.255.255",
+        "OrgName: Intermediate Org",
+        "Country: US",
+        "City: Chantilly",
+        "Postal Code: 20151",
+        "",
+        "ReferralServer: whois://whois.ripe.net",
+        "inetnum: 193.0.0.0 - 193.0.7.255",
+        "OrgName: Real Owner",
+        "Country: NL",
+        "City: Amsterdam",
+        "Postal Code: 1012",
+    ]
+
+    assert not any(done(line) for line in lines)
+    assert done("")